@@ -1,26 +1,102 @@
+import atexit
 import base64
 import json
 import random
 import re
 import sqlite3
+import threading
 
+import chess_rules
 import constants as const
 import crypto_auth
 import database
 from decorators import authorisation_required
-from flask import Flask, jsonify, redirect, request
+from flask import Flask, Response, jsonify, redirect, request
 
 app = Flask(__name__)
 app.config.from_object("config.DevConfig")
 
-connection = sqlite3.connect(const.database_path)
+# Load (or build and save) the fixed-base table for G before the first token is signed
+crypto_auth.elliptic_curve.curve.precompute_generator_table(const.generator_table_path)
+
+if app.config["VERIFICATION_CACHE_SIZE"]:
+    crypto_auth.enable_verification_cache(
+        max_size=app.config["VERIFICATION_CACHE_SIZE"], ttl=app.config["VERIFICATION_CACHE_TTL"]
+    )
+
+# The executor's processes are forked, so it has to start before any of the background threads below (and before the
+# database connections are opened)
+if app.config["CRYPTO_EXECUTOR_WORKERS"]:
+    crypto_auth.start_crypto_executor(app.config["CRYPTO_EXECUTOR_WORKERS"])
+
+pool = database.ConnectionPool(
+    const.database_path,
+    size=app.config["DATABASE_POOL_SIZE"],
+    timeout=app.config["DATABASE_POOL_TIMEOUT"],
+    pragmas=database.pragma_profiles[app.config["DATABASE_PRAGMA_PROFILE"]],
+)
+
+writer = None
+
+if app.config["DATABASE_GROUP_COMMIT"]:
+    writer = database.GroupCommitWriter(
+        pool,
+        max_delay=app.config["DATABASE_GROUP_COMMIT_DELAY"],
+        max_batch=app.config["DATABASE_GROUP_COMMIT_SIZE"],
+    )
+    # Commit anything still queued before the process exits
+    atexit.register(writer.close)
+
+db = database.Database(pool, writer=writer)
+
+if app.config["LINK_REAPER_INTERVAL"]:
+    link_reaper = database.LinkReaper(
+        db, interval=app.config["LINK_REAPER_INTERVAL"], batch_size=app.config["LINK_REAPER_BATCH_SIZE"]
+    )
+    atexit.register(link_reaper.close)
+
+# Add any games archived before the opening explorer index existed, without holding up startup
+threading.Thread(target=db.backfill_position_index, name="position-index-backfill", daemon=True).start()
+
+# Campaign levels never change at runtime, so their responses are built once here
+level_cache = database.AdventureLevelCache(db.get_adventure_levels())
+
+# The opponent playstyles on the end of campaign screen, each a test of a level's battle settings
+playstyles = {
+    "aggressive": lambda settings: settings["aggressiveness"] >= 75,
+    "trade_heavy": lambda settings: settings["tradeHappy"] >= 75,
+    "positionally_strong": lambda settings: settings["positionalPlay"] >= 75,
+    "tactically_strong": lambda settings: settings["blindSpots"] <= 15,
+}
+
+def stream_json_list(items, chunk_size: int = 100) -> Response:
+    # Streams {"error": false, "data": [...]} a chunk of items at a time, so the whole list is never held in memory
+    def generate():
+        yield '{"error": false, "data": ['
+
+        chunk = []
+        separator = ""
+
+        for item in items:
+            chunk.append(json.dumps(item.to_dict()))
+
+            if len(chunk) == chunk_size:
+                yield separator + ",".join(chunk)
+                chunk = []
+                separator = ","
+
+        if chunk:
+            yield separator + ",".join(chunk)
+
+        yield "]}"
+
+    return Response(generate(), mimetype="application/json")
 
-db = database.Database(connection)
 
 # Insert admin
 if not db.get_user(email='admin'):
     print("Users table does not contain an admin user, adding one...")
-    db.insert_user(email="admin", password_hash=crypto_auth.create_password_hash(app.config["ADMIN_PASSWORD"]), auth_level=5, name="Admin")
+    db.insert_user(email="admin", password_hash=crypto_auth.create_password_hash(app.config["ADMIN_PASSWORD"]), auth_level=5, name="Admin").result()
 
 @app.route("/api/users/<user_id>", methods=["PATCH"])
 @authorisation_required(level=const.AuthLevel.default)
@@ -32,7 +108,7 @@ def update_display_name(user_id: str = None, decoded_token: dict = {}):
     if not display_name or not re.match(const.displayNameRegex, display_name):
         return jsonify({"error": True, "message": "Invalid details given to update"}), 400
     
-    db.update_user(user_id=user_id, display_name=display_name)
+    db.update_user(user_id=user_id, display_name=display_name).result()
 
     return jsonify({"error": False, "message": "User successfully updated"}), 200
 
@@ -41,7 +117,7 @@ def update_display_name(user_id: str = None, decoded_token: dict = {}):
 @app.route("/api/users/<user_id>", methods=["DELETE"])
 @authorisation_required(level=const.AuthLevel.default)
 def delete_user(user_id: str = None, decoded_token: dict = {}):
-    db.delete_user(user_id=user_id)
+    db.delete_user(user_id=user_id).result()
 
     response = jsonify({"error": False, "message": "User successfully deleted"})
         
@@ -68,19 +144,72 @@ def update_adventure_level(user_id: str = None, decoded_token: dict = {}):
     if not level_id:
         return jsonify({"error": True, "message": "No valid level id was provided in the request"}), 400
 
-    db.update_adventure_level(user_id, level_id)
+    try:
+        db.update_adventure_level(user_id, level_id).result()
+    except sqlite3.IntegrityError:
+        return jsonify({"error": True, "message": "Level does not exist"}), 400
 
     return jsonify({"error": False, "message": "Level id successfully updated"}), 200
 
 
 @app.route("/api/adventure-levels/<level_id>")
 def get_adventure_level(level_id):
-    level = db.get_adventure_level(level_id)
+    cached_level = level_cache.get(level_id)
 
-    if level is None:
+    if cached_level is None:
         return jsonify({"error": True, "message": "Level does not exist"}), 404
 
-    return jsonify({"error": False, "data": level.to_dict()}), 200
+    _, body, etag = cached_level
+
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+
+    # Answers If-None-Match with a 304 Not Modified when the client already has this level
+    return response.make_conditional(request)
+
+
+@app.route("/api/positions/<position_hash>", methods=["GET"])
+def get_position(position_hash: str = None):
+    # The opening explorer: the moves played from a position in archived games and how those games ended
+    # position_hash is the position's Zobrist hash (chess_rules.zobrist_hash) in hexadecimal
+    # /api/positions?fen= gives the same moves along with the hash each one leads to
+    try:
+        position_hash = int(position_hash, 16)
+    except ValueError:
+        position_hash = -1
+
+    if not 0 <= position_hash < 1 << 64:
+        return jsonify({"error": True, "message": "Invalid position hash"}), 400
+
+    moves = db.get_position_moves(position_hash)
+
+    return jsonify({"error": False, "data": {"hash": f"{position_hash:016x}", "moves": [move.to_dict() for move in moves]}}), 200
+
+
+@app.route("/api/positions", methods=["GET"])
+def get_position_from_fen():
+    # The opening explorer for the position given by ?fen= (the starting position when it is left out)
+    # Each move also has the hash and FEN of the position it leads to, so the explorer can be followed move by move
+    try:
+        board = chess_rules.Board(request.args.get("fen", chess_rules.STARTING_FEN))
+    except (ValueError, KeyError):
+        return jsonify({"error": True, "message": "Invalid FEN"}), 400
+
+    position_hash = chess_rules.zobrist_hash(board)
+    moves = []
+
+    for move in db.get_position_moves(position_hash):
+        child = board.copy()
+
+        try:
+            child.play_moves([chess_rules.uci_to_move(move.move)])
+        except chess_rules.IllegalMoveError:
+            # Only when two positions share a hash, the move was played from the other one
+            continue
+
+        moves.append({**move.to_dict(), "child_hash": f"{chess_rules.zobrist_hash(child):016x}", "fen": child.fen()})
+
+    return jsonify({"error": False, "data": {"hash": f"{position_hash:016x}", "fen": board.fen(), "moves": moves}}), 200
 
 
 @app.route("/api/users/<user_id>/games/<game_id>/link", methods=["GET"])
@@ -94,7 +223,8 @@ def get_shareable_link(user_id: str = None, game_id: str = None, decoded_token:
     # Create a link url suffix. Chance of collision is 2^-218 which is negliable
     link_suffix = base64.urlsafe_b64encode(random.randbytes(16)).decode("utf-8")[:-2]
 
-    db.register_link(link_suffix=link_suffix, game_id=game_id)
+    # Returns the game's existing link instead if it still has one
+    link_suffix = db.register_link(link_suffix=link_suffix, game_id=game_id).result()
 
     return jsonify({"error": False, "data": {"linkPath": f"/s/{link_suffix}"}}), 200
 
@@ -104,16 +234,14 @@ def redirect_to_game(link_suffix: str = None):
     database_response = db.get_link(link_suffix)
     
     if database_response is None:
-        return "Link does not exist", 404
+        return "Link does not exist or has expired", 404
     
     link, user_id = database_response
 
-    if link.isExpired():
-        return "Link has expired", 400
-
     # Give them a short token with small scope
     dur = 86400  # One day
-    temp_token = crypto_auth.create_token(
+    temp_token = crypto_auth.offload(
+        crypto_auth.create_token,
         {"authorisation_level": const.AuthLevel.unauthenicatedUser, "id": user_id, "gameid": link.game_id},
         duration=dur,
         private_key=app.config["PRIVATE_KEY"],
@@ -137,9 +265,18 @@ def redirect_to_game(link_suffix: str = None):
 @app.route("/api/users/all", methods=["GET"])
 @authorisation_required(level=const.AuthLevel.admin)
 def get_all_users(decoded_token: dict = {}):
-    users = db.get_all_users()
+    return stream_json_list(db.get_all_users()), 200
+
 
-    return jsonify({"error": False, "data": [user.to_dict() for user in users]}), 200
+@app.route("/api/database/stats", methods=["GET"])
+@authorisation_required(level=const.AuthLevel.admin)
+def get_database_stats(decoded_token: dict = {}):
+    stats = pool.stats()
+
+    if writer is not None:
+        stats["group_commit"] = writer.stats()
+
+    return jsonify({"error": False, "data": stats}), 200
 
 
 @app.route("/api/users/<user_id>", methods=["GET"])
@@ -167,12 +304,115 @@ def get_game_from_user(user_id: str = None, game_id: str = None, decoded_token:
     return jsonify({"error": False, "data": game.to_dict()}), 200
 
 
+@app.route("/api/users/<user_id>/games/<game_id>/positions", methods=["GET"])
+@authorisation_required(level=const.AuthLevel.unauthenicatedUser)
+def get_game_positions(user_id: str = None, game_id: str = None, decoded_token: dict = {}):
+    # The FEN of the position after each ply from "from" to "to" inclusive, so the Review page can jump to any ply
+    # without replaying the game from the start. Ply 0 is the starting position, and plies past the end of the game
+    # are left out
+    try:
+        first_ply = int(request.args.get("from", 0))
+        last_ply = int(request.args.get("to", first_ply + const.max_positions_page_size - 1))
+    except ValueError:
+        return jsonify({"error": True, "message": "from and to must be whole numbers"}), 400
+
+    if not 0 <= first_ply <= last_ply < first_ply + const.max_positions_page_size:
+        return jsonify(
+            {"error": True, "message": f"from and to must span between 1 and {const.max_positions_page_size} plies"}
+        ), 400
+
+    # Game ids are whole numbers, a string like "1.0" would otherwise match game 1 in SQLite but fail when stored
+    if not game_id.isdecimal() or int(game_id) >= 1 << 63:
+        return jsonify({"error": True, "message": "Game does not exist"}), 404
+
+    # Only the user's own games, the decorator has already checked the token is theirs (or a temp token for this game)
+    positions = db.get_game_positions(
+        int(game_id), decoded_token["id"] if user_id == "@me" else user_id, first_ply, last_ply
+    )
+
+    if positions is None:
+        return jsonify({"error": True, "message": "Game does not exist"}), 404
+
+    return jsonify({"error": False, "data": [position.to_dict() for position in positions]}), 200
+
+
+@app.route("/api/users/<user_id>/campaign-summary", methods=["GET"])
+@authorisation_required(level=const.AuthLevel.default)
+def get_campaign_summary(user_id: str = None, decoded_token: dict = {}):
+    # The user's results on each campaign level, across the whole campaign and against each opponent playstyle, and
+    # when they beat the final level (null until they have), for the end of campaign screen
+    levels = [stats.to_dict() for stats in db.get_level_stats(user_id)]
+    totals = {key: sum(level[key] for level in levels) for key in ("attempts", "wins", "draws", "losses")}
+    playstyle_totals = {name: {"attempts": 0, "wins": 0} for name in playstyles}
+    completed_at = None
+
+    for level in levels:
+        cached_level = level_cache.get(level["level_id"])
+        battle_settings = cached_level[0].battle_settings if cached_level is not None else None
+
+        if battle_settings is None:
+            continue
+
+        for name, has_playstyle in playstyles.items():
+            if has_playstyle(battle_settings):
+                playstyle_totals[name]["attempts"] += level["attempts"]
+                playstyle_totals[name]["wins"] += level["wins"]
+
+        # The final level can't be played again once it is beaten, so its last game is the win
+        if level["level_id"] == level_cache.final_battle_id and level["wins"]:
+            completed_at = level["last_played"]
+
+    return jsonify(
+        {
+            "error": False,
+            "data": {"levels": levels, "totals": totals, "playstyles": playstyle_totals, "completed_at": completed_at},
+        }
+    ), 200
+
+
 @app.route("/api/users/<user_id>/games/all", methods=["GET"])
 @authorisation_required(level=const.AuthLevel.default)
 def get_games_from_user(user_id: str = None, decoded_token: dict = {}):
-    games = db.get_archived_games(user_id=user_id)
+    # Without a limit, every game is returned in full (as the History and Adventure pages expect)
+    if "limit" not in request.args:
+        return stream_json_list(db.get_archived_games(user_id=user_id)), 200
+
+    # With a limit, one page of summaries is returned along with the cursor for the next page
+    # The full game (including the move list) is available from /api/users/<user_id>/games/<game_id>
+    limit = request.args.get("limit", type=int)
+
+    if limit is None or not 0 < limit <= const.max_games_page_size:
+        return jsonify({"error": True, "message": f"limit must be between 1 and {const.max_games_page_size}"}), 400
+
+    before = None
+
+    if request.args.get("cursor"):
+        try:
+            before = json.loads(base64.urlsafe_b64decode(request.args["cursor"]))
+        except ValueError:
+            before = None
+
+        # [DatePlayed, Gameid] as given in next_cursor, anything else would reach the query's parameters
+        if (
+            type(before) != list
+            or len(before) != 2
+            or type(before[0]) not in (str, int)
+            or type(before[1]) != int
+            or not 0 <= before[1] < 2**63
+            or (type(before[0]) == int and not -(2**63) <= before[0] < 2**63)
+        ):
+            return jsonify({"error": True, "message": "Invalid cursor"}), 400
+
+    games = db.get_archived_game_summaries(user_id, limit, before=before)
+
+    # The cursor is the sort key of the last game on this page, only given when there might be another page
+    next_cursor = (
+        base64.urlsafe_b64encode(bytes(json.dumps([games[-1].date_played, int(games[-1]._id)]), "utf-8")).decode()
+        if len(games) == limit
+        else None
+    )
 
-    return jsonify({"error": False, "data": [game.to_dict() for game in games]}), 200
+    return jsonify({"error": False, "data": [game.to_dict() for game in games], "next_cursor": next_cursor}), 200
 
 
 @app.route("/api/users/<user_id>/games", methods=["PUT"])
@@ -186,29 +426,60 @@ def archive_game(user_id: str = None, decoded_token: dict = {}):
     move_list = str(content.get("moveList", ""))
     game_result = str(content.get("gameResult", ""))
     custom_settings = content.get("customSettings", {})
-    human_plays_as = int(content.get("humanPlaysAs", 0))
-    winner = int(content.get("winner", -1))
-    level_id = str(content.get("levelid", ""))
-    campaign_id = str(content.get("campaignid", ""))
 
-    if not move_list or not game_result or not human_plays_as or (winner == -1):
+    try:
+        human_plays_as = int(content.get("humanPlaysAs", 0))
+        winner = int(content.get("winner", -1))
+    except (TypeError, ValueError):
+        return jsonify({"error": True, "message": "humanPlaysAs and winner must be numbers"}), 400
+
+    # Games outside of the campaign have no level or campaign, which must be stored as NULL for the foreign keys
+    level_id = str(content.get("levelid", "")) or None
+    campaign_id = str(content.get("campaignid", "")) or None
+
+    # Every column but the level and campaign is NOT NULL, so check them here rather than relying on the INSERT failing
+    if not move_list or not game_result or not human_plays_as or (winner == -1) or custom_settings is None:
         return jsonify({"error": True, "message": "All game data not provided in the request"}), 400
 
+    # Replay the game to check every move was legal and that it really ended the way the client says
+    # The same replay records the positions the opening explorer index and the snapshots need
+    try:
+        game = chess_rules.validate_move_list(
+            move_list,
+            expected=(game_result, winner),
+            hashed_plies=database.INDEXED_PLIES,
+            snapshot_interval=database.SNAPSHOT_INTERVAL,
+        )
+    except chess_rules.IllegalMoveError as error:
+        return jsonify({"error": True, "message": f"Invalid move list: {error}"}), 400
+
+    if (game.result, game.winner) != (game_result, winner):
+        return jsonify({"error": True, "message": "The game result does not match the move list"}), 400
+
     user = db.get_user(_id=user_id)
 
     if user is None:
         return jsonify({"error": True, "message": "User does not exist"}), 404
 
-    db.archive_game(
-        user_id,
-        move_list=move_list,
-        game_result=game_result,
-        human_plays_as=human_plays_as,
-        winner=winner,
-        custom_settings=(json.dumps(custom_settings, sort_keys=True) if custom_settings is not None else None),
-        level_id=level_id,
-        campaign_id=campaign_id,
-    )
+    try:
+        db.archive_game(
+            user_id,
+            move_list=game.move_list,
+            game_result=game_result,
+            human_plays_as=human_plays_as,
+            winner=winner,
+            custom_settings=json.dumps(custom_settings, sort_keys=True),
+            level_id=level_id,
+            campaign_id=campaign_id,
+            position_hashes=game.position_hashes,
+            snapshots=game.snapshots,
+        ).result()
+    except sqlite3.IntegrityError as error:
+        # The only foreign keys the request controls are the level and campaign
+        if error.sqlite_errorcode != sqlite3.SQLITE_CONSTRAINT_FOREIGNKEY:
+            raise
+
+        return jsonify({"error": True, "message": "Level or campaign does not exist"}), 400
 
     return jsonify({"error": False, "message": "Game successfully archived"}), 201
 
@@ -238,9 +509,9 @@ def signup():
     if user_exists:
         return jsonify({"error": True, "message": "Account already exists with this email address"}), 409
 
-    password_hash = crypto_auth.create_password_hash(password)
+    password_hash = crypto_auth.offload(crypto_auth.create_password_hash, password)
 
-    db.insert_user(email=email, password_hash=password_hash, name=name, auth_level=const.AuthLevel.default)
+    db.insert_user(email=email, password_hash=password_hash, name=name, auth_level=const.AuthLevel.default).result()
 
     return jsonify({"error": False, "message": "Account created - Please Login"}), 201
 
@@ -263,12 +534,13 @@ def login():
 
     user = db.get_user(email=email)
 
-    if user is None or not crypto_auth.check_password_hash(password, user.password_hash):
+    if user is None or not crypto_auth.offload(crypto_auth.check_password_hash, password, user.password_hash):
         return jsonify({"error": True, "message": "The credentials provided were invalid"}), 401
 
     dur = const.token_dur
 
-    token = crypto_auth.create_token(
+    token = crypto_auth.offload(
+        crypto_auth.create_token,
         {"authorisation_level": user.auth_level, "id": user._id},
         duration=dur,
         private_key=app.config["PRIVATE_KEY"],
@@ -0,0 +1,93 @@
+# Concurrent read and write throughput of the Database class under each PRAGMA profile, with and without group commit
+# Run from the backend directory with: python -m benchmarks.database
+import os
+import tempfile
+import threading
+import time
+
+import database
+
+DURATION = 3  # seconds per profile
+READER_THREADS = 4
+WRITER_THREADS = 16
+GAMES = 2000
+
+
+def run(profile: str, path: str, group_commit: bool) -> dict:
+    pool = database.ConnectionPool(path, size=READER_THREADS, pragmas=database.pragma_profiles[profile])
+    group_writer = database.GroupCommitWriter(pool) if group_commit else None
+    db = database.Database(pool, writer=group_writer)
+
+    db.insert_user(email="benchmark", password_hash="hash 0", auth_level=2, name="Benchmark").result()
+    user_id = db.get_user(email="benchmark")._id
+
+    futures = [
+        db.archive_game(user_id, move_list="e2e4 e7e5 g1f3 b8c6", game_result="Checkmate", human_plays_as=16, winner=16)
+        for _ in range(GAMES)
+    ]
+
+    for future in futures:
+        future.result()
+
+    counts = {"reads": 0, "writes": 0}
+    stop = threading.Event()
+    lock = threading.Lock()
+
+    def reader():
+        reads = 0
+
+        while not stop.is_set():
+            for _ in db.get_archived_games(user_id=user_id):
+                pass
+
+            db.get_game("1")
+            reads += 2
+
+        with lock:
+            counts["reads"] += reads
+
+    def writer():
+        writes = 0
+
+        while not stop.is_set():
+            db.archive_game(user_id, move_list="d2d4 d7d5", game_result="Stalemate", human_plays_as=16, winner=0).result()
+            writes += 1
+
+        with lock:
+            counts["writes"] += writes
+
+    threads = [threading.Thread(target=reader) for _ in range(READER_THREADS)] + [
+        threading.Thread(target=writer) for _ in range(WRITER_THREADS)
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    time.sleep(DURATION)
+    stop.set()
+
+    for thread in threads:
+        thread.join()
+
+    if group_writer is not None:
+        group_writer.close()
+
+    pool.close()
+
+    return {"reads/s": counts["reads"] / DURATION, "writes/s": counts["writes"] / DURATION, **pool.stats()}
+
+
+def main():
+    for profile in database.pragma_profiles:
+        for group_commit in (False, True):
+            with tempfile.TemporaryDirectory() as directory:
+                results = run(profile, os.path.join(directory, "benchmark.db"), group_commit)
+
+            print(
+                f"{profile:<10} {'group' if group_commit else 'single':<7} {results['reads/s']:10.1f} reads/s {results['writes/s']:10.1f} writes/s "
+                f"max read wait {results['read_wait_max'] * 1000:.1f} ms max write wait {results['write_wait_max'] * 1000:.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
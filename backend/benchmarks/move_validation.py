@@ -0,0 +1,97 @@
+# Throughput of replaying and validating archived move lists with chess_rules
+# Run from the backend directory with: python -m benchmarks.move_validation
+import random
+import time
+
+import chess_rules
+from database.position_index import INDEXED_PLIES, position_rows
+from database.snapshots import SNAPSHOT_INTERVAL, game_snapshots
+
+GAMES = 50
+PLIES = 200
+REPEATS = 5
+
+
+def random_game(rng: random.Random, plies: int) -> tuple[str, chess_rules.Board]:
+    # A game of random legal moves, stopping early if it finishes
+    board = chess_rules.Board()
+    moves = []
+
+    for _ in range(plies):
+        legal_moves = board.legal_moves()
+
+        if not legal_moves:
+            break
+
+        move = rng.choice(legal_moves)
+        board.make_move(move)
+        moves.append(chess_rules.move_to_uci(move))
+
+    return " ".join(moves), board
+
+
+def best_time(function, move_lists: list[str]) -> float:
+    # Seconds per move list, the best of REPEATS runs to keep out noise from the rest of the machine
+    best = float("inf")
+
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+
+        for move_list in move_lists:
+            function(move_list)
+
+        best = min(best, (time.perf_counter() - start) / len(move_lists))
+
+    return best
+
+
+def main():
+    rng = random.Random(0)
+
+    long_games = []
+
+    while len(long_games) < GAMES:
+        move_list, _ = random_game(rng, PLIES)
+
+        if move_list.count(" ") + 1 == PLIES:
+            long_games.append(move_list)
+
+    finished_games = []
+
+    while len(finished_games) < GAMES:
+        move_list, board = random_game(rng, 500)
+
+        if not board.has_legal_move():
+            finished_games.append(move_list)
+
+    replay = best_time(chess_rules.replay_move_list, long_games)
+    print(f"replay   {PLIES}-ply games: {replay * 1e6:8.1f} us/game {PLIES / replay:10.0f} plies/s")
+
+    plies = sum(move_list.count(" ") + 1 for move_list in finished_games)
+    average = plies / len(finished_games)
+
+    def report(name: str, seconds: float) -> None:
+        print(
+            f"{name:26} {seconds * 1e6:8.1f} us/game {average / seconds:10.0f} plies/s "
+            f"({seconds * 1e6 * PLIES / average:7.1f} us per {PLIES} plies)"
+        )
+
+    print(f"finished games average {average:.0f} plies")
+    report("validate", best_time(chess_rules.validate_move_list, finished_games))
+
+    def validate_and_record(move_list: str) -> None:
+        chess_rules.validate_move_list(move_list, hashed_plies=INDEXED_PLIES, snapshot_interval=SNAPSHOT_INTERVAL)
+
+    report("validate and record", best_time(validate_and_record, finished_games))
+
+    # What archiving a game cost when the index and the snapshots each replayed the game again
+    def validate_and_replay(move_list: str) -> None:
+        game = chess_rules.validate_move_list(move_list)
+        position_rows(game.move_list, game.winner)
+        game_snapshots(game.move_list)
+
+    report("validate and replay twice", best_time(validate_and_replay, finished_games))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# Perft regression and speed suite for the chess_rules move generator, using the positions from testinglog.md
+# Run from the backend directory with: python -m benchmarks.perft [--max-nodes N] [--workers N]
+# Debug a position with: python -m benchmarks.perft --divide "<FEN>" <depth>
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import chess_rules
+
+# (name, FEN, expected node count at depth 1, 2, ...), counts from Stockfish as recorded in testinglog.md
+# (its depth 4 count for the starting position, 1972781, has a stray digit: perft 4 is 197281)
+POSITIONS = [
+    (
+        "Starting position",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        [20, 400, 8902, 197281, 4865609, 119060324],
+    ),
+    (
+        "Castling and promotion",
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        [6, 264, 9467, 422333, 15833292, 706045033],
+    ),
+    (
+        "Castling and promotion - mirrored",
+        "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+        [6, 264, 9467, 422333, 15833292, 706045033],
+    ),
+    (
+        "Endgame pins",
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - -",
+        [14, 191, 2812, 43238, 674624, 11030083, 178633661],
+    ),
+    (
+        "Talkchess position",
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        [44, 1486, 62379, 2103487, 89941194],
+    ),
+]
+
+# Depths whose expected count is above this are skipped by default, the deepest ones take hours in Python
+DEFAULT_MAX_NODES = 5_000_000
+
+
+def perft_after(fen: str, move: str, depth: int) -> int:
+    # Runs in a worker process: perft of the position after one root move
+    board = chess_rules.Board(fen)
+    board.make_move(chess_rules.uci_to_move(move))
+
+    return chess_rules.perft(board, depth - 1)
+
+
+def parallel_divide(executor: ProcessPoolExecutor, fen: str, depth: int) -> dict[str, int]:
+    # Each root move's subtree is counted in a separate task
+    board = chess_rules.Board(fen)
+    moves = [chess_rules.move_to_uci(move) for move in board.legal_moves()]
+
+    if depth == 1:
+        return {move: 1 for move in moves}
+
+    counts = executor.map(perft_after, [fen] * len(moves), moves, [depth] * len(moves))
+
+    return dict(zip(moves, counts))
+
+
+def print_divide(counts: dict[str, int]) -> None:
+    for move, nodes in sorted(counts.items()):
+        print(f"{move}: {nodes}")
+
+    print(f"\nMoves: {len(counts)}\nNodes: {sum(counts.values())}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft counts and speed of the chess_rules move generator")
+    parser.add_argument("--max-nodes", type=int, default=DEFAULT_MAX_NODES, help="skip depths expecting more nodes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--divide", nargs=2, metavar=("FEN", "DEPTH"), help="print the node count of each root move")
+    arguments = parser.parse_args()
+
+    with ProcessPoolExecutor(max_workers=arguments.workers) as executor:
+        if arguments.divide:
+            fen, depth = arguments.divide
+            print_divide(parallel_divide(executor, fen, int(depth)))
+            return
+
+        failures = 0
+
+        for name, fen, expected_counts in POSITIONS:
+            print(f"{name}\n  {fen}")
+
+            total_nodes = 0
+            total_time = 0.0
+
+            for depth, expected in enumerate(expected_counts, start=1):
+                if expected > arguments.max_nodes:
+                    break
+
+                start = time.perf_counter()
+                nodes = sum(parallel_divide(executor, fen, depth).values())
+                elapsed = time.perf_counter() - start
+
+                status = "ok" if nodes == expected else f"FAILED, expected {expected}"
+                failures += nodes != expected
+                total_nodes += nodes
+                total_time += elapsed
+
+                print(f"  depth {depth}: {nodes:>12} nodes {elapsed:8.2f} s {nodes / elapsed:10.0f} nodes/s  {status}")
+
+            print(f"  total:   {total_nodes:>12} nodes {total_time:8.2f} s {total_nodes / total_time:10.0f} nodes/s")
+
+    if failures:
+        print(f"{failures} perft counts were wrong, use --divide to find the moves responsible")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
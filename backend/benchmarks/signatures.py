@@ -0,0 +1,79 @@
+# Microbenchmarks for the elliptic curve arithmetic used to sign and verify tokens
+# Run from the backend directory with: python -m benchmarks.signatures
+import timeit
+from random import SystemRandom
+
+from crypto_auth import elliptic_curve
+
+curve = elliptic_curve.curve
+REPEATS = 50
+
+
+def report(name: str, seconds: float, repeats: int = REPEATS) -> None:
+    print(f"{name:<45} {seconds / repeats * 1000:8.3f} ms/op")
+
+
+def main():
+    scalars = [SystemRandom().randrange(1, curve.n) for _ in range(REPEATS)]
+
+    # Both paths must give the same affine point
+    for scalar in scalars[:5]:
+        assert curve.scalar_multiplication(scalar, curve.G) == curve.to_affine(
+            curve.jacobian_scalar_multiplication(scalar, curve.G)
+        )
+
+    report(
+        "affine scalar_multiplication",
+        timeit.timeit(lambda: [curve.scalar_multiplication(k, curve.G) for k in scalars], number=1),
+    )
+    report(
+        "jacobian_scalar_multiplication",
+        timeit.timeit(lambda: [curve.to_affine(curve.jacobian_scalar_multiplication(k, curve.G)) for k in scalars], number=1),
+    )
+
+    curve.precompute_generator_table()
+    point = curve.to_affine(curve.generator_multiplication(scalars[-1]))
+    report(
+        "generator_multiplication",
+        timeit.timeit(lambda: [curve.to_affine(curve.generator_multiplication(k)) for k in scalars], number=1),
+    )
+
+    report(
+        "generator + jacobian multiplication added",
+        timeit.timeit(
+            lambda: [
+                curve.jacobian_addition(curve.generator_multiplication(k), curve.jacobian_scalar_multiplication(k, point))
+                for k in scalars
+            ],
+            number=1,
+        ),
+    )
+    report(
+        "joint_scalar_multiplication",
+        timeit.timeit(lambda: [curve.joint_scalar_multiplication(k, curve.G, k, point) for k in scalars], number=1),
+    )
+
+    private_key = scalars[0]
+    (x, y) = curve.scalar_multiplication(private_key, curve.G)
+    public_key = (x << curve.n_bitlength) ^ y
+    message = b'{"authorisation_level":2,"id":"1"}'
+    signature = curve.createSignature(message, private_key)
+
+    report("createSignature", timeit.timeit(lambda: curve.createSignature(message, private_key), number=REPEATS))
+    report(
+        "verifySignature",
+        timeit.timeit(lambda: curve.verifySignature(message, signature, public_key), number=REPEATS),
+    )
+
+    messages = [message + bytes(str(i), "utf-8") for i in range(REPEATS)]
+    signatures = [curve.createSignature(binary, private_key) for binary in messages]
+
+    report(
+        "verifySignature loop",
+        timeit.timeit(lambda: [curve.verifySignature(m, s, public_key) for m, s in zip(messages, signatures)], number=1),
+    )
+    report("verify_batch", timeit.timeit(lambda: curve.verify_batch(messages, signatures, public_key), number=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Time and memory to build Game objects from GameHistory rows
+# Run from the backend directory with: python -m benchmarks.table_classes
+import time
+import tracemalloc
+
+from database.table_classes import Game
+
+ROWS = 100000
+
+
+class OldTable:
+    # Copy of Table and Game as they were before __slots__ and from_row, so both can be measured side by side
+    def __init__(self, _id: str):
+        self._id = _id
+
+
+class OldGame(OldTable):
+    def __init__(
+        self,
+        _id: str,
+        move_list: str,
+        game_result: str,
+        date_played: str,
+        custom_settings: str,
+        human_plays_as: int,
+        winner: int,
+        user_id: str,
+        campaign_id: str | None = None,
+        level_id: str | None = None,
+    ):
+        super().__init__(_id)
+        self.move_list = move_list
+        self.game_result = game_result
+        self.date_played = date_played
+        self.custom_settings = custom_settings
+        self.human_plays_as = human_plays_as
+        self.winner = winner
+        self.user_id = user_id
+        self.campaign_id = str(campaign_id) if campaign_id is not None else None
+        self.level_id = str(level_id) if level_id is not None else None
+
+    def to_dict(self):
+        return {
+            "id": self._id,
+            "move_list": self.move_list,
+            "game_result": self.game_result,
+            "date_played": self.date_played,
+            "custom_settings": self.custom_settings,
+            "human_plays_as": self.human_plays_as,
+            "winner": self.winner,
+            "user_id": self.user_id,
+            "campaign_id": self.campaign_id,
+            "level_id": self.level_id,
+        }
+
+
+def old_way(row: tuple) -> OldGame:
+    # How Database built games before Game.from_row
+    return OldGame(
+        str(row[0]),
+        row[1],
+        row[2],
+        row[3],
+        row[4],
+        row[5],
+        row[6],
+        str(row[7]),
+        campaign_id=row[8],
+        level_id=row[9],
+    )
+
+
+def measure(name: str, build, rows: list) -> None:
+    start = time.perf_counter()
+    games = [build(row) for row in rows]
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    games = [build(row) for row in rows]
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    [game.to_dict() for game in games]
+    to_dict_elapsed = time.perf_counter() - start
+
+    print(f"{name:<10} build {elapsed * 1000:7.1f} ms  memory {memory / 2**20:6.1f} MiB  to_dict {to_dict_elapsed * 1000:7.1f} ms")
+
+
+def main():
+    rows = [
+        (i, "e2e4 e7e5 g1f3 b8c6", "Checkmate", "2024-01-01 12:00:00", "{}", 16, 16, 1, 1 if i % 2 else None, 3)
+        for i in range(1, ROWS + 1)
+    ]
+
+    measure("old way", old_way, rows)
+    measure("from_row", Game.from_row, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# Chess rules for checking games on the server, using bitboards and precomputed attack tables
+from chess_rules.bitboards import BLACK, WHITE, move_to_uci, uci_to_move
+from chess_rules.board import STARTING_FEN, Board, IllegalMoveError
+from chess_rules.perft import divide, perft
+from chess_rules.validation import CHECKMATE, STALEMATE, parse_move_list, replay_move_list, validate_move_list
+from chess_rules.zobrist import zobrist_hash
@@ -0,0 +1,201 @@
+# Piece codes and precomputed attack tables
+# Squares are numbered rank * 8 + file from a1 = 0 to h8 = 63 and a bitboard has bit n set for square n, the same layout
+# as the engine's Board and database.encoding
+
+# Same values as the engine's Pieces enum, a piece is its colour | its type
+PAWN = 1
+ROOK = 2
+KNIGHT = 3
+BISHOP = 4
+QUEEN = 5
+KING = 6
+BLACK = 8
+WHITE = 16
+COLOUR_MASK = 24
+TYPE_MASK = 7
+
+# Indexed by the promotion number of a move (as in the engine's Move class), 0 is no promotion
+PROMOTION_PIECES = (0, KNIGHT, BISHOP, ROOK, QUEEN)
+PROMOTION_LETTERS = " nbrq"
+
+FULL = (1 << 64) - 1
+RANK_1 = 0xFF
+RANK_8 = RANK_1 << 56
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+
+# Castling rights bits
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+
+SQUARE_NAMES = [chr(97 + square % 8) + str(square // 8 + 1) for square in range(64)]
+SQUARE_INDEXES = {name: square for square, name in enumerate(SQUARE_NAMES)}
+
+
+def on_board(file: int, rank: int) -> bool:
+    return 0 <= file < 8 and 0 <= rank < 8
+
+
+def step_attacks(steps: tuple) -> list[int]:
+    # Squares reached by a single (file, rank) step from each square, for knights, kings and pawns
+    table = []
+
+    for square in range(64):
+        file, rank = square % 8, square // 8
+        attacks = 0
+
+        for file_step, rank_step in steps:
+            if on_board(file + file_step, rank + rank_step):
+                attacks |= 1 << ((rank + rank_step) * 8 + file + file_step)
+
+        table.append(attacks)
+
+    return table
+
+
+def ray(square: int, file_step: int, rank_step: int) -> list[int]:
+    # Squares from square (exclusive) to the edge of the board in one direction
+    file, rank = square % 8 + file_step, square // 8 + rank_step
+    squares = []
+
+    while on_board(file, rank):
+        squares.append(rank * 8 + file)
+        file, rank = file + file_step, rank + rank_step
+
+    return squares
+
+
+def line_attack_tables(file_step: int, rank_step: int) -> tuple[list[int], list[dict]]:
+    # Sliding attacks along one line (a rank, file, diagonal or anti-diagonal) through each square
+    # Returns the mask of squares that can block along the line, and for each square a dict from the blockers
+    # (occupied & mask) to the attacked squares. The last square in each direction is left out of the mask, since
+    # whether it is occupied doesn't change what is attacked, which keeps each dict to at most 64 entries
+    masks = []
+    tables = []
+
+    for square in range(64):
+        forwards = ray(square, file_step, rank_step)
+        backwards = ray(square, -file_step, -rank_step)
+
+        mask = 0
+
+        for squares in (forwards, backwards):
+            for blocker in squares[:-1]:
+                mask |= 1 << blocker
+
+        table = {}
+        subset = 0
+
+        # Every subset of mask (the Carry-Rippler trick)
+        while True:
+            attacks = 0
+
+            for squares in (forwards, backwards):
+                for target in squares:
+                    attacks |= 1 << target
+
+                    if subset >> target & 1:
+                        break
+
+            table[subset] = attacks
+            subset = (subset - mask) & mask
+
+            if subset == 0:
+                break
+
+        masks.append(mask)
+        tables.append(table)
+
+    return masks, tables
+
+
+KNIGHT_ATTACKS = step_attacks(((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)))
+KING_ATTACKS = step_attacks(((0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)))
+# Squares a pawn of each colour on a square attacks
+PAWN_ATTACKS = {
+    WHITE: step_attacks(((-1, 1), (1, 1))),
+    BLACK: step_attacks(((-1, -1), (1, -1))),
+}
+
+RANK_MASKS, RANK_ATTACKS = line_attack_tables(1, 0)
+FILE_MASKS, FILE_ATTACKS = line_attack_tables(0, 1)
+DIAGONAL_MASKS, DIAGONAL_ATTACKS = line_attack_tables(1, 1)
+ANTI_DIAGONAL_MASKS, ANTI_DIAGONAL_ATTACKS = line_attack_tables(-1, 1)
+
+# Attacks on an empty board, to rule out sliders quickly
+ROOK_RAYS = [RANK_ATTACKS[square][0] | FILE_ATTACKS[square][0] for square in range(64)]
+BISHOP_RAYS = [DIAGONAL_ATTACKS[square][0] | ANTI_DIAGONAL_ATTACKS[square][0] for square in range(64)]
+QUEEN_RAYS = [ROOK_RAYS[square] | BISHOP_RAYS[square] for square in range(64)]
+# Squares a piece could check or pin against a king on each square from
+KING_LINES = [QUEEN_RAYS[square] | KNIGHT_ATTACKS[square] for square in range(64)]
+
+
+def between_table() -> list[int]:
+    # BETWEEN[a * 64 + b] is the squares strictly between a and b when they share a rank, file or diagonal, otherwise 0
+    table = [0] * 4096
+
+    for square in range(64):
+        for file_step, rank_step in ((0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)):
+            passed = 0
+
+            for target in ray(square, file_step, rank_step):
+                table[square * 64 + target] = passed
+                passed |= 1 << target
+
+    return table
+
+
+BETWEEN = between_table()
+
+# Castling rights that survive a move from or to each square
+CASTLING_MASKS = [15] * 64
+CASTLING_MASKS[0] = 15 ^ WHITE_QUEENSIDE
+CASTLING_MASKS[4] = 15 ^ (WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASKS[7] = 15 ^ WHITE_KINGSIDE
+CASTLING_MASKS[56] = 15 ^ BLACK_QUEENSIDE
+CASTLING_MASKS[60] = 15 ^ (BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASKS[63] = 15 ^ BLACK_KINGSIDE
+
+# King destination -> (rook source, rook destination) for each castling move
+CASTLING_ROOKS = {6: (7, 5), 2: (0, 3), 62: (63, 61), 58: (56, 59)}
+# Castling move -> (right needed, squares that must be empty, square the king passes through)
+CASTLING_PATHS = {
+    4 | 6 << 6: (WHITE_KINGSIDE, 0x60, 5),
+    4 | 2 << 6: (WHITE_QUEENSIDE, 0x0E, 3),
+    60 | 62 << 6: (BLACK_KINGSIDE, 0x60 << 56, 61),
+    60 | 58 << 6: (BLACK_QUEENSIDE, 0x0E << 56, 59),
+}
+
+
+def rook_attacks(square: int, occupied: int) -> int:
+    return RANK_ATTACKS[square][occupied & RANK_MASKS[square]] | FILE_ATTACKS[square][occupied & FILE_MASKS[square]]
+
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    return (
+        DIAGONAL_ATTACKS[square][occupied & DIAGONAL_MASKS[square]]
+        | ANTI_DIAGONAL_ATTACKS[square][occupied & ANTI_DIAGONAL_MASKS[square]]
+    )
+
+
+def move_to_uci(move: int) -> str:
+    # Moves are 16 bit ints: source square | destination square << 6 | promotion number << 12
+    return SQUARE_NAMES[move & 63] + SQUARE_NAMES[move >> 6 & 63] + PROMOTION_LETTERS[move >> 12].strip()
+
+
+# Every move in the e2e4 or e7e8q form, so parsing a move list is one dict lookup per move
+UCI_MOVES = {
+    source_name + destination_name + PROMOTION_LETTERS[promotion].strip(): source | destination << 6 | promotion << 12
+    for source, source_name in enumerate(SQUARE_NAMES)
+    for destination, destination_name in enumerate(SQUARE_NAMES)
+    for promotion in range(5)
+    # Promotions are only listed for pawn moves onto the last rank
+    if promotion == 0 or (source // 8, destination // 8) in ((6, 7), (1, 0)) and abs(source % 8 - destination % 8) <= 1
+}
+
+
+def uci_to_move(text: str) -> int:
+    # Raises KeyError for anything that isn't a move in the e2e4 or e7e8q form
+    return UCI_MOVES[text]
@@ -0,0 +1,592 @@
+from chess_rules.bitboards import (
+    BETWEEN,
+    BISHOP,
+    BISHOP_RAYS,
+    BLACK,
+    BLACK_KINGSIDE,
+    BLACK_QUEENSIDE,
+    CASTLING_MASKS,
+    CASTLING_PATHS,
+    CASTLING_ROOKS,
+    COLOUR_MASK,
+    FILE_A,
+    FILE_H,
+    FULL,
+    KING,
+    KING_ATTACKS,
+    KING_LINES,
+    KNIGHT,
+    KNIGHT_ATTACKS,
+    PAWN,
+    PAWN_ATTACKS,
+    PROMOTION_PIECES,
+    QUEEN,
+    QUEEN_RAYS,
+    RANK_1,
+    RANK_8,
+    ROOK,
+    ROOK_RAYS,
+    SQUARE_INDEXES,
+    SQUARE_NAMES,
+    TYPE_MASK,
+    WHITE,
+    WHITE_KINGSIDE,
+    WHITE_QUEENSIDE,
+    bishop_attacks,
+    move_to_uci,
+    rook_attacks,
+)
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+PIECE_LETTERS = {
+    WHITE | PAWN: "P",
+    WHITE | ROOK: "R",
+    WHITE | KNIGHT: "N",
+    WHITE | BISHOP: "B",
+    WHITE | QUEEN: "Q",
+    WHITE | KING: "K",
+    BLACK | PAWN: "p",
+    BLACK | ROOK: "r",
+    BLACK | KNIGHT: "n",
+    BLACK | BISHOP: "b",
+    BLACK | QUEEN: "q",
+    BLACK | KING: "k",
+}
+LETTER_PIECES = {letter: piece for piece, letter in PIECE_LETTERS.items()}
+
+# The FEN letter of each square's contents with empty squares as 1, and the runs of empty squares to merge, longest first
+FEN_SQUARE_LETTERS = [PIECE_LETTERS.get(piece, "1") for piece in range((WHITE | KING) + 1)]
+FEN_EMPTY_RUNS = [("1" * length, str(length)) for length in range(8, 1, -1)]
+
+CASTLING_LETTERS = ((WHITE_KINGSIDE, "K"), (WHITE_QUEENSIDE, "Q"), (BLACK_KINGSIDE, "k"), (BLACK_QUEENSIDE, "q"))
+
+# Promotion numbers in the order they are generated, best first
+PROMOTION_ORDER = (4 << 12, 1 << 12, 3 << 12, 2 << 12)
+
+
+class IllegalMoveError(ValueError):
+    pass
+
+
+# A chess position stored as bitboards, with a mailbox of the piece on each square for quick lookups
+# Moves are ints in the same 16 bit form as database.encoding: source | destination << 6 | promotion number << 12
+class Board:
+    __slots__ = ("squares", "pieces", "side", "castling", "en_passant", "halfmove_clock", "fullmove_number")
+
+    def __init__(self, fen: str = STARTING_FEN) -> None:
+        fields = fen.split()
+
+        if len(fields) < 2:
+            raise ValueError(f"Invalid FEN {fen!r}")
+
+        # The piece on each square (0 for empty)
+        self.squares = [0] * 64
+        # Bitboards indexed by piece, where pieces[WHITE] and pieces[BLACK] are every piece of that colour
+        self.pieces = [0] * ((WHITE | KING) + 1)
+
+        ranks = fields[0].split("/")
+
+        if len(ranks) != 8:
+            raise ValueError(f"Invalid FEN {fen!r}")
+
+        for rank, row in zip(range(7, -1, -1), ranks):
+            file = 0
+
+            for letter in row:
+                if letter.isdigit():
+                    file += int(letter)
+                    continue
+
+                if letter not in LETTER_PIECES or file > 7:
+                    raise ValueError(f"Invalid FEN {fen!r}")
+
+                self.put(LETTER_PIECES[letter], rank * 8 + file)
+                file += 1
+
+        self.side = WHITE if fields[1] == "w" else BLACK
+        self.castling = 0
+
+        for bit, letter in CASTLING_LETTERS:
+            if letter in (fields[2] if len(fields) > 2 else ""):
+                self.castling |= bit
+
+        self.en_passant = SQUARE_INDEXES[fields[3]] if len(fields) > 3 and fields[3] != "-" else -1
+        self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        self.fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+
+    def put(self, piece: int, square: int) -> None:
+        bit = 1 << square
+
+        self.squares[square] = piece
+        self.pieces[piece] |= bit
+        self.pieces[piece & COLOUR_MASK] |= bit
+
+    def fen(self) -> str:
+        # Built a whole board at a time rather than square by square, as the snapshots of every game take one
+        text = "".join(map(FEN_SQUARE_LETTERS.__getitem__, self.squares))
+        placement = "/".join([text[start : start + 8] for start in range(56, -1, -8)])
+
+        for run, length in FEN_EMPTY_RUNS:
+            if run in placement:
+                placement = placement.replace(run, length)
+
+        castling = "".join(letter for bit, letter in CASTLING_LETTERS if self.castling & bit) or "-"
+        en_passant = SQUARE_NAMES[self.en_passant] if self.en_passant >= 0 else "-"
+
+        return (
+            f"{placement} {'w' if self.side == WHITE else 'b'} {castling} {en_passant} "
+            f"{self.halfmove_clock} {self.fullmove_number}"
+        )
+
+    def copy(self) -> "Board":
+        board = Board.__new__(Board)
+        board.squares = self.squares[:]
+        board.pieces = self.pieces[:]
+        board.side = self.side
+        board.castling = self.castling
+        board.en_passant = self.en_passant
+        board.halfmove_clock = self.halfmove_clock
+        board.fullmove_number = self.fullmove_number
+
+        return board
+
+    def is_attacked(self, square: int, by: int) -> bool:
+        pieces = self.pieces
+
+        if (
+            KNIGHT_ATTACKS[square] & pieces[by | KNIGHT]
+            or KING_ATTACKS[square] & pieces[by | KING]
+            # A pawn of colour by attacks square if a pawn of the other colour on square would attack it
+            or PAWN_ATTACKS[by ^ COLOUR_MASK][square] & pieces[by | PAWN]
+        ):
+            return True
+
+        occupied = pieces[WHITE] | pieces[BLACK]
+
+        diagonal = pieces[by | BISHOP] | pieces[by | QUEEN]
+
+        if BISHOP_RAYS[square] & diagonal and bishop_attacks(square, occupied) & diagonal:
+            return True
+
+        straight = pieces[by | ROOK] | pieces[by | QUEEN]
+
+        return bool(ROOK_RAYS[square] & straight and rook_attacks(square, occupied) & straight)
+
+    def in_check(self) -> bool:
+        return self.is_attacked(self.pieces[self.side | KING].bit_length() - 1, self.side ^ COLOUR_MASK)
+
+    def make_move(self, move: int) -> None:
+        # Plays a move without checking that it is legal
+        squares = self.squares
+        pieces = self.pieces
+
+        source = move & 63
+        destination = move >> 6 & 63
+        source_bit = 1 << source
+        destination_bit = 1 << destination
+
+        piece = squares[source]
+        colour = piece & COLOUR_MASK
+        captured = squares[destination]
+
+        if captured:
+            pieces[captured] ^= destination_bit
+            pieces[captured & COLOUR_MASK] ^= destination_bit
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+
+        moved = source_bit | destination_bit
+        pieces[piece] ^= moved
+        pieces[colour] ^= moved
+        squares[source] = 0
+        squares[destination] = piece
+
+        en_passant = -1
+        kind = piece & TYPE_MASK
+
+        if kind == PAWN:
+            self.halfmove_clock = 0
+
+            if destination == self.en_passant:
+                # The captured pawn is behind the destination square
+                captured_square = destination - 8 if colour == WHITE else destination + 8
+                captured = squares[captured_square]
+                bit = 1 << captured_square
+
+                pieces[captured] ^= bit
+                pieces[captured & COLOUR_MASK] ^= bit
+                squares[captured_square] = 0
+            elif destination - source in (16, -16):
+                en_passant = (source + destination) >> 1
+            elif destination_bit & (RANK_1 | RANK_8):
+                # A promotion without a piece is to a queen, like the engine's playUCIMove
+                promoted = colour | (PROMOTION_PIECES[move >> 12] or QUEEN)
+
+                pieces[piece] ^= destination_bit
+                pieces[promoted] ^= destination_bit
+                squares[destination] = promoted
+        elif kind == KING and destination - source in (2, -2):
+            rook_source, rook_destination = CASTLING_ROOKS[destination]
+            rook = squares[rook_source]
+            rook_moved = 1 << rook_source | 1 << rook_destination
+
+            pieces[rook] ^= rook_moved
+            pieces[colour] ^= rook_moved
+            squares[rook_source] = 0
+            squares[rook_destination] = rook
+
+        self.castling &= CASTLING_MASKS[source] & CASTLING_MASKS[destination]
+        self.en_passant = en_passant
+
+        if colour == BLACK:
+            self.fullmove_number += 1
+
+        self.side = colour ^ COLOUR_MASK
+
+    def castling_moves(self, occupied: int) -> list[int]:
+        # Castling moves where the squares between the king and rook are empty and the king doesn't start in or pass
+        # through check. Whether the king ends in check is left to the legality test every move gets
+        if not self.castling:
+            return []
+
+        moves = []
+        opponent = self.side ^ COLOUR_MASK
+
+        if self.side == WHITE:
+            if (
+                self.castling & WHITE_KINGSIDE
+                and not occupied & 0x60
+                and not self.is_attacked(4, opponent)
+                and not self.is_attacked(5, opponent)
+            ):
+                moves.append(4 | 6 << 6)
+
+            if (
+                self.castling & WHITE_QUEENSIDE
+                and not occupied & 0x0E
+                and not self.is_attacked(4, opponent)
+                and not self.is_attacked(3, opponent)
+            ):
+                moves.append(4 | 2 << 6)
+        else:
+            if (
+                self.castling & BLACK_KINGSIDE
+                and not occupied & 0x60 << 56
+                and not self.is_attacked(60, opponent)
+                and not self.is_attacked(61, opponent)
+            ):
+                moves.append(60 | 62 << 6)
+
+            if (
+                self.castling & BLACK_QUEENSIDE
+                and not occupied & 0x0E << 56
+                and not self.is_attacked(60, opponent)
+                and not self.is_attacked(59, opponent)
+            ):
+                moves.append(60 | 58 << 6)
+
+        return moves
+
+    def pseudo_legal_moves(self) -> list[int]:
+        # Every move that follows the movement rules, including those that leave the king in check
+        pieces = self.pieces
+        side = self.side
+
+        own = pieces[side]
+        enemy = pieces[side ^ COLOUR_MASK]
+        occupied = own | enemy
+        not_own = FULL ^ own
+
+        moves = []
+        append = moves.append
+
+        for kind in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            bitboard = pieces[side | kind]
+
+            while bitboard:
+                bit = bitboard & -bitboard
+                bitboard ^= bit
+                source = bit.bit_length() - 1
+
+                if kind == KNIGHT:
+                    targets = KNIGHT_ATTACKS[source]
+                elif kind == BISHOP:
+                    targets = bishop_attacks(source, occupied)
+                elif kind == ROOK:
+                    targets = rook_attacks(source, occupied)
+                elif kind == QUEEN:
+                    targets = bishop_attacks(source, occupied) | rook_attacks(source, occupied)
+                else:
+                    targets = KING_ATTACKS[source]
+
+                targets &= not_own
+
+                while targets:
+                    bit = targets & -targets
+                    targets ^= bit
+                    append(source | (bit.bit_length() - 1) << 6)
+
+        moves.extend(self.castling_moves(occupied))
+
+        # Pawns are moved all at once by shifting their bitboard, each shift is paired with how far it moves them
+        pawns = pieces[side | PAWN]
+        empty = FULL ^ occupied
+        capturable = enemy | (1 << self.en_passant if self.en_passant >= 0 else 0)
+
+        if side == WHITE:
+            single = pawns << 8 & empty
+            shifts = (
+                (single, 8),
+                ((single & RANK_1 << 16) << 8 & empty, 16),
+                ((pawns & ~FILE_A) << 7 & capturable, 7),
+                ((pawns & ~FILE_H) << 9 & capturable, 9),
+            )
+        else:
+            single = pawns >> 8 & empty
+            shifts = (
+                (single, -8),
+                ((single & RANK_1 << 40) >> 8 & empty, -16),
+                ((pawns & ~FILE_A) >> 9 & capturable, -9),
+                ((pawns & ~FILE_H) >> 7 & capturable, -7),
+            )
+
+        for targets, offset in shifts:
+            while targets:
+                bit = targets & -targets
+                targets ^= bit
+                destination = bit.bit_length() - 1
+                move = (destination - offset) | destination << 6
+
+                if bit & (RANK_1 | RANK_8):
+                    for promotion in PROMOTION_ORDER:
+                        append(move | promotion)
+                else:
+                    append(move)
+
+        return moves
+
+    def is_legal_after(self, move: int) -> bool:
+        # Whether the king of the side to move is safe after a pseudo-legal move
+        source = move & 63
+        destination = move >> 6 & 63
+        kind = self.squares[source] & TYPE_MASK
+
+        # King moves and en passant move more than one piece's worth of the board, so they are played on a copy
+        if kind == KING or (kind == PAWN and destination == self.en_passant):
+            board = self.copy()
+            board.make_move(move)
+
+            return not board.is_attacked(board.pieces[self.side | KING].bit_length() - 1, board.side)
+
+        # Any other move only changes which squares are occupied and removes the piece it captures, so the attacks on
+        # the king are tested against those without making the move
+        pieces = self.pieces
+        opponent = self.side ^ COLOUR_MASK
+        king = pieces[self.side | KING].bit_length() - 1
+        remaining = FULL ^ 1 << destination
+        occupied = (pieces[WHITE] | pieces[BLACK]) ^ 1 << source | 1 << destination
+
+        if (
+            KNIGHT_ATTACKS[king] & pieces[opponent | KNIGHT] & remaining
+            or PAWN_ATTACKS[self.side][king] & pieces[opponent | PAWN] & remaining
+        ):
+            return False
+
+        diagonal = (pieces[opponent | BISHOP] | pieces[opponent | QUEEN]) & remaining
+
+        if BISHOP_RAYS[king] & diagonal and bishop_attacks(king, occupied) & diagonal:
+            return False
+
+        straight = (pieces[opponent | ROOK] | pieces[opponent | QUEEN]) & remaining
+
+        return not (ROOK_RAYS[king] & straight and rook_attacks(king, occupied) & straight)
+
+    def legal_moves(self, first_only: bool = False) -> list[int]:
+        side = self.side
+        king = self.pieces[side | KING].bit_length() - 1
+        in_check = self.is_attacked(king, side ^ COLOUR_MASK)
+        king_lines = KING_LINES[king]
+
+        legal = []
+
+        for move in self.pseudo_legal_moves():
+            source = move & 63
+
+            # A piece off every line through the king can't uncover an attack on it, so the move is legal unless the
+            # king is in check, and then only if it captures the checker or blocks, which all happen on those lines
+            # The king itself and en passant (which also removes a pawn from elsewhere) always get the full test
+            if (
+                source != king
+                and not king_lines >> source & 1
+                and not (move >> 6 & 63 == self.en_passant and self.squares[source] & TYPE_MASK == PAWN)
+            ):
+                if not in_check:
+                    legal.append(move)
+                elif king_lines >> (move >> 6 & 63) & 1 and self.is_legal_after(move):
+                    legal.append(move)
+            elif self.is_legal_after(move):
+                legal.append(move)
+
+            if legal and first_only:
+                break
+
+        return legal
+
+    def has_legal_move(self) -> bool:
+        return bool(self.legal_moves(first_only=True))
+
+    def play_moves(self, moves: list[int], first_number: int = 1) -> None:
+        # Plays each move in turn, raising IllegalMoveError at the first one that isn't legal
+        # first_number is the number of the first move in the game, for the error messages
+        # This is the hot path for checking archived games, so it is make_move inlined with the board held in locals, and
+        # only tests whether a king is attacked when the move could have changed that. The board shouldn't be used after
+        # an IllegalMoveError
+        squares = self.squares
+        pieces = self.pieces
+        side = self.side
+        castling = self.castling
+        en_passant = self.en_passant
+        halfmove_clock = self.halfmove_clock
+        fullmove_number = self.fullmove_number
+
+        is_attacked = self.is_attacked
+        in_check = self.in_check()
+
+        for index, move in enumerate(moves):
+            source = move & 63
+            destination = move >> 6 & 63
+            source_bit = 1 << source
+            destination_bit = 1 << destination
+            opponent = side ^ COLOUR_MASK
+
+            piece = squares[source]
+            captured = squares[destination]
+            kind = piece & TYPE_MASK
+            promotion = move >> 12
+
+            if piece & COLOUR_MASK != side or captured & COLOUR_MASK == side:
+                valid = False
+            elif kind == PAWN:
+                forward = 8 if side == WHITE else -8
+
+                if destination == source + forward:
+                    valid = not captured
+                elif destination == source + 2 * forward:
+                    valid = not captured and not squares[source + forward] and source >> 3 == (1 if side == WHITE else 6)
+                else:
+                    valid = PAWN_ATTACKS[side][source] & destination_bit and (captured or destination == en_passant)
+
+                if promotion and not destination_bit & (RANK_1 | RANK_8):
+                    valid = False
+            elif promotion:
+                valid = False
+            elif kind == KNIGHT:
+                valid = KNIGHT_ATTACKS[source] & destination_bit
+            elif kind == KING:
+                valid = KING_ATTACKS[source] & destination_bit
+
+                if not valid and move in CASTLING_PATHS:
+                    right, between, passed = CASTLING_PATHS[move]
+                    valid = (
+                        castling & right
+                        and not (pieces[WHITE] | pieces[BLACK]) & between
+                        and not in_check
+                        and not is_attacked(passed, opponent)
+                    )
+            else:
+                rays = BISHOP_RAYS if kind == BISHOP else ROOK_RAYS if kind == ROOK else QUEEN_RAYS
+                valid = rays[source] & destination_bit and not BETWEEN[source * 64 + destination] & (
+                    pieces[WHITE] | pieces[BLACK]
+                )
+
+            if not valid:
+                raise IllegalMoveError(f"Move {first_number + index} ({move_to_uci(move)}) is not legal")
+
+            # Make the move
+            if captured:
+                pieces[captured] ^= destination_bit
+                pieces[opponent] ^= destination_bit
+                halfmove_clock = 0
+            else:
+                halfmove_clock += 1
+
+            moved = source_bit | destination_bit
+            pieces[piece] ^= moved
+            pieces[side] ^= moved
+            squares[source] = 0
+            squares[destination] = piece
+
+            # Moves that take a piece off a line, or that are hard to reason about, get the full tests for check
+            special = False
+            new_en_passant = -1
+
+            if kind == PAWN:
+                halfmove_clock = 0
+
+                if destination == en_passant:
+                    captured_square = destination - forward
+                    bit = 1 << captured_square
+
+                    pieces[opponent | PAWN] ^= bit
+                    pieces[opponent] ^= bit
+                    squares[captured_square] = 0
+                    special = True
+                elif destination - source in (16, -16):
+                    new_en_passant = source + forward
+                elif destination_bit & (RANK_1 | RANK_8):
+                    promoted = side | (PROMOTION_PIECES[promotion] or QUEEN)
+
+                    pieces[piece] ^= destination_bit
+                    pieces[promoted] ^= destination_bit
+                    squares[destination] = promoted
+            elif kind == KING:
+                special = True
+
+                if destination - source in (2, -2):
+                    rook_source, rook_destination = CASTLING_ROOKS[destination]
+                    rook_moved = 1 << rook_source | 1 << rook_destination
+
+                    pieces[side | ROOK] ^= rook_moved
+                    pieces[side] ^= rook_moved
+                    squares[rook_source] = 0
+                    squares[rook_destination] = side | ROOK
+
+            castling &= CASTLING_MASKS[source] & CASTLING_MASKS[destination]
+            en_passant = new_en_passant
+
+            # The mover's king can only have been exposed if it moved, was in check, or the piece left one of its lines
+            king = pieces[side | KING].bit_length() - 1
+
+            if (special or in_check or QUEEN_RAYS[king] & source_bit) and is_attacked(king, opponent):
+                raise IllegalMoveError(f"Move {first_number + index} ({move_to_uci(move)}) leaves the king in check")
+
+            # The opponent is in check from a discovered attack, which needs the full test, or from the piece that moved
+            opponent_king = pieces[opponent | KING].bit_length() - 1
+
+            if special or QUEEN_RAYS[opponent_king] & source_bit:
+                in_check = is_attacked(opponent_king, side)
+            else:
+                mover = squares[destination] & TYPE_MASK
+
+                if mover == KNIGHT:
+                    in_check = KNIGHT_ATTACKS[destination] >> opponent_king & 1
+                elif mover == PAWN:
+                    in_check = PAWN_ATTACKS[side][destination] >> opponent_king & 1
+                else:
+                    rays = BISHOP_RAYS if mover == BISHOP else ROOK_RAYS if mover == ROOK else QUEEN_RAYS
+                    in_check = rays[destination] >> opponent_king & 1 and not BETWEEN[
+                        destination * 64 + opponent_king
+                    ] & (pieces[WHITE] | pieces[BLACK])
+
+            if side == BLACK:
+                fullmove_number += 1
+
+            side = opponent
+
+        self.side = side
+        self.castling = castling
+        self.en_passant = en_passant
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_number = fullmove_number
@@ -0,0 +1,36 @@
+from chess_rules.bitboards import move_to_uci
+from chess_rules.board import Board
+
+
+def perft(board: Board, depth: int) -> int:
+    # Number of leaf positions after depth plies of legal moves, for checking the move generator against known counts
+    # https://www.chessprogramming.org/Perft
+    if depth == 0:
+        return 1
+
+    moves = board.legal_moves()
+
+    # Every legal move at the last ply is one leaf, so they don't need to be played
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+
+    for move in moves:
+        child = board.copy()
+        child.make_move(move)
+        nodes += perft(child, depth - 1)
+
+    return nodes
+
+
+def divide(board: Board, depth: int) -> dict[str, int]:
+    # perft split by root move, to find which move a wrong count comes from
+    counts = {}
+
+    for move in board.legal_moves():
+        child = board.copy()
+        child.make_move(move)
+        counts[move_to_uci(move)] = perft(child, depth - 1)
+
+    return counts
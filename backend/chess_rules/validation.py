@@ -0,0 +1,206 @@
+import bisect
+import itertools
+from typing import Iterator
+
+from chess_rules.bitboards import BLACK, PAWN, TYPE_MASK, UCI_MOVES, WHITE, move_to_uci, uci_to_move
+from chess_rules.board import Board, IllegalMoveError
+from chess_rules.zobrist import zobrist_hash
+
+# Game results as posted by the frontend, the winner is the colour that won or 0 for a draw
+CHECKMATE = "Checkmate"
+STALEMATE = "Stalemate"
+
+# Copied for each game instead of parsing the starting FEN every time
+starting_board = Board()
+
+# Moves onto the last rank from the one before it without a promotion letter, which are promotions when a pawn moves
+LETTERLESS_PROMOTIONS = {move & 0xFFF for move in UCI_MOVES.values() if move >> 12}
+# Promotion numbers (as in bitboards.PROMOTION_PIECES) in the order they are tried: queen, knight, rook, bishop
+PROMOTION_PREFERENCE = (4, 1, 3, 2)
+# Readings of a move list checked by validate_move_list before giving up, each letterless promotion can multiply them
+MAX_READINGS = 64
+# Promotion pieces tried per move list before only queens are tried, so a move list full of letterless promotions
+# can't make the search exponential
+MAX_BRANCHES = 256
+
+
+class Search:
+    # State shared by the recursive calls of resolved_games, and the positions they record on the way
+    # hashed_plies: the Zobrist hash of the position before each of the first hashed_plies moves is recorded
+    # snapshot_interval: the FEN of every snapshot_interval-th position is recorded (none when 0)
+    __slots__ = ("errors", "branches", "hashed_plies", "snapshot_interval", "letterless")
+
+    def __init__(self, hashed_plies: int = 0, snapshot_interval: int = 0):
+        self.errors = []
+        self.branches = 0
+        self.hashed_plies = hashed_plies
+        self.snapshot_interval = snapshot_interval
+        # Indexes of the moves in LETTERLESS_PROMOTIONS, set by resolve_moves
+        self.letterless = []
+
+    def next_letterless(self, moves: list[int], index: int) -> int:
+        # The index of the first move from index on that is still a letterless promotion, or len(moves)
+        position = bisect.bisect_left(self.letterless, index)
+
+        # A reading that has just filled in the promotion at index carries on from it
+        if position < len(self.letterless) and moves[self.letterless[position]] not in LETTERLESS_PROMOTIONS:
+            position += 1
+
+        return self.letterless[position] if position < len(self.letterless) else len(moves)
+
+    def next_checkpoint(self, ply: int) -> int:
+        # The next ply after ply with a position to record
+        if ply + 1 < self.hashed_plies:
+            return ply + 1
+
+        if self.snapshot_interval:
+            return (ply // self.snapshot_interval + 1) * self.snapshot_interval
+
+        return 1 << 30
+
+    def record(self, ply: int, board: Board, moves: list[int], hashes: dict, snapshots: dict) -> None:
+        if ply < self.hashed_plies and ply < len(moves):
+            hashes[ply] = zobrist_hash(board)
+
+        if self.snapshot_interval and ply % self.snapshot_interval == 0:
+            snapshots[ply] = board.fen()
+
+
+class ValidatedGame:
+    # A finished game as checked by validate_move_list
+    # position_hashes are the hashes of the positions before each of the first moves, snapshots are (ply, FEN) pairs
+    __slots__ = ("result", "winner", "move_list", "position_hashes", "snapshots")
+
+    def __init__(self, result: str, winner: int, move_list: str, position_hashes: list[int], snapshots: list[tuple]):
+        self.result = result
+        self.winner = winner
+        self.move_list = move_list
+        self.position_hashes = position_hashes
+        self.snapshots = snapshots
+
+
+def parse_move_list(move_list: str) -> list[int]:
+    # Moves from the engine's getMoveListString, e.g. "e2e4 e7e5 e7e8q"
+    try:
+        return [uci_to_move(text) for text in move_list.split(" ")]
+    except KeyError:
+        raise IllegalMoveError("The move list is not a space separated list of moves like e2e4")
+
+
+def resolved_games(
+    board: Board, moves: list[int], start: int, search: Search, hashes: dict, snapshots: dict
+) -> Iterator[tuple[list[int], Board, dict, dict]]:
+    # Yields (moves, final board, hashes, snapshots) for each way of choosing the pieces of the promotions without a
+    # letter from moves[start] on that makes every move legal, where board is the position before moves[start]
+    # The engine's getMoveListString leaves the letter off every promotion, including the computer's underpromotions, so
+    # each piece is tried in turn, queen first. IllegalMoveErrors are added to search.errors instead of being raised
+    # The moves are played in runs between the plies search records, so the game is only replayed once
+    index = start
+
+    while True:
+        search.record(index, board, moves, hashes, snapshots)
+
+        end = min(search.next_letterless(moves, index), search.next_checkpoint(index))
+
+        if end > index:
+            try:
+                board.play_moves(moves[index:end], first_number=index + 1)
+            except IllegalMoveError as error:
+                search.errors.append(error)
+                return
+
+            index = end
+            continue
+
+        if index == len(moves):
+            yield moves, board, hashes, snapshots
+            return
+
+        move = moves[index]
+
+        if board.squares[move & 63] & TYPE_MASK == PAWN:
+            for promotion in PROMOTION_PREFERENCE if search.branches < MAX_BRANCHES else PROMOTION_PREFERENCE[:1]:
+                search.branches += 1
+                promoted = moves[:index] + [move | promotion << 12] + moves[index + 1 :]
+                yield from resolved_games(board.copy(), promoted, index, search, dict(hashes), dict(snapshots))
+
+            return
+
+        # Another piece moving onto the last rank, which can't be a promotion
+        try:
+            board.play_moves([move], first_number=index + 1)
+        except IllegalMoveError as error:
+            search.errors.append(error)
+            return
+
+        index += 1
+
+
+def resolve_moves(moves: list[int], search: Search | None = None) -> Iterator[tuple[list[int], Board, dict, dict]]:
+    # Yields (moves, final board, hashes, snapshots) for every reading of the moves that is legal from the starting
+    # position, with the promotions that had no letter filled in. Readings with a promotion filled in have a new list of
+    # moves. Raises IllegalMoveError if there are none, with the error from the reading that promotes to a queen
+    # whenever it can
+    search = search or Search()
+    search.letterless = [index for index, move in enumerate(moves) if move in LETTERLESS_PROMOTIONS]
+    found = False
+
+    for game in resolved_games(starting_board.copy(), moves, 0, search, {}, {}):
+        found = True
+        yield game
+
+    if not found:
+        raise search.errors[0]
+
+
+def replay_move_list(move_list: str) -> Board:
+    # The position after playing every move from the starting position, raising IllegalMoveError at the first illegal one
+    # A promotion without a piece letter is to a queen, unless only another piece makes the rest of the game legal
+    return next(resolve_moves(parse_move_list(move_list)))[1]
+
+
+def game_outcome(board: Board) -> tuple[str, int] | None:
+    # The (game result, winner) of a finished game, or None if the side to move still has a legal move
+    if board.has_legal_move():
+        return None
+
+    if board.in_check():
+        return CHECKMATE, BLACK if board.side == WHITE else WHITE
+
+    return STALEMATE, 0
+
+
+def validate_move_list(
+    move_list: str, expected: tuple[str, int] | None = None, hashed_plies: int = 0, snapshot_interval: int = 0
+) -> ValidatedGame:
+    # Replays a finished game and returns its result, its move list with every promotion letter filled in, and the
+    # positions asked for by hashed_plies and snapshot_interval (see Search), so they don't need another replay
+    # When the promotions without a letter can be read more than one way, the reading that ends in the expected
+    # (game result, winner) is preferred
+    first = None
+    parsed = parse_move_list(move_list)
+    readings = resolve_moves(parsed, Search(hashed_plies, snapshot_interval))
+
+    for moves, board, hashes, snapshots in itertools.islice(readings, MAX_READINGS):
+        outcome = game_outcome(board)
+
+        if outcome is None:
+            continue
+
+        game = ValidatedGame(
+            *outcome,
+            # The letters only need filling in when a promotion was resolved
+            move_list if moves is parsed else " ".join(move_to_uci(move) for move in moves),
+            [hashes[ply] for ply in sorted(hashes)],
+            sorted(snapshots.items()),
+        )
+
+        if expected is None or outcome == expected:
+            return game
+
+        first = first or game
+
+    if first is None:
+        raise IllegalMoveError("The game has not finished")
+
+    return first
@@ -0,0 +1,40 @@
+import random
+
+from chess_rules.bitboards import BLACK, COLOUR_MASK, KING, PAWN, PAWN_ATTACKS, WHITE
+from chess_rules.board import PIECE_LETTERS, Board
+
+# Zobrist hashing: a position's hash is the XOR of a random 64 bit key for each of its features, so equal positions
+# reached by different move orders get the same hash
+# The keys come from a fixed seed, so hashes stay the same between runs and can be stored
+key_generator = random.Random(0x5A0B2157)
+
+# PIECE_KEYS[piece][square]
+PIECE_KEYS = [
+    [key_generator.getrandbits(64) for _ in range(64)] if piece in PIECE_LETTERS else None
+    for piece in range((WHITE | KING) + 1)
+]
+BLACK_TO_MOVE_KEY = key_generator.getrandbits(64)
+# Indexed by the castling rights bits
+CASTLING_KEYS = [key_generator.getrandbits(64) for _ in range(16)]
+# Indexed by the file of the en passant square
+EN_PASSANT_KEYS = [key_generator.getrandbits(64) for _ in range(8)]
+
+
+def zobrist_hash(board: Board) -> int:
+    position_hash = CASTLING_KEYS[board.castling]
+
+    for square, piece in enumerate(board.squares):
+        if piece:
+            position_hash ^= PIECE_KEYS[piece][square]
+
+    if board.side == BLACK:
+        position_hash ^= BLACK_TO_MOVE_KEY
+
+    # The en passant square only counts when a pawn could actually capture onto it, otherwise every double pawn push
+    # would make a position look different from the same position reached another way
+    if board.en_passant >= 0 and (
+        PAWN_ATTACKS[board.side ^ COLOUR_MASK][board.en_passant] & board.pieces[board.side | PAWN]
+    ):
+        position_hash ^= EN_PASSANT_KEYS[board.en_passant % 8]
+
+    return position_hash
@@ -4,6 +4,28 @@ import os
 class Config:
     """Base config."""
 
+    # Number of verified tokens to remember (0 disables the cache) and for how many seconds each is trusted
+    VERIFICATION_CACHE_SIZE = 0
+    VERIFICATION_CACHE_TTL = 300
+
+    # Number of processes to sign tokens and hash passwords in (0 does the work in the request thread)
+    CRYPTO_EXECUTOR_WORKERS = 0
+
+    # Maximum number of read-only SQLite connections and seconds to wait for a free connection
+    DATABASE_POOL_SIZE = 4
+    DATABASE_POOL_TIMEOUT = 10
+    # Key of database.pragma_profiles to apply to every connection
+    DATABASE_PRAGMA_PROFILE = "wal"
+    # Commit writes from concurrent requests together in one transaction, at most every DELAY seconds or every SIZE
+    # writes, rather than each in its own. This pays off when every commit syncs to disk (the "default" profile)
+    DATABASE_GROUP_COMMIT = False
+    DATABASE_GROUP_COMMIT_DELAY = 0.001
+    DATABASE_GROUP_COMMIT_SIZE = 64
+
+    # Seconds between deletions of expired share links (0 never deletes them) and links deleted per transaction
+    LINK_REAPER_INTERVAL = 3600
+    LINK_REAPER_BATCH_SIZE = 500
+
 
 class ProdConfig(Config):
     FLASK_ENV = "production"
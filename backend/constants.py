@@ -14,6 +14,13 @@ passwordRegex = r"^(?=.*\d)(?=.*[a-z])(?=.*[A-Z])(?=.*[a-zA-Z]).{8,32}$"
 
 database_path = r"./database/data/data.db"  # In the docker container
 
+# Saved multiples of the curve generator, kept on the same volume as the database so it survives container restarts
+generator_table_path = r"./database/data/generator_table.json"
+
 token_dur = 2630000  # 1 month in seconds
 
+max_games_page_size = 100
+
+max_positions_page_size = 500  # plies
+
 salt_bytelength = 4
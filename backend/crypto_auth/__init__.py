@@ -2,20 +2,118 @@ import time
 import json
 import base64
 import math
+import struct
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from hashlib import sha256
 from random import SystemRandom
 
 from crypto_auth import elliptic_curve
+from crypto_auth.verification_cache import VerificationCache
 import constants
 
 
 dict_to_json = lambda d: json.dumps(d, sort_keys=True, separators=(",", ":"))  # consistancy between messages
 
+# Cache of already verified tokens, disabled unless enable_verification_cache is called
+verification_cache: VerificationCache | None = None
+
+
+def enable_verification_cache(max_size: int = 1024, ttl: float = 300) -> VerificationCache:
+    global verification_cache
+
+    verification_cache = VerificationCache(max_size=max_size, ttl=ttl)
+
+    return verification_cache
+
+
+# Pool of processes that signing and password hashing can be sent to, disabled unless start_crypto_executor is called
+crypto_executor: ProcessPoolExecutor | None = None
+
+
+def start_crypto_executor(max_workers: int) -> ProcessPoolExecutor:
+    global crypto_executor
+
+    shutdown_crypto_executor()
+
+    # Forked so the processes start with the generator table (and everything else) already loaded. Forking while
+    # another thread might hold a lock can deadlock the children, so once other threads are running the processes are
+    # started from a clean forkserver instead (and build the table themselves on first use)
+    start_method = "fork" if threading.active_count() == 1 else "forkserver"
+    crypto_executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(start_method))
+
+    # A forking pool starts all of its processes on the first submit, so do it now rather than in the middle of a request
+    crypto_executor.submit(int).result()
+
+    atexit.register(shutdown_crypto_executor)
+
+    return crypto_executor
+
+
+def shutdown_crypto_executor() -> None:
+    global crypto_executor
+
+    if crypto_executor is not None:
+        # Lets submitted work finish so no request is left waiting on a future that never completes
+        crypto_executor.shutdown(wait=True)
+        crypto_executor = None
+
+
+def offload(function, *args, **kwargs):
+    # Runs function in the crypto executor if it has been started, otherwise in the calling thread
+    # The calling thread still waits for the result, but it doesn't hold the GIL while the work is done
+    if crypto_executor is None:
+        return function(*args, **kwargs)
+
+    return crypto_executor.submit(function, *args, **kwargs).result()
+
+
+# Compact tokens are the claims packed into fixed width fields followed by the raw signature, all base64url encoded
+# Layout: version, authorisation_level, signedAt, invalidAt, id, gameid (0 when the token has no gameid)
+compact_token_version = 1
+compact_claims = struct.Struct(">BBIIQQ")
+compact_claim_keys = {"authorisation_level", "id", "gameid"}
+signature_bytelength = 2 * math.ceil(elliptic_curve.curve.n_bitlength / 8)
+
+
+def is_packable_id(value) -> bool:
+    # Only ids that turn back into exactly the same string can be packed as integers
+    return type(value) == str and value.isdigit() and str(int(value)) == value and 0 < int(value) < 2**64
+
+
+def can_be_compact(msg: dict) -> bool:
+    return (
+        set(msg) <= compact_claim_keys
+        and type(msg.get("authorisation_level")) == int
+        and 0 <= msg["authorisation_level"] < 256
+        and is_packable_id(msg.get("id"))
+        and ("gameid" not in msg or is_packable_id(msg["gameid"]))
+    )
+
 
 def create_token(msg: dict, duration: int = 86400, private_key: int = 0) -> str:
     if not private_key:
         raise ValueError("Private key must be specified")
 
+    if can_be_compact(msg):
+        signed_at = int(time.time())
+
+        claims = compact_claims.pack(
+            compact_token_version,
+            msg["authorisation_level"],
+            signed_at,
+            signed_at + duration,
+            int(msg["id"]),
+            int(msg.get("gameid", 0)),
+        )
+
+        signature = elliptic_curve.curve.createSignature(claims, private_key)
+
+        return base64.urlsafe_b64encode(claims + signature.to_bytes(signature_bytelength, "big")).decode().rstrip("=")
+
+    # Claims that don't fit the compact layout use the original JSON token format
     current_time = time.time()
 
     msg["signedAt"] = current_time
@@ -25,39 +123,129 @@ def create_token(msg: dict, duration: int = 86400, private_key: int = 0) -> str:
 
     signature = elliptic_curve.curve.createSignature(bytes(jsonified_message, "utf-8"), private_key)
 
-    base64_signature = base64.b64encode(
-        int.to_bytes(signature, length=2 * math.ceil(elliptic_curve.curve.n_bitlength / 8), byteorder="big")
-    ).decode()
+    base64_signature = base64.b64encode(int.to_bytes(signature, length=signature_bytelength, byteorder="big")).decode()
 
     msg["signature"] = base64_signature
 
     return base64.b64encode(bytes(dict_to_json(msg), "utf-8")).decode()
 
 
+def unpack_token(token: str) -> tuple:
+    # Splits a token of either format into its claims (including signedAt and invalidAt), the signed bytes and the
+    # signature. Raises ValueError, KeyError or TypeError if the token is malformed
+    # urlsafe_b64decode also accepts the standard alphabet used by JSON tokens
+    token_bytes = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+
+    if token_bytes[:1] == b"{":
+        # base64 json to dictionary
+        msg = json.loads(token_bytes.decode())
+
+        signature = int.from_bytes(base64.b64decode(msg["signature"]), byteorder="big")
+
+        del msg["signature"]
+
+        # The signed bytes have to be rebuilt as the signature is inside the JSON
+        return msg, bytes(dict_to_json(msg), "utf-8"), signature
+
+    if len(token_bytes) != compact_claims.size + signature_bytelength or token_bytes[0] != compact_token_version:
+        raise ValueError("Unknown token format")
+
+    (_, authorisation_level, signed_at, invalid_at, user_id, game_id) = compact_claims.unpack_from(token_bytes)
+
+    msg = {"authorisation_level": authorisation_level, "id": str(user_id), "signedAt": signed_at, "invalidAt": invalid_at}
+
+    if game_id:
+        msg["gameid"] = str(game_id)
+
+    # The signed bytes are just the claims at the start of the token
+    return (
+        msg,
+        token_bytes[: compact_claims.size],
+        int.from_bytes(token_bytes[compact_claims.size :], byteorder="big"),
+    )
+
+
+def decode(token: str) -> dict | None:
+    # The payload of a token WITHOUT checking its signature or expiry, only use it to decide whether to verify a token
+    try:
+        return unpack_token(token)[0]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def split_token(token: str) -> tuple:
+    # Splits a token into its message, the signed bytes and the signature, or a failure dictionary if it can't be used
+    if not token:
+        return {"failure": "Token not provided"}, None, None
+
+    # Anything that doesn't unpack into claims with a numeric expiry is rejected the same way as a bad signature
+    try:
+        msg, message_bytearray, signature = unpack_token(token)
+        expired = time.time() > msg["invalidAt"]
+    except (ValueError, KeyError, TypeError):
+        return {"failure": "Token malformed"}, None, None
+
+    if expired:
+        return {"failure": "Token expired"}, None, None
+
+    return msg, message_bytearray, signature
+
+
+def verified_message(msg: dict) -> dict:
+    del msg["signedAt"]
+    del msg["invalidAt"]
+    msg["failure"] = False
+
+    return msg
+
+
 def verify(token: str, public_key: int) -> dict:
     if not token:
         return {"failure": "Token not provided"}
-    # base64 json to dictionary
-    msg = json.loads(base64.b64decode(token).decode())
 
-    if time.time() > msg["invalidAt"]:
-        return {"failure": "Token expired"}
+    if verification_cache is not None:
+        cached_token = verification_cache.get(token, public_key)
 
-    signature = int.from_bytes(base64.b64decode(msg["signature"]), byteorder="big")
+        if cached_token is not None:
+            return cached_token
 
-    del msg["signature"]
+    msg, message_bytearray, signature = split_token(token)
 
-    message_bytearray = bytes(dict_to_json(msg), "utf-8")
+    if message_bytearray is None:
+        return msg
 
     if elliptic_curve.curve.verifySignature(message_bytearray, signature, public_key):
-        del msg["signedAt"]
-        del msg["invalidAt"]
-        msg["failure"] = False
+        invalid_at = msg["invalidAt"]
+
+        msg = verified_message(msg)
+
+        if verification_cache is not None:
+            verification_cache.put(token, public_key, msg, invalid_at)
+
         return msg
     else:
         return {"failure": "Token signature invalid"}
 
 
+def verify_many(tokens: list, public_key: int) -> list:
+    # Same results as calling verify on each token, but the signatures are checked together with verify_batch
+    split_tokens = [split_token(token) for token in tokens]
+
+    # Only tokens that weren't rejected while splitting need their signature checked
+    to_check = [i for i, (_, message_bytearray, _) in enumerate(split_tokens) if message_bytearray is not None]
+
+    valid = elliptic_curve.curve.verify_batch(
+        [split_tokens[i][1] for i in to_check], [split_tokens[i][2] for i in to_check], public_key
+    )
+
+    results = [msg for msg, _, _ in split_tokens]
+
+    for i, is_valid in zip(to_check, valid):
+        results[i] = verified_message(results[i]) if is_valid else {"failure": "Token signature invalid"}
+
+    return results
+
+
 def create_password_hash(password: str, salt: int | None = None) -> str:
     salt = (
         int.from_bytes(SystemRandom().randbytes(constants.salt_bytelength), byteorder="big") if salt is None else salt
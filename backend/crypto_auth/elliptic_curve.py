@@ -1,3 +1,9 @@
+import hmac
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
 from hashlib import sha512
 from math import log2, ceil
 from random import SystemRandom
@@ -7,6 +13,14 @@ from random import SystemRandom
 # Not valid for any elliptic curves with the constant, b, != 0. <class>.point_at_infinity must be changed to a point not on the curve
 class EllipticCurve:
     HASH_LENGTH: int = 512
+    # Number of scalar bits handled at once by the windowed multiplications (and by each row of the table for G)
+    WINDOW_BITS: int = 4
+    # Number of validated public keys remembered by load_public_key
+    MAX_CACHED_PUBLIC_KEYS: int = 16
+    # Batches at least this big in verify_batch build a fixed-base table for the public key
+    FIXED_BASE_BATCH_SIZE: int = 32
+    # Number of private keys whose RFC 6979 HMAC state is remembered by deterministic_nonces
+    MAX_CACHED_PRIVATE_KEYS: int = 4
 
     def __init__(self, name: str, p: int, a: int, b: int, G: tuple, n: int) -> None:
         self.name = name
@@ -30,12 +44,28 @@ class EllipticCurve:
         assert b != 0
         self.point_at_infinity = (0, 0)
 
+        # In Jacobian coordinates (X, Y, Z) represents the affine point (X / Z^2, Y / Z^3), so any point with Z = 0 is 𝒪
+        self.jacobian_point_at_infinity = (1, 1, 0)
+
+        # Multiples of G, built on first use by precompute_generator_table
+        self.generator_table = None
+
+        # Validated public keys and their window tables, keyed by the integer form of the key, least recently used first
+        # Requests verify tokens from several threads at once, so the cache is only read or changed under its lock
+        self.public_keys = OrderedDict()
+        self.public_keys_lock = threading.Lock()
+
+        # HMACs that have already absorbed the key dependent part of the first RFC 6979 step, keyed by private key and
+        # least recently used first. Signing can happen on several threads, so this is also only used under its lock
+        self.nonce_hmacs = OrderedDict()
+        self.nonce_hmacs_lock = threading.Lock()
+
     def generate_key_pair(self):
         # Private key in the open inteval (0, n)
         private_key = SystemRandom().randrange(1, self.n)
 
         # private key x G = public key, so the public key is the 'private_key'th element in the group generated by G
-        (x, y) = self.scalar_multiplication(private_key, self.G)
+        (x, y) = self.to_affine(self.generator_multiplication(private_key))
         public_key = (x << self.n_bitlength) ^ y
 
         print(
@@ -118,6 +148,353 @@ class EllipticCurve:
 
         return total
 
+    def to_jacobian(self, p: tuple) -> tuple:
+        if p == self.point_at_infinity:
+            return self.jacobian_point_at_infinity
+
+        return (p[0], p[1], 1)
+
+    def to_affine(self, p: tuple) -> tuple:
+        if p[2] == 0:
+            return self.point_at_infinity
+
+        # The only modular inversion needed for a whole chain of Jacobian operations
+        z_inverse = pow(p[2], -1, self.p)
+        z_inverse_squared = (z_inverse * z_inverse) % self.p
+
+        return ((p[0] * z_inverse_squared) % self.p, (p[1] * z_inverse_squared * z_inverse) % self.p)
+
+    def jacobian_double(self, p: tuple) -> tuple:
+        (x, y, z) = p
+
+        # Doubling 𝒪 or a point with y = 0 (vertical tangent) gives 𝒪
+        if z == 0 or y == 0:
+            return self.jacobian_point_at_infinity
+
+        # Same tangent line as point_double, but the division by 2y is carried in Z instead of being inverted
+        y_squared = (y * y) % self.p
+        s = (4 * x * y_squared) % self.p
+        z_squared = (z * z) % self.p
+        m = (3 * x * x + self.a * z_squared * z_squared) % self.p
+
+        new_x = (m * m - 2 * s) % self.p
+        new_y = (m * (s - new_x) - 8 * y_squared * y_squared) % self.p
+        new_z = (2 * y * z) % self.p
+
+        return (new_x, new_y, new_z)
+
+    def jacobian_addition(self, p: tuple, q: tuple) -> tuple:
+        if p[2] == 0:
+            return q
+        if q[2] == 0:
+            return p
+
+        p_z_squared = (p[2] * p[2]) % self.p
+
+        # Bring both points to a common denominator so their coordinates can be compared
+        if q[2] == 1:
+            # q is already affine (e.g. a table entry), which saves four multiplications
+            u1 = p[0]
+            s1 = p[1]
+        else:
+            q_z_squared = (q[2] * q[2]) % self.p
+            u1 = (p[0] * q_z_squared) % self.p
+            s1 = (p[1] * q_z_squared * q[2]) % self.p
+
+        u2 = (q[0] * p_z_squared) % self.p
+        s2 = (q[1] * p_z_squared * p[2]) % self.p
+
+        # Same checks as point_addition, p = q needs the tangent and p = -q gives 𝒪
+        if u1 == u2:
+            if s1 == s2:
+                return self.jacobian_double(p)
+            else:
+                return self.jacobian_point_at_infinity
+
+        h = (u2 - u1) % self.p
+        r = (s2 - s1) % self.p
+        h_squared = (h * h) % self.p
+        h_cubed = (h_squared * h) % self.p
+        u1_h_squared = (u1 * h_squared) % self.p
+
+        new_x = (r * r - h_cubed - 2 * u1_h_squared) % self.p
+        new_y = (r * (u1_h_squared - new_x) - s1 * h_cubed) % self.p
+        new_z = (h * p[2] * q[2]) % self.p
+
+        return (new_x, new_y, new_z)
+
+    def jacobian_scalar_multiplication(self, scalar: int, point: tuple) -> tuple:
+        # Same point as scalar_multiplication, but left in Jacobian coordinates so it can be used in further operations
+        # before paying for the single inversion in to_affine
+        addend = self.to_jacobian(point)
+        total = self.jacobian_point_at_infinity
+
+        # Go from the most significant bit down, doubling the total each step and adding the point for each set bit
+        for bit in bin(scalar)[2:] if scalar > 0 else "":
+            total = self.jacobian_double(total)
+
+            if bit == "1":
+                total = self.jacobian_addition(total, addend)
+
+        return total
+
+    def fixed_base_table(self, point: tuple) -> list:
+        # Row i holds j x 2^(wi) x point for every w bit digit j, so a scalar multiplication of the point only needs one
+        # addition per row and no doublings
+        window_size = 2**self.WINDOW_BITS
+        rows = ceil(self.n_bitlength / self.WINDOW_BITS)
+
+        table = []
+        base = self.to_jacobian(point)
+
+        for _ in range(rows):
+            row = [self.jacobian_point_at_infinity]
+            multiple = self.jacobian_point_at_infinity
+
+            for _ in range(1, window_size):
+                multiple = self.jacobian_addition(multiple, base)
+                # Stored with Z = 1 so additions with table entries are cheaper
+                row.append(self.to_jacobian(self.to_affine(multiple)))
+
+            table.append(row)
+
+            for _ in range(self.WINDOW_BITS):
+                base = self.jacobian_double(base)
+
+        return table
+
+    def fixed_base_multiplication(self, scalar: int, table: list) -> tuple:
+        # scalar x point in Jacobian coordinates, where table is the fixed_base_table of a point in ⟨G⟩
+        mask = 2**self.WINDOW_BITS - 1
+
+        # The point has order n, so reducing the scalar gives the same point and keeps it within the rows of the table
+        scalar %= self.n
+        total = self.jacobian_point_at_infinity
+
+        for row in table:
+            digit = scalar & mask
+
+            if digit:
+                total = self.jacobian_addition(total, row[digit])
+
+            scalar >>= self.WINDOW_BITS
+
+        return total
+
+    def precompute_generator_table(self, path: str | None = None) -> list:
+        # The fixed_base_table of G. It only depends on the curve, so it can be saved to and loaded from path
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, "r") as file:
+                    table = [[(x, y, 1) for (x, y) in row] for row in json.load(file)]
+
+                if self.is_generator_table(table):
+                    self.generator_table = [[self.jacobian_point_at_infinity] + row for row in table]
+                    return self.generator_table
+            except (ValueError, KeyError, TypeError):
+                # A truncated or corrupt file is rebuilt the same as a stale one
+                pass
+
+        table = self.fixed_base_table(self.G)
+
+        if path is not None:
+            # Written to a temporary file and moved into place, so other processes never read a half written table
+            descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+
+            try:
+                with os.fdopen(descriptor, "w") as file:
+                    json.dump([[point[:2] for point in row[1:]] for row in table], file)
+
+                os.replace(temporary_path, path)
+            except BaseException:
+                os.remove(temporary_path)
+                raise
+
+        self.generator_table = table
+        return table
+
+    def is_generator_table(self, table: list) -> bool:
+        # Checks a table loaded by precompute_generator_table (without the point at infinity column)
+        # Rejects tables saved for another curve or window size, or containing points not on the curve
+        window_size = 2**self.WINDOW_BITS
+        rows = ceil(self.n_bitlength / self.WINDOW_BITS)
+
+        if not (
+            len(table) == rows
+            and all(len(row) == window_size - 1 for row in table)
+            and table[0][0][:2] == self.G
+            and all(self.is_on_curve(point[:2]) for row in table for point in row)
+        ):
+            return False
+
+        # Points on the curve can still be the wrong multiples, so a few entries are recomputed the slow way
+        for row in (0, rows // 2, rows - 1):
+            for digit in (1, window_size - 1):
+                expected = self.to_affine(self.jacobian_scalar_multiplication(digit << (row * self.WINDOW_BITS), self.G))
+
+                if table[row][digit - 1][:2] != expected:
+                    return False
+
+        return True
+
+    def generator_multiplication(self, scalar: int) -> tuple:
+        # scalar x G in Jacobian coordinates using the fixed-base table
+        table = self.generator_table if self.generator_table is not None else self.precompute_generator_table()
+
+        return self.fixed_base_multiplication(scalar, table)
+
+    def window_table(self, point: tuple) -> list:
+        # 0 x point, 1 x point, ..., (2^w - 1) x point in Jacobian coordinates, one entry for every w bit digit
+        if point == self.G:
+            # Already the first row of the generator table
+            return (self.generator_table if self.generator_table is not None else self.precompute_generator_table())[0]
+
+        base = self.to_jacobian(point)
+        table = [self.jacobian_point_at_infinity, base]
+
+        for _ in range(2, 2**self.WINDOW_BITS):
+            table.append(self.jacobian_addition(table[-1], base))
+
+        return table
+
+    def joint_scalar_multiplication(
+        self, u: int, p: tuple, v: int, q: tuple, p_table: list | None = None, q_table: list | None = None
+    ) -> tuple:
+        # u x p + v x q in Jacobian coordinates using Straus' method, both scalars share the same chain of doublings
+        # so it costs about the same as one scalar multiplication instead of two
+        p_table = p_table if p_table is not None else self.window_table(p)
+        q_table = q_table if q_table is not None else self.window_table(q)
+        mask = 2**self.WINDOW_BITS - 1
+
+        total = self.jacobian_point_at_infinity
+
+        # Go window by window from the most significant end
+        for shift in range(ceil(max(u.bit_length(), v.bit_length()) / self.WINDOW_BITS) - 1, -1, -1):
+            for _ in range(self.WINDOW_BITS):
+                total = self.jacobian_double(total)
+
+            u_digit = (u >> (shift * self.WINDOW_BITS)) & mask
+            v_digit = (v >> (shift * self.WINDOW_BITS)) & mask
+
+            if u_digit:
+                total = self.jacobian_addition(total, p_table[u_digit])
+            if v_digit:
+                total = self.jacobian_addition(total, q_table[v_digit])
+
+        return total
+
+    def jacobian_x_matches(self, p: tuple, r: int) -> bool:
+        # Check if the affine x coordinate of p is congruent to r modulo n without inverting Z
+        if p[2] == 0:
+            return False
+
+        z_squared = (p[2] * p[2]) % self.p
+
+        # x < p and p < 2n, so x is either r or r + n
+        candidate = r
+
+        while candidate < self.p:
+            if (candidate * z_squared) % self.p == p[0]:
+                return True
+
+            candidate += self.n
+
+        return False
+
+    def is_on_curve(self, p: tuple) -> bool:
+        # Check if p satisfies y^2 = x^3 + ax + b (mod p)
+        return (p[1] ** 2) % self.p == (p[0] ** 3 + self.a * p[0] + self.b) % self.p
+
+    def load_public_key(self, public_key_int: int) -> tuple | None:
+        # Unsplits and validates a public key, returning the point and its window table (or None if the key is invalid)
+        # The same key is used to verify every token, so the checks and the table are only computed once per key
+        with self.public_keys_lock:
+            if public_key_int in self.public_keys:
+                self.public_keys.move_to_end(public_key_int)
+                return self.public_keys[public_key_int]
+
+        # Two threads may load the same new key at once, which only costs the second one the work
+
+        # Unsplit the public key from its to parts
+        public_key = (public_key_int >> self.n_bitlength, public_key_int & ((2**self.n_bitlength - 1)))
+
+        if public_key == self.point_at_infinity:
+            loaded_key = None
+        # Check if the public_key satisfies y^2 = x^3 + ax + b (mod p)
+        elif not self.is_on_curve(public_key):
+            loaded_key = None
+        # If pk∈⟨G⟩ then 0 x pk = 𝒪 which implies n x pk = 𝒪 as n are 0 and congurant modulo n (as the group generated by G is cyclic)
+        elif self.jacobian_scalar_multiplication(self.n, public_key)[2] != 0:
+            loaded_key = None
+        else:
+            # Convert the table to affine points so every addition with it in joint_scalar_multiplication is cheaper
+            table = self.window_table(public_key)
+            loaded_key = (public_key, [table[0]] + [self.to_jacobian(self.to_affine(point)) for point in table[1:]])
+
+        # Forget the least recently used key rather than letting the cache grow without bound
+        with self.public_keys_lock:
+            self.public_keys[public_key_int] = loaded_key
+            self.public_keys.move_to_end(public_key_int)
+
+            while len(self.public_keys) > self.MAX_CACHED_PUBLIC_KEYS:
+                self.public_keys.popitem(last=False)
+
+        return loaded_key
+
+    def deterministic_nonces(self, full_hash: int, private_key: int):
+        # Generates values of k in the open interval (0, n) from the private key and message hash following
+        # RFC 6979 Section 3.2 with HMAC-SHA512, so the same message and key always give the same signature
+        octet_length = ceil(self.n_bitlength / 8)
+        hash_octet_length = self.HASH_LENGTH // 8
+
+        # bits2octets(h1): the n_bitlength left bits of the hash reduced modulo n
+        hash_octets = ((full_hash >> (self.HASH_LENGTH - self.n_bitlength)) % self.n).to_bytes(octet_length, "big")
+
+        # Step b and c: V = 0x01 0x01 ... and K = 0x00 0x00 ...
+        v = b"\x01" * hash_octet_length
+        k = b"\x00" * hash_octet_length
+
+        # Step d: K = HMAC_K(V || 0x00 || int2octets(x) || bits2octets(h1))
+        # Everything before the hash only depends on the private key, so that part of the HMAC is reused between messages
+        # The copy is taken under the lock, as another thread could evict the cached HMAC as soon as it is released
+        with self.nonce_hmacs_lock:
+            if private_key not in self.nonce_hmacs:
+                self.nonce_hmacs[private_key] = hmac.new(
+                    k, v + b"\x00" + private_key.to_bytes(octet_length, "big"), sha512
+                )
+
+            self.nonce_hmacs.move_to_end(private_key)
+            key_hmac = self.nonce_hmacs[private_key].copy()
+
+            while len(self.nonce_hmacs) > self.MAX_CACHED_PRIVATE_KEYS:
+                self.nonce_hmacs.popitem(last=False)
+
+        key_hmac.update(hash_octets)
+        k = key_hmac.digest()
+
+        # Step e to g
+        v = hmac.digest(k, v, sha512)
+        k = hmac.digest(k, v + b"\x01" + private_key.to_bytes(octet_length, "big") + hash_octets, sha512)
+        v = hmac.digest(k, v, sha512)
+
+        # Step h
+        while True:
+            t = b""
+
+            while len(t) < octet_length:
+                v = hmac.digest(k, v, sha512)
+                t += v
+
+            # bits2int(T): the n_bitlength left bits of T
+            candidate = int.from_bytes(t, "big") >> (len(t) * 8 - self.n_bitlength)
+
+            if 1 <= candidate < self.n:
+                yield candidate
+
+            # Only reached if the candidate was out of range or the caller needs another one (r = 0 or s = 0)
+            k = hmac.digest(k, v + b"\x00", sha512)
+            v = hmac.digest(k, v, sha512)
+
     def createSignature(self, binary: bytes, private_key: int) -> int:
         # General steps from https://nvlpubs.nist.gov/nistpubs/FIPS/NIST.FIPS.186-5.pdf
         # Section 6.4.1 ECDSA Signature Generation Algorithm
@@ -126,12 +503,10 @@ class EllipticCurve:
         # We want only the n_bitlength left bits of the hash
         hash = full_hash >> (self.HASH_LENGTH - (self.n_bitlength + 1))
 
-        while True:
-            # Cryptographically secure integer, in the open inteval (0, n)
-            k = SystemRandom().randrange(1, self.n)
-
-            # new point is random point in the group ⟨G⟩
-            new_point = self.scalar_multiplication(k, self.G)
+        # Secret integer in the open inteval (0, n), derived deterministically from the private key and the message
+        for k in self.deterministic_nonces(full_hash, private_key):
+            # new point is a pseudorandom point in the group ⟨G⟩
+            new_point = self.to_affine(self.generator_multiplication(k))
             r = new_point[0] % self.n
 
             s = ((hash + (r * private_key)) * pow(k, -1, self.n)) % self.n
@@ -142,29 +517,15 @@ class EllipticCurve:
         # Concatinate the binary strings of r and s with bitlength bitlength_n and return this as the signature (as we know that r and s have been calculated modulo n)
         return r ^ (s << self.n_bitlength)
 
-    def verifySignature(self, binary: bytes, signature: int, public_key_int: int) -> bool:
-        # General steps from https://nvlpubs.nist.gov/nistpubs/FIPS/NIST.FIPS.186-5.pdf
-        # Section 6.4.2 ECDSA Signature Verification Algorithm
-        # Unsplit the public key from its to parts
-        public_key = (public_key_int >> self.n_bitlength, public_key_int & ((2**self.n_bitlength - 1)))
-
-        if public_key == self.point_at_infinity:
-            return False
-
-        # Check if the public_key satisfies y^2 = x^3 + ax + b (mod p)
-        if (public_key[1] ** 2) % self.p != (public_key[0] ** 3 + self.a * public_key[0] + self.b) % self.p:
-            return False
-
-        # If pk∈⟨G⟩ then 0 x pk = 𝒪 which implies n x pk = 𝒪 as n are 0 and congurant modulo n (as the group generated by G is cyclic)
-        if self.scalar_multiplication(self.n, public_key) != self.point_at_infinity:
-            return False
-
+    def signature_scalars(self, binary: bytes, signature: int) -> tuple | None:
+        # The r, u and v values of a signature such that it is valid if the x coordinate of u x G + v x pk is r (mod n)
+        # None if the signature is out of range
         r = signature & (2**self.n_bitlength - 1)
         s = signature >> self.n_bitlength
 
         # check that r and s are in the open inteval (0, n)
         if r < 1 or r >= self.n or s < 1 or s >= self.n:
-            return False
+            return None
 
         full_hash = int.from_bytes(sha512(binary, usedforsecurity=True).digest(), "big")
 
@@ -176,13 +537,63 @@ class EllipticCurve:
         u = (hash * multiplicative_inverse_s) % self.n
         v = (r * multiplicative_inverse_s) % self.n
 
-        (r1, _) = self.point_addition(self.scalar_multiplication(u, self.G), self.scalar_multiplication(v, public_key))
+        return (r, u, v)
 
-        if r == (r1 % self.n):
-            return True
-        else:
+    def verifySignature(self, binary: bytes, signature: int, public_key_int: int) -> bool:
+        # General steps from https://nvlpubs.nist.gov/nistpubs/FIPS/NIST.FIPS.186-5.pdf
+        # Section 6.4.2 ECDSA Signature Verification Algorithm
+        # Checks that the public key is a valid point in ⟨G⟩ (cached after the first call)
+        loaded_key = self.load_public_key(public_key_int)
+
+        if loaded_key is None:
             return False
 
+        (public_key, public_key_table) = loaded_key
+
+        scalars = self.signature_scalars(binary, signature)
+
+        if scalars is None:
+            return False
+
+        (r, u, v) = scalars
+
+        # u x G + v x pk in a single pass
+        return self.jacobian_x_matches(
+            self.joint_scalar_multiplication(u, self.G, v, public_key, q_table=public_key_table), r
+        )
+
+    def verify_batch(self, messages: list, signatures: list, public_key_int: int) -> list:
+        # Same result as calling verifySignature on each message and signature, but for large batches the public key
+        # gets its own fixed-base table, so each signature needs about 128 additions and no doublings
+        loaded_key = self.load_public_key(public_key_int)
+
+        if loaded_key is None:
+            return [False] * len(signatures)
+
+        (public_key, public_key_table) = loaded_key
+
+        if len(signatures) >= self.FIXED_BASE_BATCH_SIZE:
+            public_key_fixed_base_table = self.fixed_base_table(public_key)
+
+            combine = lambda u, v: self.jacobian_addition(
+                self.generator_multiplication(u), self.fixed_base_multiplication(v, public_key_fixed_base_table)
+            )
+        else:
+            combine = lambda u, v: self.joint_scalar_multiplication(u, self.G, v, public_key, q_table=public_key_table)
+
+        results = []
+
+        for binary, signature in zip(messages, signatures):
+            scalars = self.signature_scalars(binary, signature)
+
+            if scalars is None:
+                results.append(False)
+            else:
+                (r, u, v) = scalars
+                results.append(self.jacobian_x_matches(combine(u, v), r))
+
+        return results
+
 
 # Curve chosen arbitrarily from http://www.secg.org/sec2-v2.pdf
 # Parameters from secp256r1 in the artical
@@ -0,0 +1,65 @@
+import time
+import threading
+from collections import OrderedDict
+from hashlib import sha256
+
+
+# Least recently used cache of tokens that have already passed verification, so repeated requests with the same
+# cookie skip the signature check. Only valid tokens are stored, so invalid tokens can never push valid ones out
+class VerificationCache:
+    def __init__(self, max_size: int = 1024, ttl: float = 300) -> None:
+        self.max_size = max_size
+        # Maximum number of seconds an entry is trusted for, even if the token itself is valid for longer
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+
+        # token digest -> (decoded token, time the entry stops being valid)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str, public_key: int) -> tuple:
+        return (public_key, sha256(bytes(token, "utf-8")).digest())
+
+    def get(self, token: str, public_key: int) -> dict | None:
+        key = self.key(token, public_key)
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            # An entry past its expiry (from invalidAt or the ttl) is a miss and is removed
+            if entry is not None and time.time() > entry[1]:
+                del self.entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+        # Copy so callers can't change the cached token
+        return dict(entry[0])
+
+    def put(self, token: str, public_key: int, decoded_token: dict, invalid_at: float) -> None:
+        key = self.key(token, public_key)
+
+        with self.lock:
+            self.entries[key] = (dict(decoded_token), min(invalid_at, time.time() + self.ttl))
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"size": len(self.entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
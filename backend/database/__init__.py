@@ -1,131 +1,309 @@
-import sqlite3
-from typing import Tuple
-from database.table_classes import CampaignLevel, User, Link, Game
+import time
+from concurrent.futures import Future
+from typing import Iterator, Tuple
+from database.table_classes import CampaignLevel, User, Link, Game, GameSummary, PositionMove, GamePosition, LevelStats
 from database.create_tables import create_tables
+from database.connection_pool import ConnectionPool
+from database.group_commit import GroupCommitWriter
+from database.level_cache import AdventureLevelCache
+from database.link_reaper import LinkReaper
+from database.encoding import encode_move_list, encode_settings
+from database.position_index import INDEXED_PLIES, index_games, position_rows, to_signed
+from database.snapshots import SNAPSHOT_INTERVAL, game_snapshots, positions_between, store_snapshots
+
+# Sets of PRAGMAs that can be applied to every connection, chosen with DATABASE_PRAGMA_PROFILE in config.py
+pragma_profiles = {
+    # SQLite's defaults (rollback journal, full sync) with foreign keys enforced
+    "default": {"foreign_keys": "ON"},
+    # Write-ahead logging so readers never wait for a writer, with syncing only at checkpoints
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "foreign_keys": "ON",
+        "mmap_size": 268435456,  # 256MiB
+        "cache_size": -16000,  # 16MB per connection (negative values are in KiB)
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,  # milliseconds
+    },
+}
 
 # An interface between the Flask app and the sqlite3 database
 class Database:
-    def __init__(self, connection: sqlite3.Connection) -> None:
-        connection.execute("PRAGMA foregin_keys = ON")
-        create_tables(connection)
-        
-        self.connection = connection
+    # Rows fetched from SQLite at a time by the methods that list whole tables
+    FETCH_BATCH_SIZE: int = 500
+    # Seconds a share link stays valid after it was last requested
+    LINK_LIFETIME: int = 86400
 
-    def update_user(self, user_id: str, display_name: str):
-        cursor = self.connection.cursor()
+    def __init__(self, pool: ConnectionPool, writer: GroupCommitWriter | None = None) -> None:
+        # PRAGMAs (including foreign_keys) are applied by the pool when it opens each connection
+        with pool.write() as connection:
+            create_tables(connection)
 
-        cursor.execute("UPDATE Users SET Name = ? WHERE Userid = ?", (display_name, user_id))
+        self.pool = pool
+        # When given, writes are committed in batches by the writer's thread instead of one at a time
+        self.writer = writer
 
-        self.connection.commit()
-    
+    def write(self, operation) -> Future:
+        # Runs operation(connection) on the writer connection and commits it
+        # The returned future holds operation's result (or exception) and is only resolved once the write is committed,
+        # so callers that need to know the write is durable wait on it with .result()
+        if self.writer is not None:
+            return self.writer.submit(operation)
 
-    def delete_user(self, user_id: str):
-        cursor = self.connection.cursor()
+        future = Future()
 
-        cursor.execute("DELETE FROM Users WHERE Userid = ?", (user_id,))
-        
-        self.connection.commit()
+        with self.pool.write() as connection:
+            try:
+                # IMMEDIATE takes the write lock before the operation's first read, as the group commit writer does
+                connection.execute("BEGIN IMMEDIATE")
+                result = operation(connection)
+                connection.commit()
+            except Exception as error:
+                connection.rollback()
+                future.set_exception(error)
+            else:
+                future.set_result(result)
 
-    def update_adventure_level(self, user_id: str, level_id: str):
-        cursor = self.connection.cursor()
+        return future
 
-        cursor.execute("UPDATE UserCampaign SET Levelid = ? WHERE Userid = ?", (level_id, user_id))
+    def update_user(self, user_id: str, display_name: str) -> Future:
+        def operation(connection):
+            cursor = connection.cursor()
 
-        self.connection.commit()
+            cursor.execute("UPDATE Users SET Name = ? WHERE Userid = ?", (display_name, user_id))
 
-    def get_adventure_level(self, level_id: str):
-        cursor = self.connection.cursor()
+        return self.write(operation)
 
-        cursor.execute("SELECT * FROM CampaignLevels WHERE Levelid = ?", (level_id,))
+    def delete_user(self, user_id: str) -> Future:
+        def operation(connection):
+            cursor = connection.cursor()
 
-        entry = cursor.fetchone()
+            cursor.execute("DELETE FROM Users WHERE Userid = ?", (user_id,))
 
-        if entry is None:
-            return None
+        return self.write(operation)
+
+    def update_adventure_level(self, user_id: str, level_id: str) -> Future:
+        def operation(connection):
+            cursor = connection.cursor()
+
+            cursor.execute("UPDATE UserCampaign SET Levelid = ? WHERE Userid = ?", (level_id, user_id))
+
+        return self.write(operation)
+
+    def get_adventure_levels(self) -> list[CampaignLevel]:
+        with self.pool.read() as connection:
+            cursor = connection.cursor()
+
+            cursor.execute("SELECT * FROM CampaignLevels ORDER BY Levelid")
 
-        return CampaignLevel(entry[0], entry[1], entry[2])
+            entries = cursor.fetchall()
 
-    def register_link(self, link_suffix: str = None, game_id: str = None):
-        cursor = self.connection.cursor()
+        return [CampaignLevel(entry[0], entry[1], entry[2]) for entry in entries]
+
+    def register_link(self, link_suffix: str = None, game_id: str = None) -> Future:
+        # A game has at most one link. Requesting another while it is valid returns the same suffix with its expiry pushed
+        # back, and once it has expired link_suffix replaces it
+        # The future resolves to the suffix of the game's link
+        def operation(connection):
+            cursor = connection.cursor()
+
+            now = int(time.time())
+
+            cursor.execute(
+                """
+                    INSERT INTO Links
+                    (LinkURL, CreatedAt, ExpiresAt, Gameid)
+                    Values(?, ?, ?, ?)
+                    ON CONFLICT (Gameid) DO UPDATE SET
+                        LinkURL = CASE WHEN Links.ExpiresAt > excluded.CreatedAt THEN Links.LinkURL ELSE excluded.LinkURL END,
+                        CreatedAt = CASE WHEN Links.ExpiresAt > excluded.CreatedAt THEN Links.CreatedAt ELSE excluded.CreatedAt END,
+                        ExpiresAt = excluded.ExpiresAt""",
+                (link_suffix, now, now + self.LINK_LIFETIME, game_id),
+            )
 
-        cursor.execute(
-            """
-                INSERT INTO Links
-                (LinkURL, CreatedAt, ExpiresAt, Gameid)
-                Values(?, CURRENT_TIMESTAMP, DATETIME('now', '+1 day'), ?)""",
-            (link_suffix, game_id),
-        )
+            # Read back in the same transaction rather than with RETURNING, which needs SQLite 3.35 (the Docker image
+            # has 3.34)
+            cursor.execute("SELECT LinkURL FROM Links WHERE Gameid = ?", (game_id,))
 
-        self.connection.commit()
+            return cursor.fetchone()[0]
+
+        return self.write(operation)
 
     def get_link(self, link_suffix: str) -> None | Tuple[Link, str]:
-        cursor = self.connection.cursor()
-
-        cursor.execute(
-            """
-                    SELECT Links.*, GameHistory.Userid
-                    FROM Links
-                    INNER JOIN GameHistory ON Links.Gameid = GameHistory.Gameid
-                    WHERE Links.LinkURL = ?
-                """,
-            (link_suffix,),
-        )
+        # Expired links are treated as though they don't exist
+        with self.pool.read() as connection:
+            cursor = connection.cursor()
+
+            cursor.execute(
+                """
+                        SELECT Links.*, GameHistory.Userid
+                        FROM Links
+                        INNER JOIN GameHistory ON Links.Gameid = GameHistory.Gameid
+                        WHERE Links.LinkURL = ? AND Links.ExpiresAt > ?
+                    """,
+                (link_suffix, int(time.time())),
+            )
 
-        entry = cursor.fetchone()
+            entry = cursor.fetchone()
 
         if entry is None:
             return None
 
-        return Link(str(entry[0]), entry[1], entry[2], entry[3], str(entry[4])), str(entry[5])
+        return Link.from_row(entry), str(entry[5])
+
+    def delete_expired_links(self, batch_size: int = 500) -> int:
+        # Deletes in batches of batch_size, each its own write, so the writer is never held for long
+        # Returns the number of links deleted
+        def operation(connection):
+            cursor = connection.cursor()
+
+            cursor.execute(
+                "DELETE FROM Links WHERE Linkid IN (SELECT Linkid FROM Links WHERE ExpiresAt <= ? LIMIT ?)",
+                (int(time.time()), batch_size),
+            )
+
+            return cursor.rowcount
+
+        deleted = 0
+
+        while True:
+            batch_deleted = self.write(operation).result()
+            deleted += batch_deleted
+
+            if batch_deleted < batch_size:
+                return deleted
 
     def get_game(self, game_id: str):
-        cursor = self.connection.cursor()
+        with self.pool.read() as connection:
+            cursor = connection.cursor()
 
-        cursor.execute("SELECT * FROM GameHistory WHERE Gameid = ?", (game_id,))
+            cursor.execute("SELECT * FROM GameHistory WHERE Gameid = ?", (game_id,))
 
-        entry = cursor.fetchone()
+            entry = cursor.fetchone()
 
         if entry is None:
             return None
 
-        return Game(
-            str(entry[0]),
-            entry[1],
-            entry[2],
-            entry[3],
-            entry[4],
-            entry[5],
-            entry[6],
-            str(entry[7]),
-            campaign_id=entry[8],
-            level_id=entry[9],
-        )
-
-    def get_archived_games(self, user_id: str = None):
-        cursor = self.connection.cursor()
-
-        if user_id is None:
-            cursor.execute("SELECT * FROM GameHistory ORDER BY DatePlayed DESC")
+        return Game.from_row(entry)
+
+    def get_game_positions(self, game_id: int, user_id: str, first_ply: int, last_ply: int) -> list[GamePosition] | None:
+        # The positions of one of a user's games from first_ply to last_ply inclusive, or None if they have no such game
+        # They are replayed from the nearest snapshot at or before first_ply. Games archived before snapshots were
+        # stored have theirs computed and stored the first time they are asked for
+        with self.pool.read() as connection:
+            cursor = connection.cursor()
+
+            cursor.execute(
+                """
+                    SELECT MoveList, (
+                        SELECT Ply || ' ' || Fen FROM GamePositions
+                        WHERE Gameid = GameHistory.Gameid AND Ply <= ?
+                        ORDER BY Ply DESC LIMIT 1
+                    )
+                    FROM GameHistory WHERE Gameid = ? AND Userid = ?
+                """,
+                (first_ply, game_id, user_id),
+            )
+
+            game = cursor.fetchone()
+
+        if game is None:
+            return None
+
+        move_list, snapshot = game
+
+        if snapshot is not None:
+            ply, fen = snapshot.split(" ", 1)
+            snapshot = (int(ply), fen)
         else:
-            cursor.execute("SELECT * FROM GameHistory WHERE Userid = ? ORDER BY DatePlayed DESC", (user_id,))
-
-        entries = cursor.fetchall()
-
-        return [
-            Game(
-                str(row[0]),
-                row[1],
-                row[2],
-                row[3],
-                row[4],
-                row[5],
-                row[6],
-                str(row[7]),
-                campaign_id=row[8],
-                level_id=row[9],
+            # Every game with snapshots has one for ply 0
+            snapshots = game_snapshots(move_list)
+
+            def operation(connection):
+                store_snapshots(connection, game_id, snapshots)
+
+            self.write(operation).result()
+
+            snapshot = [row for row in snapshots if row[0] <= first_ply][-1]
+
+        return [GamePosition.from_row(row) for row in positions_between(move_list, snapshot, first_ply, last_ply)]
+
+    def get_level_stats(self, user_id: str) -> list[LevelStats]:
+        # A user's results on each campaign level they have played, in level order
+        with self.pool.read() as connection:
+            cursor = connection.cursor()
+
+            cursor.execute(
+                "SELECT Levelid, Attempts, Wins, Losses, LastPlayed FROM UserLevelStats WHERE Userid = ? ORDER BY Levelid",
+                (user_id,),
+            )
+
+            entries = cursor.fetchall()
+
+        return [LevelStats.from_row(row) for row in entries]
+
+    def get_archived_games(self, user_id: str = None) -> Iterator[Game]:
+        # Yields the games newest first in batches, so the whole history is never held in memory at once
+        # A read connection is only checked out while each batch is fetched, and the next batch carries on from the
+        # (DatePlayed, Gameid) of the last game, so a slow client streaming the response doesn't keep hold of one
+        before = None
+
+        while True:
+            conditions = (["Userid = ?"] if user_id is not None else []) + (
+                ["(DatePlayed, Gameid) < (?, ?)"] if before is not None else []
             )
-            for row in entries
-        ]
+            parameters = ((user_id,) if user_id is not None else ()) + (before or ())
+
+            with self.pool.read() as connection:
+                cursor = connection.cursor()
+
+                cursor.execute(
+                    f"""
+                        SELECT * FROM GameHistory
+                        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+                        ORDER BY DatePlayed DESC, Gameid DESC
+                        LIMIT ?
+                    """,
+                    (*parameters, self.FETCH_BATCH_SIZE),
+                )
+
+                entries = cursor.fetchall()
+
+            yield from map(Game.from_row, entries)
+
+            if len(entries) < self.FETCH_BATCH_SIZE:
+                return
+
+            # GameHistory.* starts Gameid, MoveList, GameResult, DatePlayed
+            before = (entries[-1][3], entries[-1][0])
+
+    def get_archived_game_summaries(self, user_id: str, limit: int, before: tuple | None = None) -> list[GameSummary]:
+        # One page of a user's games, newest first, without the move lists
+        # before is the (DatePlayed, Gameid) of the last game on the previous page, so each page is an index range scan
+        # no matter how far into the history it is
+        with self.pool.read() as connection:
+            cursor = connection.cursor()
+
+            cursor.execute(
+                f"""
+                    SELECT
+                        Gameid, GameResult, DatePlayed, CustomSettings, HumanPlaysAs, Winner, Userid,
+                        CASE
+                            WHEN typeof(MoveList) = 'blob' THEN LENGTH(MoveList) / 2
+                            ELSE LENGTH(MoveList) - LENGTH(REPLACE(MoveList, ' ', '')) + 1
+                        END,
+                        Campaignid, Levelid
+                    FROM GameHistory
+                    WHERE Userid = ? {"AND (DatePlayed, Gameid) < (?, ?)" if before is not None else ""}
+                    ORDER BY DatePlayed DESC, Gameid DESC
+                    LIMIT ?
+                """,
+                (user_id, *(before if before is not None else ()), limit),
+            )
+
+            entries = cursor.fetchall()
+
+        return [GameSummary.from_row(row) for row in entries]
 
     def archive_game(
         self,
@@ -137,72 +315,194 @@ class Database:
         custom_settings: str = r"{}",
         campaign_id: str = None,
         level_id: str = None,
-    ) -> None:
-        cursor = self.connection.cursor()
-
-        cursor.execute(
-            """
-                INSERT INTO GameHistory (MoveList, GameResult, DatePlayed, CustomSettings, Userid, HumanPlaysAs, Winner, Campaignid, Levelid)
-                VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?, ?, ?, ?, ?)
-            """,
-            (move_list, game_result, custom_settings, user_id, human_plays_as, winner, campaign_id, level_id),
-        )
-
-        self.connection.commit()
+        position_hashes: list[int] | None = None,
+        snapshots: list[tuple] | None = None,
+    ) -> Future:
+        # The future resolves to the new game's id
+        # position_hashes and snapshots come from the replay that validated the game (chess_rules.validate_move_list
+        # with INDEXED_PLIES and SNAPSHOT_INTERVAL), the game is only replayed here for the ones that aren't given
+        # Encoded here so the writer only has to run the INSERTs
+        positions = position_rows(move_list, winner, position_hashes)
+        snapshots = game_snapshots(move_list) if snapshots is None else snapshots
+        move_list = encode_move_list(move_list)
+        custom_settings = encode_settings(custom_settings)
+
+        def operation(connection):
+            cursor = connection.cursor()
 
-    def get_user(self, email: str = "", _id: str = "") -> User | None:
-        cursor = self.connection.cursor()
+            cursor.execute(
+                """
+                    INSERT INTO GameHistory (MoveList, GameResult, DatePlayed, CustomSettings, Userid, HumanPlaysAs, Winner, Campaignid, Levelid)
+                    VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    move_list,
+                    game_result,
+                    custom_settings,
+                    user_id,
+                    human_plays_as,
+                    winner,
+                    campaign_id,
+                    level_id,
+                ),
+            )
 
-        if _id:
+            game_id = cursor.lastrowid
+            store_snapshots(connection, game_id, snapshots)
+
+            if level_id is not None:
+                cursor.execute(
+                    """
+                        INSERT INTO UserLevelStats (Userid, Levelid, Attempts, Wins, Losses, LastPlayed)
+                        VALUES (?, ?, 1, ?, ?, CURRENT_TIMESTAMP)
+                        ON CONFLICT (Userid, Levelid) DO UPDATE SET
+                            Attempts = Attempts + 1,
+                            Wins = Wins + excluded.Wins,
+                            Losses = Losses + excluded.Losses,
+                            LastPlayed = excluded.LastPlayed
+                    """,
+                    (user_id, level_id, int(winner == human_plays_as), int(winner not in (0, human_plays_as))),
+                )
+
+            # Index the game straight away, unless the index is still being backfilled, in which case the backfill
+            # will get to it in order
             cursor.execute(
                 """
-                    SELECT Users.*, UserCampaign.Levelid
-                    FROM Users
-                    INNER JOIN UserCampaign ON Users.Userid = UserCampaign.Userid
-                    WHERE UserCampaign.Userid = ?
+                    UPDATE PositionIndexProgress SET LastGameid = ?
+                    WHERE NOT EXISTS (SELECT 1 FROM GameHistory WHERE Gameid > LastGameid AND Gameid < ?)
                 """,
-                (_id,),
+                (game_id, game_id),
             )
-        elif email:
+
+            if cursor.rowcount:
+                index_games(connection, positions)
+
+            return game_id
+
+        return self.write(operation)
+
+    def index_positions(self, batch_size: int = FETCH_BATCH_SIZE) -> int:
+        # Adds the next batch_size archived games that aren't in the opening explorer index yet, in one transaction
+        # Returns the number of games added
+        def operation(connection):
+            cursor = connection.cursor()
+
+            # Writes run in BEGIN IMMEDIATE transactions, so the write lock is already held and another process
+            # backfilling at the same time can't read the same progress and index the same games twice
+            cursor.execute("SELECT LastGameid FROM PositionIndexProgress")
+            last_game_id = cursor.fetchone()[0]
+
+            cursor.execute(
+                "SELECT Gameid, MoveList, Winner FROM GameHistory WHERE Gameid > ? ORDER BY Gameid LIMIT ?",
+                (last_game_id, batch_size),
+            )
+
+            games = cursor.fetchall()
+
+            if games:
+                rows = [row for _, move_list, winner in games for row in position_rows(move_list, winner)]
+                index_games(connection, rows)
+                cursor.execute("UPDATE PositionIndexProgress SET LastGameid = ?", (games[-1][0],))
+
+            return len(games)
+
+        return self.write(operation).result()
+
+    def backfill_position_index(self, batch_size: int = FETCH_BATCH_SIZE) -> int:
+        # Indexes every game archived before the index existed (or while it was behind), a batch at a time
+        indexed = 0
+
+        while batch_indexed := self.index_positions(batch_size):
+            indexed += batch_indexed
+
+        return indexed
+
+    def get_position_moves(self, position_hash: int) -> list[PositionMove]:
+        # The moves played from a position, most played first
+        with self.pool.read() as connection:
+            cursor = connection.cursor()
+
             cursor.execute(
                 """
-                    SELECT Users.*, UserCampaign.Levelid
-                    FROM Users
-                    INNER JOIN UserCampaign ON Users.Userid = UserCampaign.Userid
-                    WHERE Users.Email = ?
+                    SELECT Move, WhiteWins, BlackWins, Draws FROM PositionMoves
+                    WHERE PositionHash = ?
+                    ORDER BY WhiteWins + BlackWins + Draws DESC
                 """,
-                (email,),
+                (to_signed(position_hash),),
             )
-        else:
+
+            entries = cursor.fetchall()
+
+        return [PositionMove.from_row(row) for row in entries]
+
+    def get_user(self, email: str = "", _id: str = "") -> User | None:
+        if not _id and not email:
             raise ValueError("An email or user id must be provided")
 
-        row = cursor.fetchone()
+        with self.pool.read() as connection:
+            cursor = connection.cursor()
+
+            if _id:
+                cursor.execute(
+                    """
+                        SELECT Users.*, UserCampaign.Levelid
+                        FROM Users
+                        INNER JOIN UserCampaign ON Users.Userid = UserCampaign.Userid
+                        WHERE UserCampaign.Userid = ?
+                    """,
+                    (_id,),
+                )
+            else:
+                cursor.execute(
+                    """
+                        SELECT Users.*, UserCampaign.Levelid
+                        FROM Users
+                        INNER JOIN UserCampaign ON Users.Userid = UserCampaign.Userid
+                        WHERE Users.Email = ?
+                    """,
+                    (email,),
+                )
+
+            row = cursor.fetchone()
 
         if not row:
             return None
 
-        return User(str(row[0]), row[1], row[2], row[3], row[4], str(row[5]))
+        return User.from_row(row)
 
-    def get_all_users(self):
-        cursor = self.connection.cursor()
+    def get_all_users(self) -> Iterator[User]:
+        # Yields the users in batches, checking out a connection for each batch in the same way as get_archived_games
+        last_user_id = 0
 
-        cursor.execute("SELECT * FROM Users ORDER BY Userid")
+        while True:
+            with self.pool.read() as connection:
+                cursor = connection.cursor()
 
-        entries = cursor.fetchall()
+                cursor.execute(
+                    "SELECT * FROM Users WHERE Userid > ? ORDER BY Userid LIMIT ?", (last_user_id, self.FETCH_BATCH_SIZE)
+                )
 
-        return [User(str(row[0]), row[1], row[2], row[3], row[4]) for row in entries]
+                entries = cursor.fetchall()
 
-    def insert_user(self, email: str = "", password_hash: str = "", auth_level: int = 1, name: str = "") -> None:
-        cursor = self.connection.cursor()
+            yield from map(User.from_row, entries)
 
-        cursor.execute(
-            """
-                       INSERT INTO Users
-                       (Email, PasswordHash, AuthenticationLevel, Name)
-                       VALUES (?, ?, ?, ?)""",
-            (email, password_hash, auth_level, name),
-        )
+            if len(entries) < self.FETCH_BATCH_SIZE:
+                return
+
+            last_user_id = entries[-1][0]
+
+    def insert_user(self, email: str = "", password_hash: str = "", auth_level: int = 1, name: str = "") -> Future:
+        def operation(connection):
+            cursor = connection.cursor()
+
+            cursor.execute(
+                """
+                           INSERT INTO Users
+                           (Email, PasswordHash, AuthenticationLevel, Name)
+                           VALUES (?, ?, ?, ?)""",
+                (email, password_hash, auth_level, name),
+            )
 
-        cursor.execute("INSERT INTO UserCampaign (Userid, Levelid) VALUES (last_insert_rowid(), 1)", ())
+            cursor.execute("INSERT INTO UserCampaign (Userid, Levelid) VALUES (last_insert_rowid(), 1)", ())
 
-        self.connection.commit()
+        return self.write(operation)
@@ -0,0 +1,138 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# Hands out sqlite3 connections that are safe to use from any thread
+# SELECTs are spread over a pool of read-only connections, while every write goes through the single writer connection
+class ConnectionPool:
+    def __init__(self, path: str, size: int = 4, timeout: float = 10, pragmas: dict = {}) -> None:
+        self.path = path
+        # Maximum number of read-only connections
+        self.size = size
+        # Seconds to wait for a connection before giving up
+        self.timeout = timeout
+        # PRAGMA name -> value, run on every connection when it is opened
+        self.pragmas = pragmas
+
+        # The writer is opened first so the database file exists before any read-only connection is opened
+        self.writer = sqlite3.connect(path, check_same_thread=False)
+        self.apply_pragmas(self.writer)
+        self.writer_lock = threading.Lock()
+
+        self.readers = queue.Queue()
+        self.readers_open = 0
+        self.lock = threading.Lock()
+
+        # Usage metrics, wait times are in seconds
+        self.metrics = {
+            "read_checkouts": 0,
+            "read_wait_total": 0.0,
+            "read_wait_max": 0.0,
+            "reads_in_use": 0,
+            "write_checkouts": 0,
+            "write_wait_total": 0.0,
+            "write_wait_max": 0.0,
+        }
+
+    def apply_pragmas(self, connection: sqlite3.Connection, read_only: bool = False) -> None:
+        for name, value in self.pragmas.items():
+            # The journal mode is stored in the database file, so it is only set (by the writer) once
+            if read_only and name == "journal_mode":
+                continue
+
+            connection.execute(f"PRAGMA {name} = {value}")
+
+    def open_reader(self) -> sqlite3.Connection:
+        # mode=ro makes SQLite itself reject any write made through this connection
+        uri = Path(self.path).absolute().as_uri() + "?mode=ro"
+
+        connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+        try:
+            self.apply_pragmas(connection, read_only=True)
+        except BaseException:
+            connection.close()
+            raise
+
+        return connection
+
+    def record_wait(self, kind: str, wait: float) -> None:
+        with self.lock:
+            self.metrics[kind + "_checkouts"] += 1
+            self.metrics[kind + "_wait_total"] += wait
+            self.metrics[kind + "_wait_max"] = max(self.metrics[kind + "_wait_max"], wait)
+
+    @contextmanager
+    def read(self):
+        start = time.perf_counter()
+
+        try:
+            connection = self.readers.get_nowait()
+        except queue.Empty:
+            # Open another connection if the pool isn't full yet, otherwise wait for one to be returned
+            with self.lock:
+                can_open = self.readers_open < self.size
+
+                if can_open:
+                    self.readers_open += 1
+
+            if can_open:
+                try:
+                    connection = self.open_reader()
+                except BaseException:
+                    # Give the slot back, otherwise every failed open would shrink the pool for good
+                    with self.lock:
+                        self.readers_open -= 1
+
+                    raise
+            else:
+                try:
+                    connection = self.readers.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError("No read-only database connection became available")
+
+        self.record_wait("read", time.perf_counter() - start)
+
+        with self.lock:
+            self.metrics["reads_in_use"] += 1
+
+        try:
+            yield connection
+        finally:
+            with self.lock:
+                self.metrics["reads_in_use"] -= 1
+
+            self.readers.put(connection)
+
+    @contextmanager
+    def write(self):
+        start = time.perf_counter()
+
+        if not self.writer_lock.acquire(timeout=self.timeout):
+            raise TimeoutError("The database writer connection did not become available")
+
+        self.record_wait("write", time.perf_counter() - start)
+
+        try:
+            yield self.writer
+        except Exception:
+            # Don't leave half of a failed write in the writer's transaction for the next caller to commit
+            self.writer.rollback()
+            raise
+        finally:
+            self.writer_lock.release()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"size": self.size, "readers_open": self.readers_open, **self.metrics}
+
+    def close(self) -> None:
+        with self.writer_lock:
+            self.writer.close()
+
+        while not self.readers.empty():
+            self.readers.get_nowait().close()
@@ -1,6 +1,164 @@
 import database.adventure_script
 import json
 import sqlite3
+import zlib
+from database.encoding import encode_move_list, encode_settings
+
+
+def create_indexes(connection):
+    # Users are looked up by their exact email, so two accounts with the same one can't both be logged in to and the
+    # unique index can't be built. Which account to keep is for a person to decide, so the migration stops here
+    connection.execute("BEGIN IMMEDIATE")
+    duplicates = connection.execute("SELECT Email FROM Users GROUP BY Email HAVING COUNT(*) > 1").fetchall()
+
+    if duplicates:
+        connection.rollback()
+
+        raise RuntimeError(
+            "Can't add the unique index on Users.Email, these emails belong to more than one account: "
+            + ", ".join(email for (email,) in duplicates)
+            + ". Delete or rename the extra accounts and start the app again"
+        )
+
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS GameHistoryUseridDatePlayedGameid ON GameHistory (Userid, DatePlayed DESC, Gameid DESC)"
+    )
+    connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS LinksLinkURL ON Links (LinkURL)")
+    connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS UsersEmail ON Users (Email)")
+    connection.execute("CREATE INDEX IF NOT EXISTS UserCampaignUserid ON UserCampaign (Userid)")
+    connection.commit()
+
+
+def pack_game_history(connection, batch_size: int = 1000):
+    # Rewrites move lists and custom settings stored as TEXT in the packed and compressed forms, committing a batch of
+    # rows at a time so the rewrite never holds the write lock for long. Packed rows are skipped, so an interrupted
+    # migration carries on where it stopped
+    last_id = 0
+    rewritten = 0
+
+    while True:
+        connection.execute("BEGIN IMMEDIATE")
+
+        rows = connection.execute(
+            """
+                SELECT Gameid, MoveList, CustomSettings FROM GameHistory
+                WHERE Gameid > ? AND (typeof(MoveList) = 'text' OR typeof(CustomSettings) = 'text')
+                ORDER BY Gameid
+                LIMIT ?
+            """,
+            (last_id, batch_size),
+        ).fetchall()
+
+        if not rows:
+            connection.commit()
+            break
+
+        updates = []
+
+        for game_id, move_list, custom_settings in rows:
+            # These rows were archived before games were validated, so one that can't be encoded is left as it is
+            try:
+                updates.append(
+                    (
+                        encode_move_list(move_list) if type(move_list) == str else move_list,
+                        encode_settings(custom_settings) if type(custom_settings) == str else custom_settings,
+                        game_id,
+                    )
+                )
+            except (ValueError, zlib.error) as error:
+                print(f"Leaving game {game_id} unpacked: {error}")
+
+        connection.executemany("UPDATE GameHistory SET MoveList = ?, CustomSettings = ? WHERE Gameid = ?", updates)
+        connection.commit()
+
+        last_id = rows[-1][0]
+        rewritten += len(updates)
+
+    # The freed pages only go back to the file system once the database is rebuilt
+    if rewritten:
+        connection.execute("VACUUM")
+
+
+# Each migration takes the schema from version i to i + 1 (as stored in PRAGMA user_version) and is run once per database
+# A migration is either an SQL script, run in one transaction with the version bump, or a function taking the connection
+# that commits its own work and can be run again if it is interrupted
+migrations = [
+    # 1: Indexes for the lookups and sorts used by Database, and for the foreign keys that cascade on delete
+    create_indexes,
+    # 2: Pack the move lists and compress the custom settings of games archived before they were stored that way
+    pack_game_history,
+    # 3: Link times become Unix epoch seconds so expiry is checked in the lookup, and each game keeps a single link
+    """
+        DELETE FROM Links WHERE Linkid NOT IN (SELECT MAX(Linkid) FROM Links GROUP BY Gameid);
+        UPDATE Links
+        SET CreatedAt = CAST(strftime('%s', CreatedAt) AS INTEGER), ExpiresAt = CAST(strftime('%s', ExpiresAt) AS INTEGER)
+        WHERE typeof(ExpiresAt) = 'text';
+        CREATE UNIQUE INDEX IF NOT EXISTS LinksUniqueGameid ON Links (Gameid);
+        CREATE INDEX IF NOT EXISTS LinksExpiresAt ON Links (ExpiresAt);
+    """,
+    # 4: The opening explorer index (see database.position_index), and the last game that has been added to it
+    """
+        CREATE TABLE IF NOT EXISTS PositionMoves (
+            PositionHash INTEGER NOT NULL,
+            Move INTEGER NOT NULL,
+            WhiteWins INTEGER NOT NULL,
+            BlackWins INTEGER NOT NULL,
+            Draws INTEGER NOT NULL,
+            PRIMARY KEY (PositionHash, Move)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS PositionIndexProgress (LastGameid INTEGER NOT NULL);
+        INSERT INTO PositionIndexProgress (LastGameid) VALUES (0);
+    """,
+    # 5: Snapshots of archived games every few plies for the Review page (see database.snapshots)
+    """
+        CREATE TABLE IF NOT EXISTS GamePositions (
+            Gameid INTEGER NOT NULL,
+            Ply INTEGER NOT NULL,
+            Fen TEXT NOT NULL,
+            PRIMARY KEY (Gameid, Ply),
+            FOREIGN KEY (Gameid) REFERENCES GameHistory (Gameid) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+    """,
+    # 6: Each user's results on each campaign level, kept up to date by Database.archive_game and filled in here from
+    # the games archived before it existed
+    """
+        CREATE TABLE IF NOT EXISTS UserLevelStats (
+            Userid INTEGER NOT NULL,
+            Levelid INTEGER NOT NULL,
+            Attempts INTEGER NOT NULL,
+            Wins INTEGER NOT NULL,
+            Losses INTEGER NOT NULL,
+            LastPlayed TIMESTAMP NOT NULL,
+            PRIMARY KEY (Userid, Levelid),
+            FOREIGN KEY (Userid) REFERENCES Users (Userid) ON DELETE CASCADE,
+            FOREIGN KEY (Levelid) REFERENCES CampaignLevels (Levelid)
+        ) WITHOUT ROWID;
+        INSERT INTO UserLevelStats (Userid, Levelid, Attempts, Wins, Losses, LastPlayed)
+        SELECT Userid, Levelid, COUNT(*), SUM(Winner = HumanPlaysAs), SUM(Winner NOT IN (0, HumanPlaysAs)), MAX(DatePlayed)
+        FROM GameHistory
+        WHERE Levelid IN (SELECT Levelid FROM CampaignLevels)
+        GROUP BY Userid, Levelid;
+    """,
+    # 7: All users' games newest first, for the unfiltered Database.get_archived_games
+    """
+        CREATE INDEX IF NOT EXISTS GameHistoryDatePlayedGameid ON GameHistory (DatePlayed DESC, Gameid DESC);
+    """,
+]
+
+
+def run_migrations(connection):
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+
+    for number, migration in enumerate(migrations[version:], start=version + 1):
+        print(f"Migrating database to version {number}...")
+
+        # The version is only bumped once the migration has finished, so a failed migration is retried next time
+        if callable(migration):
+            migration(connection)
+            connection.execute(f"PRAGMA user_version = {number}")
+            connection.commit()
+        else:
+            connection.executescript(f"BEGIN; {migration}; PRAGMA user_version = {number}; COMMIT;")
 
 
 def create_tables(connection):
@@ -47,8 +205,8 @@ def create_tables(connection):
         CREATE TABLE IF NOT EXISTS Links (
             Linkid INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
             LinkURL TEXT NOT NULL,
-            CreatedAt TIMESTAMP NOT NULL,
-            ExpiresAt TIMESTAMP NOT NULL,
+            CreatedAt INTEGER NOT NULL,
+            ExpiresAt INTEGER NOT NULL,
             Gameid INTEGER NOT NULL,
             FOREIGN KEY (Gameid) REFERENCES GameHistory (Gameid) ON DELETE CASCADE
         );
@@ -72,3 +230,5 @@ def create_tables(connection):
     finally:
         cursor.close()
         connection.commit()
+
+    run_migrations(connection)
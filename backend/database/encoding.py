@@ -0,0 +1,72 @@
+import re
+import struct
+import zlib
+
+# Compact storage formats for GameHistory columns
+# Values that can't be encoded are stored as TEXT exactly as before, and decoding passes TEXT values straight through,
+# so both forms can live in the same column
+
+# Move lists from the engine's getMoveListString, e.g. "e2e4 e7e5 e7e8q"
+move_list_regex = re.compile(r"^[a-h][1-8][a-h][1-8][nbrq]?( [a-h][1-8][a-h][1-8][nbrq]?)*$")
+
+# Same numbering as the engine's Move class, 0 is no promotion
+promotion_letters = " nbrq"
+
+# Custom settings are small JSON objects that repeat the same keys, so they are deflated against a preset dictionary
+# of those keys. The first byte of a compressed value is the version of the dictionary it was compressed with
+settings_dictionaries = {
+    1: b'{"aggressiveness": 50, "blindSpots": 0, "depth": 3, "name": "", "positionalPlay": 100, "tradeHappy": 50}',
+}
+settings_dictionary_version = 1
+
+
+def square_to_index(square: str) -> int:
+    return (int(square[1]) - 1) * 8 + ord(square[0]) - 97
+
+
+def index_to_square(index: int) -> str:
+    return chr(97 + index % 8) + str(index // 8 + 1)
+
+
+def encode_move_list(move_list: str) -> bytes | str:
+    # Each move becomes 16 bits: source square (6 bits), destination square (6 bits) and promotion piece (3 bits)
+    # fullmatch, as $ would also match before a trailing newline
+    if not move_list_regex.fullmatch(move_list):
+        return move_list
+
+    codes = [
+        square_to_index(move[0:2]) | square_to_index(move[2:4]) << 6 | promotion_letters.index(move[4:5] or " ") << 12
+        for move in move_list.split(" ")
+    ]
+
+    return struct.pack(f">{len(codes)}H", *codes)
+
+
+def decode_move_list(value: bytes | str) -> str:
+    if type(value) != bytes:
+        return value
+
+    return " ".join(
+        index_to_square(code & 0x3F) + index_to_square(code >> 6 & 0x3F) + promotion_letters[code >> 12].strip()
+        for (code,) in struct.iter_unpack(">H", value)
+    )
+
+
+def encode_settings(settings: str | None) -> bytes | str | None:
+    if settings is None:
+        return None
+
+    compressor = zlib.compressobj(9, zdict=settings_dictionaries[settings_dictionary_version])
+    compressed = bytes([settings_dictionary_version]) + compressor.compress(bytes(settings, "utf-8")) + compressor.flush()
+
+    # Very short settings (such as {}) can come out bigger when compressed
+    return compressed if len(compressed) < len(settings) else settings
+
+
+def decode_settings(value: bytes | str | None) -> str | None:
+    if type(value) != bytes:
+        return value
+
+    decompressor = zlib.decompressobj(zdict=settings_dictionaries[value[0]])
+
+    return (decompressor.decompress(value[1:]) + decompressor.flush()).decode("utf-8")
@@ -0,0 +1,127 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from database.connection_pool import ConnectionPool
+
+
+# Commits writes from many threads together, so concurrent requests share one transaction (and one sync to disk)
+# A background thread takes operations off a queue and runs them through the pool's writer connection, committing
+# once max_batch operations have been collected or max_delay seconds have passed since the first of them arrived
+class GroupCommitWriter:
+    def __init__(self, pool: ConnectionPool, max_delay: float = 0.001, max_batch: int = 64) -> None:
+        self.pool = pool
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+
+        # (operation, future) pairs, or None to tell the thread to stop
+        self.queue = queue.Queue()
+        self.closed = False
+
+        # Usage metrics
+        self.metrics = {"batches": 0, "operations": 0, "largest_batch": 0}
+        self.lock = threading.Lock()
+
+        self.thread = threading.Thread(target=self.run, name="group-commit-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, operation: Callable[[Any], Any]) -> Future:
+        # operation is called with the writer connection and must not commit or roll back itself
+        # The returned future resolves to operation's return value once the batch it was in has been committed
+        if self.closed:
+            raise RuntimeError("The group commit writer has been closed")
+
+        future = Future()
+        self.queue.put((operation, future))
+
+        return future
+
+    def run(self) -> None:
+        stopping = False
+
+        while not stopping:
+            item = self.queue.get()
+
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+                    break
+
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+                if item is None:
+                    # Commit what has already been queued before stopping
+                    stopping = True
+                    break
+
+                batch.append(item)
+
+            self.commit(batch)
+
+    def commit(self, batch: list) -> None:
+        results = []
+
+        try:
+            with self.pool.write() as connection:
+                # IMMEDIATE takes the write lock up front, so operations can read what they are about to update
+                # without another process writing in between
+                connection.execute("BEGIN IMMEDIATE")
+
+                for operation, future in batch:
+                    # Each operation gets a savepoint, so one that fails is undone without losing the rest of the batch
+                    connection.execute("SAVEPOINT operation")
+
+                    try:
+                        result = operation(connection)
+                    except Exception as error:
+                        connection.execute("ROLLBACK TO operation")
+                        results.append((future, None, error))
+                    else:
+                        results.append((future, result, None))
+
+                    connection.execute("RELEASE operation")
+
+                connection.commit()
+        except Exception as error:
+            # Nothing in the batch was committed
+            for _, future in batch:
+                future.set_exception(error)
+
+            return
+
+        with self.lock:
+            self.metrics["batches"] += 1
+            self.metrics["operations"] += len(batch)
+            self.metrics["largest_batch"] = max(self.metrics["largest_batch"], len(batch))
+
+        # Callers are only told about their write once it is durable
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"queued": self.queue.qsize(), **self.metrics}
+
+    def close(self) -> None:
+        # Stops accepting writes, then waits for everything already queued to be committed
+        if self.closed:
+            return
+
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
@@ -0,0 +1,32 @@
+import json
+from hashlib import sha256
+from typing import Iterable
+
+from database.table_classes import CampaignLevel
+
+
+# The campaign levels only come from adventure_script.py and never change while the app is running, so they are read
+# once and every response is served from memory
+class AdventureLevelCache:
+    def __init__(self, levels: Iterable[CampaignLevel]) -> None:
+        # level id -> (level, response body, ETag)
+        self.levels = {}
+
+        for level in levels:
+            body = bytes(json.dumps({"error": False, "data": level.to_dict()}), "utf-8")
+
+            self.levels[str(level._id)] = (level, body, sha256(body).hexdigest())
+
+        # Beating the last level with a battle completes the campaign
+        self.final_battle_id = max(
+            (level_id for level_id, (level, _, _) in self.levels.items() if level.battle_settings is not None),
+            key=int,
+            default=None,
+        )
+
+    def get(self, level_id: str) -> tuple | None:
+        # Ids are compared as integers by SQLite, so 01 is the same level as 1
+        if level_id.isdecimal():
+            level_id = str(int(level_id))
+
+        return self.levels.get(level_id)
@@ -0,0 +1,33 @@
+import threading
+
+
+# Periodically deletes expired share links so the Links table only holds links that can still be used
+class LinkReaper:
+    def __init__(self, db, interval: float = 3600, batch_size: int = 500) -> None:
+        self.db = db
+        # Seconds between sweeps
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self.stopped = threading.Event()
+
+        self.thread = threading.Thread(target=self.run, name="link-reaper", daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        # Sweeps once straight away, then every interval seconds until stopped
+        while True:
+            try:
+                deleted = self.db.delete_expired_links(self.batch_size)
+            except Exception as error:
+                print(f"Failed to delete expired links: {error}")
+            else:
+                if deleted:
+                    print(f"Deleted {deleted} expired links")
+
+            if self.stopped.wait(self.interval):
+                break
+
+    def close(self) -> None:
+        self.stopped.set()
+        self.thread.join()
@@ -0,0 +1,65 @@
+import chess_rules
+from database.encoding import decode_move_list
+
+# The opening explorer index: for each position in the first INDEXED_PLIES plies of every archived game, how often each
+# move was played from it and how those games ended
+INDEXED_PLIES = 20
+
+# Winner -> the (WhiteWins, BlackWins, Draws) a game adds to the counts
+result_counts = {
+    chess_rules.WHITE: (1, 0, 0),
+    chess_rules.BLACK: (0, 1, 0),
+    0: (0, 0, 1),
+}
+
+
+def to_signed(position_hash: int) -> int:
+    # SQLite integers are signed 64 bit, so hashes with the top bit set are stored as negative numbers
+    return position_hash - (1 << 64) if position_hash >= 1 << 63 else position_hash
+
+
+def position_rows(move_list: str | bytes, winner: int, position_hashes: list[int] | None = None) -> list[tuple]:
+    # (PositionHash, Move, WhiteWins, BlackWins, Draws) for each of the first INDEXED_PLIES plies of a game
+    # position_hashes are the hashes of the positions before each move when the game has already been replayed (see
+    # chess_rules.validate_move_list), otherwise the game is replayed here
+    # Games archived before moves were validated may contain illegal moves, so indexing stops at the first one
+    if winner not in result_counts:
+        return []
+
+    try:
+        moves = chess_rules.parse_move_list(decode_move_list(move_list))
+    except chess_rules.IllegalMoveError:
+        return []
+
+    if position_hashes is None:
+        position_hashes = []
+        board = chess_rules.Board()
+
+        for move in moves[:INDEXED_PLIES]:
+            position_hashes.append(chess_rules.zobrist_hash(board))
+
+            try:
+                board.play_moves([move])
+            except chess_rules.IllegalMoveError:
+                position_hashes.pop()
+                break
+
+    return [
+        (to_signed(position_hash), move, *result_counts[winner]) for position_hash, move in zip(position_hashes, moves)
+    ]
+
+
+def index_games(connection, rows: list[tuple]) -> None:
+    # Adds rows from position_rows to the counts
+    # Counts aren't taken away when games are deleted, the index only ever grows
+    connection.executemany(
+        """
+            INSERT INTO PositionMoves (PositionHash, Move, WhiteWins, BlackWins, Draws)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (PositionHash, Move) DO UPDATE SET
+                WhiteWins = WhiteWins + excluded.WhiteWins,
+                BlackWins = BlackWins + excluded.BlackWins,
+                Draws = Draws + excluded.Draws
+        """,
+        rows,
+    )
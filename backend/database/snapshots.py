@@ -0,0 +1,54 @@
+from typing import Iterator
+
+import chess_rules
+from database.encoding import decode_move_list
+
+# Snapshots of archived games, so the Review page can jump close to any ply instead of replaying the whole game
+# Snapshot n is the FEN of the position after n plies. Only every SNAPSHOT_INTERVAL-th ply has one (a FEN is several
+# times the size of the packed moves between two snapshots), and the plies in between are replayed from the one before
+SNAPSHOT_INTERVAL = 16
+
+
+def replayed_positions(move_list: str | bytes, ply: int = 0, fen: str = chess_rules.STARTING_FEN) -> Iterator[tuple]:
+    # (Ply, Board) for the position fen after ply plies and every position after it in the game
+    # The same board is yielded each time, changed by each move
+    # Games archived before moves were validated may contain illegal moves, so the positions stop at the first one
+    board = chess_rules.Board(fen)
+    yield ply, board
+
+    for text in decode_move_list(move_list).split(" ")[ply:]:
+        try:
+            board.play_moves([chess_rules.uci_to_move(text)])
+        except (KeyError, chess_rules.IllegalMoveError):
+            return
+
+        ply += 1
+        yield ply, board
+
+
+def game_snapshots(move_list: str | bytes) -> list[tuple]:
+    # (Ply, Fen) for every SNAPSHOT_INTERVAL-th position in a game, starting with the starting position
+    return [(ply, board.fen()) for ply, board in replayed_positions(move_list) if ply % SNAPSHOT_INTERVAL == 0]
+
+
+def positions_between(move_list: str | bytes, snapshot: tuple, first_ply: int, last_ply: int) -> list[tuple]:
+    # (Ply, Fen) for each position from first_ply to last_ply inclusive, replayed from a (Ply, Fen) snapshot at or
+    # before first_ply. Plies past the end of the game are left out
+    rows = []
+
+    for ply, board in replayed_positions(move_list, *snapshot):
+        if ply > last_ply:
+            break
+
+        if ply >= first_ply:
+            rows.append((ply, board.fen()))
+
+    return rows
+
+
+def store_snapshots(connection, game_id: int, rows: list[tuple]) -> None:
+    # Two requests can compute a game's snapshots at the same time, the second one's are the same so they are ignored
+    connection.executemany(
+        "INSERT OR IGNORE INTO GamePositions (Gameid, Ply, Fen) VALUES (?, ?, ?)",
+        [(game_id, ply, fen) for ply, fen in rows],
+    )
@@ -1,7 +1,13 @@
-import datetime
 import json
 
+from chess_rules import move_to_uci
+from database.encoding import decode_move_list, decode_settings
+
+# Every model uses __slots__, so instances have no __dict__ and listing thousands of rows allocates less
+# from_row builds an instance straight from a sqlite3 row tuple without going through __init__
 class Table:
+    __slots__ = ("_id",)
+
     def __init__(self, _id: str):
         self._id = _id
 
@@ -9,6 +15,8 @@ class Table:
         raise "to_dict method not implemented on subclass"
 
 class User(Table):
+    __slots__ = ("email", "password_hash", "auth_level", "name", "level_id")
+
     def __init__(self, _id: str, email: str, password_hash: str, auth_level: int, name: str, level_id: str = None):
         super().__init__(_id)
         self.email = email
@@ -17,6 +25,16 @@ class User(Table):
         self.name = name
         self.level_id = level_id
 
+    @classmethod
+    def from_row(cls, row: tuple) -> "User":
+        # Users.* optionally followed by UserCampaign.Levelid
+        user = cls.__new__(cls)
+        (_, user.email, user.password_hash, user.auth_level, user.name) = row[:5]
+        user._id = str(row[0])
+        user.level_id = str(row[5]) if len(row) > 5 else None
+
+        return user
+
     def to_dict(self, inclucde_sensitive: bool = False):
         dictionary = {
             "id": self._id,
@@ -33,20 +51,40 @@ class User(Table):
 
 
 class Link(Table):
-    def __init__(self, _id: str, link_suffix: str, created_at: str, expires_at: str, game_id: str):
+    __slots__ = ("linkURL", "created_at", "expires_at", "game_id")
+
+    # created_at and expires_at are Unix epoch seconds
+    def __init__(self, _id: str, link_suffix: str, created_at: int, expires_at: int, game_id: str):
         super().__init__(_id)
         self.linkURL = link_suffix
         self.created_at = created_at
         self.expires_at = expires_at
         self.game_id = game_id
 
-    def isExpired(self):
-        expires_at_timestamp = datetime.datetime.strptime(self.expires_at, "%Y-%m-%d %H:%M:%S")
+    @classmethod
+    def from_row(cls, row: tuple) -> "Link":
+        # Links.*
+        link = cls.__new__(cls)
+        (_, link.linkURL, link.created_at, link.expires_at, _) = row[:5]
+        link._id = str(row[0])
+        link.game_id = str(row[4])
 
-        return expires_at_timestamp.timestamp() < datetime.datetime.now(datetime.timezone.utc).timestamp()
+        return link
 
 
 class Game(Table):
+    __slots__ = (
+        "move_list",
+        "game_result",
+        "date_played",
+        "custom_settings",
+        "human_plays_as",
+        "winner",
+        "user_id",
+        "campaign_id",
+        "level_id",
+    )
+
     def __init__(
         self,
         _id: str,
@@ -71,6 +109,29 @@ class Game(Table):
         self.campaign_id = str(campaign_id) if campaign_id is not None else None
         self.level_id = str(level_id) if level_id is not None else None
 
+    @classmethod
+    def from_row(cls, row: tuple) -> "Game":
+        # GameHistory.*
+        game = cls.__new__(cls)
+        (
+            _,
+            game.move_list,
+            game.game_result,
+            game.date_played,
+            game.custom_settings,
+            game.human_plays_as,
+            game.winner,
+        ) = row[:7]
+        # Stored packed and compressed by archive_game
+        game.move_list = decode_move_list(game.move_list)
+        game.custom_settings = decode_settings(game.custom_settings)
+        game._id = str(row[0])
+        game.user_id = str(row[7])
+        game.campaign_id = str(row[8]) if row[8] is not None else None
+        game.level_id = str(row[9]) if row[9] is not None else None
+
+        return game
+
     def to_dict(self):
         return {
             "id": self._id,
@@ -86,7 +147,83 @@ class Game(Table):
         }
 
 
+class GameSummary(Table):
+    # A game without its move list, for listing many games at once
+    __slots__ = (
+        "game_result",
+        "date_played",
+        "custom_settings",
+        "human_plays_as",
+        "winner",
+        "user_id",
+        "move_count",
+        "campaign_id",
+        "level_id",
+    )
+
+    def __init__(
+        self,
+        _id: str,
+        game_result: str,
+        date_played: str,
+        custom_settings: str,
+        human_plays_as: int,
+        winner: int,
+        user_id: str,
+        move_count: int,
+        campaign_id: str | None = None,
+        level_id: str | None = None,
+    ):
+        super().__init__(_id)
+        self.game_result = game_result
+        self.date_played = date_played
+        self.custom_settings = custom_settings
+        self.human_plays_as = human_plays_as
+        self.winner = winner
+        self.user_id = user_id
+        self.move_count = move_count
+        self.campaign_id = str(campaign_id) if campaign_id is not None else None
+        self.level_id = str(level_id) if level_id is not None else None
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "GameSummary":
+        # Gameid, GameResult, DatePlayed, CustomSettings, HumanPlaysAs, Winner, Userid, move count, Campaignid, Levelid
+        summary = cls.__new__(cls)
+        (
+            _,
+            summary.game_result,
+            summary.date_played,
+            summary.custom_settings,
+            summary.human_plays_as,
+            summary.winner,
+        ) = row[:6]
+        summary.custom_settings = decode_settings(summary.custom_settings)
+        summary._id = str(row[0])
+        summary.user_id = str(row[6])
+        summary.move_count = row[7]
+        summary.campaign_id = str(row[8]) if row[8] is not None else None
+        summary.level_id = str(row[9]) if row[9] is not None else None
+
+        return summary
+
+    def to_dict(self):
+        return {
+            "id": self._id,
+            "game_result": self.game_result,
+            "date_played": self.date_played,
+            "custom_settings": self.custom_settings,
+            "human_plays_as": self.human_plays_as,
+            "winner": self.winner,
+            "user_id": self.user_id,
+            "move_count": self.move_count,
+            "campaign_id": self.campaign_id,
+            "level_id": self.level_id,
+        }
+
+
 class CampaignLevel(Table):
+    __slots__ = ("text", "battle_settings")
+
     text: list[str]
     battle_settings: dict | None
 
@@ -97,3 +234,89 @@ class CampaignLevel(Table):
 
     def to_dict(self):
         return {"id": self._id, "text": self.text, "battle_settings": self.battle_settings}
+
+
+class PositionMove(Table):
+    # How often a move was played from a position in the opening explorer index, and how those games ended
+    __slots__ = ("move", "white_wins", "black_wins", "draws")
+
+    def __init__(self, move: str, white_wins: int, black_wins: int, draws: int):
+        super().__init__(move)
+        self.move = move
+        self.white_wins = white_wins
+        self.black_wins = black_wins
+        self.draws = draws
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "PositionMove":
+        # Move, WhiteWins, BlackWins, Draws
+        position_move = cls.__new__(cls)
+        (_, position_move.white_wins, position_move.black_wins, position_move.draws) = row
+        position_move.move = move_to_uci(row[0])
+        position_move._id = position_move.move
+
+        return position_move
+
+    def to_dict(self):
+        return {
+            "move": self.move,
+            "games": self.white_wins + self.black_wins + self.draws,
+            "white_wins": self.white_wins,
+            "black_wins": self.black_wins,
+            "draws": self.draws,
+        }
+
+
+class GamePosition(Table):
+    # The position after a number of plies of an archived game
+    __slots__ = ("ply", "fen")
+
+    def __init__(self, ply: int, fen: str):
+        super().__init__(str(ply))
+        self.ply = ply
+        self.fen = fen
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "GamePosition":
+        # Ply, Fen
+        game_position = cls.__new__(cls)
+        (game_position.ply, game_position.fen) = row
+        game_position._id = str(game_position.ply)
+
+        return game_position
+
+    def to_dict(self):
+        return {"ply": self.ply, "fen": self.fen}
+
+
+class LevelStats(Table):
+    # A user's results on one campaign level
+    __slots__ = ("level_id", "attempts", "wins", "losses", "last_played")
+
+    def __init__(self, level_id: str, attempts: int, wins: int, losses: int, last_played: str):
+        super().__init__(level_id)
+        self.level_id = level_id
+        self.attempts = attempts
+        self.wins = wins
+        self.losses = losses
+        self.last_played = last_played
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "LevelStats":
+        # Levelid, Attempts, Wins, Losses, LastPlayed
+        stats = cls.__new__(cls)
+        (_, stats.attempts, stats.wins, stats.losses, stats.last_played) = row
+        stats.level_id = str(row[0])
+        stats._id = stats.level_id
+
+        return stats
+
+    def to_dict(self):
+        return {
+            "level_id": self.level_id,
+            "attempts": self.attempts,
+            "wins": self.wins,
+            "draws": self.attempts - self.wins - self.losses,
+            "losses": self.losses,
+            "last_played": self.last_played,
+        }
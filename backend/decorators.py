@@ -28,26 +28,30 @@ def authorisation_required(level):
             fullToken = request.cookies.get("token")
             tempToken = request.cookies.get("tempToken")
 
-            decoded_full_token = crypto_auth.verify(token=fullToken, public_key=app.config["PUBLIC_KEY"])
-            decoded_temp_token = crypto_auth.verify(token=tempToken, public_key=app.config["PUBLIC_KEY"])
-
             req_user_id = kwargs.get("user_id")
             req_game_id = kwargs.get("game_id")
 
-            # Decide which token we should be using
-            if level != const.AuthLevel.unauthenicatedUser:
-                # We cannot use the temp token here
-                token = decoded_full_token
-            else:
-                # If scopes match, we can use the temp token
-                if match_scopes(decoded_temp_token, {"id": req_user_id, "gameid": req_game_id}):
-                    token = decoded_temp_token
-                else:
-                    token = decoded_full_token
+            # Decide which token we should be using, only verifying the signature of the one we pick
+            token = None
+
+            # We cannot use the temp token unless the level allows it
+            if level == const.AuthLevel.unauthenicatedUser and tempToken:
+                temp_scopes = {"id": req_user_id, "gameid": req_game_id}
+
+                # Check the scopes on the unverified payload first, so a temp token that could never be used costs nothing
+                if match_scopes(crypto_auth.decode(tempToken), temp_scopes):
+                    decoded_temp_token = crypto_auth.verify(token=tempToken, public_key=app.config["PUBLIC_KEY"])
+
+                    # If scopes still match after verification, we can use the temp token
+                    if match_scopes(decoded_temp_token, temp_scopes):
+                        token = decoded_temp_token
+
+            if token is None:
+                token = crypto_auth.verify(token=fullToken, public_key=app.config["PUBLIC_KEY"])
 
             # Handles invalid signatures and expired tokens
             if token["failure"]:
-                return jsonify({"error": True, "message": decoded_full_token["failure"]}), 401
+                return jsonify({"error": True, "message": token["failure"]}), 401
 
             # If our full token does not match the user (and isn't a @me request) then they are 403
             if not match_scopes(token, {"id": req_user_id}) and req_user_id != "@me":
@@ -0,0 +1,57 @@
+import itertools
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other by top level name (import chess_rules, import constants as const), as they do
+# when the app is run from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ProdConfig reads the production key from the environment when config is imported, the tests use DevConfig
+os.environ.setdefault("PROD_PRIVATE_KEY", "1")
+
+user_numbers = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    # The Flask app with its database and generator table in a temporary directory
+    directory = tmp_path_factory.mktemp("data")
+
+    import constants as const
+
+    const.database_path = str(directory / "data.db")
+    const.generator_table_path = str(directory / "generator_table.json")
+
+    import app as app_module
+
+    return app_module.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client(use_cookies=False)
+
+
+def signup(client) -> tuple:
+    # A new user, as (id, headers carrying their token)
+    number = next(user_numbers)
+    email = f"player{number}@example.com"
+
+    client.post("/api/signup", json={"email": email, "name": f"Player {number}", "password": "Passw0rdX"})
+    response = client.post("/api/login", json={"email": email, "password": "Passw0rdX"})
+    token = response.headers.getlist("Set-Cookie")[0].split(";")[0].split("=", 1)[1]
+    headers = {"Cookie": f"token={token}"}
+
+    return client.get("/api/users/@me", headers=headers).json["data"]["id"], headers
+
+
+@pytest.fixture
+def user(client):
+    return signup(client)
+
+
+@pytest.fixture
+def other_user(client):
+    return signup(client)
@@ -0,0 +1,44 @@
+FOOLS_MATE = {
+    "moveList": "f2f3 e7e5 g2g4 d8h4",
+    "gameResult": "Checkmate",
+    "humanPlaysAs": 16,
+    "winner": 8,
+    "customSettings": {"depth": 2},
+}
+
+
+def archive(client, user, **fields):
+    user_id, headers = user
+
+    return client.put(f"/api/users/{user_id}/games", headers=headers, json={**FOOLS_MATE, **fields})
+
+
+def test_game_is_archived(client, user):
+    response = archive(client, user, levelid="1")
+
+    assert response.status_code == 201
+
+
+def test_null_custom_settings_is_missing_data(client, user):
+    response = archive(client, user, customSettings=None)
+
+    assert response.status_code == 400
+    assert response.json["message"] == "All game data not provided in the request"
+
+
+def test_non_numeric_winner_is_400(client, user):
+    assert archive(client, user, winner="black").status_code == 400
+
+
+def test_unknown_level_is_400(client, user):
+    response = archive(client, user, levelid="999")
+
+    assert response.status_code == 400
+    assert response.json["message"] == "Level or campaign does not exist"
+
+
+def test_wrong_result_is_400(client, user):
+    response = archive(client, user, winner=16)
+
+    assert response.status_code == 400
+    assert response.json["message"] == "The game result does not match the move list"
@@ -0,0 +1,41 @@
+from tests.test_archive_game import archive
+
+
+def summary(client, user) -> dict:
+    user_id, headers = user
+
+    return client.get(f"/api/users/{user_id}/campaign-summary", headers=headers).json["data"]
+
+
+def test_new_user_has_not_completed_the_campaign(client, user):
+    data = summary(client, user)
+
+    assert data["levels"] == []
+    assert data["totals"] == {"attempts": 0, "wins": 0, "draws": 0, "losses": 0}
+    assert data["playstyles"]["aggressive"] == {"attempts": 0, "wins": 0}
+    assert data["completed_at"] is None
+
+
+def test_games_count_towards_their_levels_playstyles(client, user):
+    archive(client, user, levelid="1")  # Lost against an aggressive opponent
+    archive(client, user, levelid="4", humanPlaysAs=8)  # Won against an aggressive, trade heavy opponent
+    archive(client, user)  # Not a campaign game
+
+    data = summary(client, user)
+
+    assert data["totals"] == {"attempts": 2, "wins": 1, "draws": 0, "losses": 1}
+    assert data["playstyles"]["aggressive"] == {"attempts": 2, "wins": 1}
+    assert data["playstyles"]["trade_heavy"] == {"attempts": 1, "wins": 1}
+    assert data["playstyles"]["tactically_strong"] == {"attempts": 0, "wins": 0}
+    assert data["completed_at"] is None
+
+
+def test_beating_the_final_level_completes_the_campaign(client, user):
+    archive(client, user, levelid="8")
+    assert summary(client, user)["completed_at"] is None
+
+    archive(client, user, levelid="8", humanPlaysAs=8)
+    data = summary(client, user)
+
+    assert data["completed_at"] == next(level for level in data["levels"] if level["level_id"] == "8")["last_played"]
+    assert data["playstyles"]["tactically_strong"] == {"attempts": 2, "wins": 1}
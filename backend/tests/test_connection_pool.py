@@ -0,0 +1,29 @@
+import sqlite3
+
+import pytest
+
+from database.connection_pool import ConnectionPool
+
+
+def test_failed_reader_open_does_not_use_up_the_pool(tmp_path, monkeypatch):
+    pool = ConnectionPool(str(tmp_path / "data.db"), size=2, timeout=0.1)
+    open_reader = pool.open_reader
+
+    def failing_open_reader():
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(pool, "open_reader", failing_open_reader)
+
+    for _ in range(pool.size + 1):
+        with pytest.raises(sqlite3.OperationalError):
+            with pool.read():
+                pass
+
+    assert pool.stats()["readers_open"] == 0
+
+    monkeypatch.setattr(pool, "open_reader", open_reader)
+
+    with pool.read() as connection:
+        assert connection.execute("SELECT 1").fetchone() == (1,)
+
+    assert pool.stats()["readers_open"] == 1
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+import threading
+
+import crypto_auth
+
+BACKEND_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def executor_start_method() -> str:
+    return crypto_auth.crypto_executor._mp_context.get_start_method()
+
+
+def test_executor_forks_when_it_is_the_only_thread():
+    # Other tests leave threads running (the app's link reaper), so this is checked in a fresh interpreter
+    script = (
+        "import crypto_auth; crypto_auth.start_crypto_executor(1); "
+        "print(crypto_auth.crypto_executor._mp_context.get_start_method()); "
+        "print(crypto_auth.offload(crypto_auth.create_password_hash, 'Passw0rdX', 1))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIRECTORY, capture_output=True, text=True, check=True
+    ).stdout.split("\n")
+
+    assert output[0] == "fork"
+    assert output[1].endswith(" 1")
+
+
+def test_executor_does_not_fork_once_other_threads_are_running():
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+
+    try:
+        crypto_auth.start_crypto_executor(1)
+
+        assert executor_start_method() == "forkserver"
+        assert crypto_auth.offload(crypto_auth.create_password_hash, "Passw0rdX", 1).endswith(" 1")
+    finally:
+        crypto_auth.shutdown_crypto_executor()
+        stop.set()
+        thread.join()
@@ -0,0 +1,181 @@
+import pytest
+from flask import Flask, jsonify
+
+import constants as const
+import crypto_auth
+from crypto_auth.elliptic_curve import curve
+from decorators import authorisation_required
+
+PRIVATE_KEY = 0x1D2B3C4D5E6F7A8B9C0D1E2F3A4B5C6D7E8F9A0B1C2D3E4F5A6B7C8D9E0F1A2B
+PUBLIC_KEY = (lambda x, y: (x << curve.n_bitlength) ^ y)(*curve.scalar_multiplication(PRIVATE_KEY, curve.G))
+
+
+def token(
+    user_id: str,
+    level: int = const.AuthLevel.default,
+    game_id: str | None = None,
+    duration: int = 3600,
+    private_key: int = PRIVATE_KEY,
+) -> str:
+    msg = {"authorisation_level": level, "id": user_id}
+
+    if game_id is not None:
+        msg["gameid"] = game_id
+
+    return crypto_auth.create_token(msg, duration=duration, private_key=private_key)
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config["PUBLIC_KEY"] = PUBLIC_KEY
+
+    @app.route("/users/<user_id>/games/<game_id>")
+    @authorisation_required(level=const.AuthLevel.unauthenicatedUser)
+    def game(user_id=None, game_id=None, decoded_token={}):
+        return jsonify({"id": decoded_token["id"], "gameid": decoded_token.get("gameid")})
+
+    @app.route("/users/<user_id>/games")
+    @authorisation_required(level=const.AuthLevel.default)
+    def games(user_id=None, decoded_token={}):
+        return jsonify({"id": decoded_token["id"]})
+
+    @app.route("/users")
+    @authorisation_required(level=const.AuthLevel.admin)
+    def users(decoded_token={}):
+        return jsonify({"id": decoded_token["id"]})
+
+    return app.test_client(use_cookies=False)
+
+
+@pytest.fixture
+def verifications(monkeypatch):
+    # Counts the signatures checked by each request
+    calls = []
+    verify_signature = curve.verifySignature
+
+    def counting_verify_signature(*args):
+        calls.append(args)
+        return verify_signature(*args)
+
+    monkeypatch.setattr(curve, "verifySignature", counting_verify_signature)
+    monkeypatch.setattr(crypto_auth, "verification_cache", None)
+
+    return calls
+
+
+def get(client, path: str, full_token: str | None = None, temp_token: str | None = None):
+    cookies = []
+
+    if full_token is not None:
+        cookies.append(f"token={full_token}")
+
+    if temp_token is not None:
+        cookies.append(f"tempToken={temp_token}")
+
+    return client.get(path, headers={"Cookie": "; ".join(cookies)} if cookies else {})
+
+
+def test_temp_token_with_matching_scopes_is_used(client, verifications):
+    temp_token = token("7", level=const.AuthLevel.unauthenicatedUser, game_id="3")
+
+    response = get(client, "/users/7/games/3", temp_token=temp_token)
+
+    assert response.status_code == 200
+    assert response.json == {"id": "7", "gameid": "3"}
+    assert len(verifications) == 1
+
+
+def test_temp_token_for_another_game_falls_back_to_full_token(client, verifications):
+    temp_token = token("7", level=const.AuthLevel.unauthenicatedUser, game_id="4")
+
+    response = get(client, "/users/7/games/3", full_token=token("7"), temp_token=temp_token)
+
+    assert response.status_code == 200
+    assert response.json == {"id": "7", "gameid": None}
+    # The temp token's scopes are ruled out without checking its signature
+    assert len(verifications) == 1
+
+
+def test_temp_token_for_another_game_without_full_token_is_401(client, verifications):
+    temp_token = token("7", level=const.AuthLevel.unauthenicatedUser, game_id="4")
+
+    response = get(client, "/users/7/games/3", temp_token=temp_token)
+
+    assert response.status_code == 401
+    assert response.json["message"] == "Token not provided"
+    assert len(verifications) == 0
+
+
+def test_temp_token_is_not_used_above_unauthenticated_level(client, verifications):
+    temp_token = token("7", level=const.AuthLevel.unauthenicatedUser, game_id="3")
+
+    assert get(client, "/users/7/games", temp_token=temp_token).status_code == 401
+    assert get(client, "/users/7/games", full_token=token("7"), temp_token=temp_token).status_code == 200
+    assert len(verifications) == 1
+
+
+def test_forged_temp_token_falls_back_to_full_token(client, verifications):
+    # Claims the right scopes but is signed with the wrong key, so only the full token can authorise the request
+    forged = token("7", level=const.AuthLevel.unauthenicatedUser, game_id="3", private_key=PRIVATE_KEY + 1)
+
+    response = get(client, "/users/7/games/3", full_token=token("7"), temp_token=forged)
+
+    assert response.status_code == 200
+    assert response.json == {"id": "7", "gameid": None}
+    assert len(verifications) == 2
+
+
+def test_full_token_is_verified_once(client, verifications):
+    assert get(client, "/users/7/games", full_token=token("7")).status_code == 200
+    assert len(verifications) == 1
+
+
+def test_invalid_signature_is_401(client, verifications):
+    response = get(client, "/users/7/games", full_token=token("7", private_key=PRIVATE_KEY + 1))
+
+    assert response.status_code == 401
+    assert response.json["message"] == "Token signature invalid"
+
+
+def test_expired_token_is_401_without_checking_the_signature(client, verifications):
+    response = get(client, "/users/7/games", full_token=token("7", duration=-1))
+
+    assert response.status_code == 401
+    assert response.json["message"] == "Token expired"
+    assert len(verifications) == 0
+
+
+def test_missing_token_is_401(client, verifications):
+    assert get(client, "/users/7/games").status_code == 401
+
+
+def test_another_users_resource_is_403(client, verifications):
+    assert get(client, "/users/8/games", full_token=token("7")).status_code == 403
+
+
+def test_insufficient_level_is_403(client, verifications):
+    response = get(client, "/users", full_token=token("7"))
+
+    assert response.status_code == 403
+    assert len(verifications) == 1
+
+
+def test_admin_can_access_other_users_and_admin_routes(client, verifications):
+    admin_token = token("1", level=const.AuthLevel.admin)
+
+    assert get(client, "/users/8/games", full_token=admin_token).status_code == 200
+    assert get(client, "/users", full_token=admin_token).status_code == 200
+    assert len(verifications) == 2
+
+
+def test_malformed_token_is_401(client, verifications):
+    response = get(client, "/users/7/games", full_token="AAAA")
+
+    assert response.status_code == 401
+    assert response.json["message"] == "Token malformed"
+
+
+def test_malformed_temp_token_falls_back_to_full_token(client, verifications):
+    assert get(client, "/users/7/games/3", full_token=token("7"), temp_token="AAAA").status_code == 200
+    assert len(verifications) == 1
@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+from crypto_auth.elliptic_curve import EllipticCurve, curve
+
+
+def copied_curve() -> EllipticCurve:
+    # A copy of the curve with empty caches, so the tests don't depend on (or change) what the shared one remembers
+    return EllipticCurve(name=curve.name, p=curve.p, a=curve.a, b=curve.b, G=curve.G, n=curve.n)
+
+
+@pytest.fixture
+def fresh_curve():
+    return copied_curve()
+
+
+def public_key(private_key: int) -> int:
+    (x, y) = curve.scalar_multiplication(private_key, curve.G)
+    return (x << curve.n_bitlength) ^ y
+
+
+def test_public_key_cache_forgets_the_least_recently_used_key(fresh_curve):
+    fresh_curve.MAX_CACHED_PUBLIC_KEYS = 2
+    first, second, third = public_key(2), public_key(3), public_key(5)
+
+    fresh_curve.load_public_key(first)
+    fresh_curve.load_public_key(second)
+    # Using the first key again makes the second one the least recently used
+    fresh_curve.load_public_key(first)
+    fresh_curve.load_public_key(third)
+
+    assert list(fresh_curve.public_keys) == [first, third]
+
+
+def test_public_key_cache_is_shared_between_threads(fresh_curve):
+    fresh_curve.MAX_CACHED_PUBLIC_KEYS = 2
+    keys = [public_key(private_key) for private_key in range(2, 10)]
+    barrier = threading.Barrier(len(keys))
+    loaded = {}
+
+    def load(key):
+        barrier.wait()
+
+        for _ in range(3):
+            loaded[key] = fresh_curve.load_public_key(key)
+
+    threads = [threading.Thread(target=load, args=(key,)) for key in keys]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    # Every thread got its own key back, and the cache never grew past its limit
+    assert all(loaded[key][0] == ((key >> curve.n_bitlength), key & (2**curve.n_bitlength - 1)) for key in keys)
+    assert len(fresh_curve.public_keys) == 2
+
+
+def first_nonce(signing_curve: EllipticCurve, full_hash: int, private_key: int) -> int:
+    return next(signing_curve.deterministic_nonces(full_hash, private_key))
+
+
+def test_nonce_cache_forgets_the_least_recently_used_private_key(fresh_curve):
+    fresh_curve.MAX_CACHED_PRIVATE_KEYS = 2
+
+    first_nonce(fresh_curve, 1, 2)
+    first_nonce(fresh_curve, 1, 3)
+    # Signing with the first key again makes the second one the least recently used
+    first_nonce(fresh_curve, 1, 2)
+    first_nonce(fresh_curve, 1, 5)
+
+    assert list(fresh_curve.nonce_hmacs) == [2, 5]
+
+
+def test_nonces_are_the_same_when_signing_on_several_threads(fresh_curve):
+    fresh_curve.MAX_CACHED_PRIVATE_KEYS = 2
+    private_keys = range(2, 10)
+    # Nonces from a curve that is only ever used on this thread
+    expected = {key: first_nonce(copied_curve(), 7, key) for key in private_keys}
+    barrier = threading.Barrier(len(private_keys))
+    nonces = {}
+
+    def sign(private_key):
+        barrier.wait()
+
+        nonces[private_key] = [first_nonce(fresh_curve, 7, private_key) for _ in range(50)]
+
+    threads = [threading.Thread(target=sign, args=(key,)) for key in private_keys]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert nonces == {key: [expected[key]] * 50 for key in private_keys}
+    assert len(fresh_curve.nonce_hmacs) == 2
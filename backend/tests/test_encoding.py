@@ -0,0 +1,54 @@
+import sqlite3
+import sys
+
+from database.encoding import decode_move_list, decode_settings, encode_move_list, encode_settings
+
+SETTINGS = '{"aggressiveness": 80, "blindSpots": 10, "depth": 3, "name": "Troll", "positionalPlay": 30, "tradeHappy": 90}'
+
+
+def test_move_list_round_trips():
+    move_list = "e2e4 e7e5 g1f3 b8c6 a7a8q"
+
+    assert type(encode_move_list(move_list)) == bytes
+    assert decode_move_list(encode_move_list(move_list)) == move_list
+
+
+def test_move_list_with_a_trailing_newline_is_kept_as_text():
+    assert encode_move_list("e2e4\n") == "e2e4\n"
+
+
+def test_settings_round_trip():
+    assert decode_settings(encode_settings(SETTINGS)) == SETTINGS
+
+
+def test_packing_migration_skips_rows_it_cannot_encode(tmp_path, monkeypatch):
+    create_tables = sys.modules["database.create_tables"]
+    version = create_tables.migrations.index(create_tables.pack_game_history)
+
+    # A database from before the packing migration, with rows that were never validated
+    monkeypatch.setattr(create_tables, "migrations", create_tables.migrations[:version])
+    connection = sqlite3.connect(str(tmp_path / "data.db"))
+    create_tables.create_tables(connection)
+    connection.execute("INSERT INTO Users (Email, PasswordHash, AuthenticationLevel, Name) VALUES ('a@b.c', 'h', 2, 'A')")
+    connection.executemany(
+        """
+            INSERT INTO GameHistory (MoveList, GameResult, DatePlayed, CustomSettings, HumanPlaysAs, Winner, Userid)
+            VALUES (?, 'Checkmate', CURRENT_TIMESTAMP, ?, 16, 8, 1)
+        """,
+        [("f2f3 e7e5 g2g4 d8h4", SETTINGS), ("e2e4\n", SETTINGS), ("unencodable", SETTINGS)] * 3,
+    )
+    connection.commit()
+
+    def encode_or_fail(move_list):
+        if move_list == "unencodable":
+            raise ValueError("Can't encode")
+
+        return encode_move_list(move_list)
+
+    monkeypatch.setattr(create_tables, "encode_move_list", encode_or_fail)
+    create_tables.pack_game_history(connection, batch_size=2)
+
+    rows = connection.execute("SELECT typeof(MoveList), typeof(CustomSettings) FROM GameHistory ORDER BY Gameid").fetchall()
+    connection.close()
+
+    assert rows == [("blob", "blob"), ("text", "blob"), ("text", "text")] * 3
@@ -0,0 +1,49 @@
+import base64
+import json
+
+import pytest
+
+from tests.test_archive_game import archive
+
+
+def encode_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def test_pages_follow_the_cursor(client, user):
+    user_id, headers = user
+
+    for _ in range(3):
+        archive(client, user)
+
+    first = client.get(f"/api/users/{user_id}/games/all?limit=2", headers=headers).json
+    second = client.get(f"/api/users/{user_id}/games/all?limit=2&cursor={first['next_cursor']}", headers=headers).json
+
+    assert len(first["data"]) == 2
+    assert len(second["data"]) == 1
+    assert second["next_cursor"] is None
+    assert {game["id"] for game in first["data"]}.isdisjoint(game["id"] for game in second["data"])
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not base64!",
+        encode_cursor({"a": 1}),
+        encode_cursor(["a"]),
+        encode_cursor(["a", {}]),
+        encode_cursor([{}, 1]),
+        encode_cursor(["2024-01-01 00:00:00", "1"]),
+        encode_cursor(["2024-01-01 00:00:00", 1.5]),
+        encode_cursor(["2024-01-01 00:00:00", True]),
+        encode_cursor(["2024-01-01 00:00:00", 2**64]),
+        encode_cursor([2**64, 1]),
+    ],
+)
+def test_invalid_cursor_is_400(client, user, cursor):
+    user_id, headers = user
+
+    response = client.get(f"/api/users/{user_id}/games/all?limit=2&cursor={cursor}", headers=headers)
+
+    assert response.status_code == 400
+    assert response.json["message"] == "Invalid cursor"
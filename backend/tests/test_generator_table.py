@@ -0,0 +1,55 @@
+import json
+import os
+
+from crypto_auth.elliptic_curve import curve
+
+
+def saved_table(path) -> list:
+    with open(path) as file:
+        return json.load(file)
+
+
+def test_corrupt_file_is_rebuilt(tmp_path):
+    path = tmp_path / "generator_table.json"
+    path.write_text("[[[1,2")
+
+    table = curve.precompute_generator_table(str(path))
+
+    assert curve.to_affine(curve.fixed_base_multiplication(12345, table)) == curve.scalar_multiplication(12345, curve.G)
+    assert saved_table(path) == [[list(point[:2]) for point in row[1:]] for row in table]
+    # Only the table itself is left behind
+    assert os.listdir(tmp_path) == ["generator_table.json"]
+
+
+def test_wrongly_shaped_file_is_rebuilt(tmp_path):
+    path = tmp_path / "generator_table.json"
+
+    for contents in ('{"a": 1}', "[[[1, 2, 3]]]", "[[1]]", "null"):
+        path.write_text(contents)
+
+        table = curve.precompute_generator_table(str(path))
+
+        assert len(saved_table(path)) == len(table)
+
+
+def test_points_on_the_curve_in_the_wrong_place_are_rejected(tmp_path):
+    path = tmp_path / "generator_table.json"
+    curve.precompute_generator_table(str(path))
+
+    saved = saved_table(path)
+    # Every point is still on the curve, but 14 x G and 15 x G have been swapped
+    saved[0][13], saved[0][14] = saved[0][14], saved[0][13]
+
+    assert not curve.is_generator_table([[(x, y, 1) for (x, y) in row] for row in saved])
+
+    path.write_text(json.dumps(saved))
+    table = curve.precompute_generator_table(str(path))
+
+    assert curve.to_affine(table[0][15]) == curve.scalar_multiplication(15, curve.G)
+
+
+def test_saved_table_is_loaded(tmp_path):
+    path = tmp_path / "generator_table.json"
+    built = curve.precompute_generator_table(str(path))
+
+    assert curve.precompute_generator_table(str(path)) == built
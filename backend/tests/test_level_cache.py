@@ -0,0 +1,37 @@
+import pytest
+
+from database.level_cache import AdventureLevelCache
+from database.table_classes import CampaignLevel
+
+LEVELS = [CampaignLevel(1, '["Once upon a time"]', '{"depth": 2}'), CampaignLevel(2, '["The end"]', None)]
+
+
+def test_level_ids_are_compared_as_numbers():
+    cache = AdventureLevelCache(LEVELS)
+
+    assert cache.get("01") is cache.get("1")
+    assert cache.get("1")[0].battle_settings == {"depth": 2}
+
+
+def test_final_battle_is_the_last_level_with_a_battle():
+    assert AdventureLevelCache(LEVELS).final_battle_id == "1"
+
+
+@pytest.mark.parametrize("level_id", ["3", "²", "-1", "1.0", ""])
+def test_unknown_level_is_none(level_id):
+    assert AdventureLevelCache(LEVELS).get(level_id) is None
+
+
+@pytest.mark.parametrize("level_id", ["%C2%B2", "99"])
+def test_unknown_level_is_404(client, level_id):
+    response = client.get(f"/api/adventure-levels/{level_id}")
+
+    assert response.status_code == 404
+    assert response.json["message"] == "Level does not exist"
+
+
+def test_level_is_served_with_an_etag(client):
+    response = client.get("/api/adventure-levels/1")
+
+    assert response.status_code == 200
+    assert client.get("/api/adventure-levels/1", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
@@ -0,0 +1,19 @@
+from tests.test_archive_game import archive
+
+
+def test_link_is_kept_while_it_is_valid(client, user):
+    user_id, headers = user
+    archive(client, user)
+    game_id = client.get(f"/api/users/{user_id}/games/all?limit=1", headers=headers).json["data"][0]["id"]
+
+    first = client.get(f"/api/users/{user_id}/games/{game_id}/link", headers=headers)
+    second = client.get(f"/api/users/{user_id}/games/{game_id}/link", headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert first.json["data"]["linkPath"] == second.json["data"]["linkPath"]
+
+
+def test_link_of_a_missing_game_is_404(client, user):
+    user_id, headers = user
+
+    assert client.get(f"/api/users/{user_id}/games/999999/link", headers=headers).status_code == 404
@@ -0,0 +1,60 @@
+import sqlite3
+import sys
+
+import pytest
+
+create_tables = sys.modules["database.create_tables"]
+
+
+@pytest.fixture
+def connection(tmp_path, monkeypatch):
+    # A database from before any migration
+    connection = sqlite3.connect(str(tmp_path / "data.db"))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(create_tables, "migrations", [])
+        create_tables.create_tables(connection)
+
+    yield connection
+
+    connection.close()
+
+
+def add_users(connection, emails: list[str]) -> None:
+    connection.executemany(
+        "INSERT INTO Users (Email, PasswordHash, AuthenticationLevel, Name) VALUES (?, 'h', 2, 'A')",
+        [(email,) for email in emails],
+    )
+    connection.commit()
+
+
+def indexes(connection) -> set[str]:
+    rows = connection.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+
+    return {name for (name,) in rows}
+
+
+def test_migrations_reach_the_latest_version(connection):
+    add_users(connection, ["a@example.com", "A@example.com"])
+
+    create_tables.run_migrations(connection)
+
+    assert connection.execute("PRAGMA user_version").fetchone() == (len(create_tables.migrations),)
+    assert {"UsersEmail", "GameHistoryUseridDatePlayedGameid", "LinksUniqueGameid"} <= indexes(connection)
+    assert not {"GameHistoryUseridDatePlayed", "LinksGameid"} & indexes(connection)
+
+
+def test_duplicate_emails_stop_the_migration_until_they_are_fixed(connection):
+    add_users(connection, ["a@example.com", "a@example.com", "b@example.com"])
+
+    with pytest.raises(RuntimeError, match="more than one account: a@example.com\\."):
+        create_tables.run_migrations(connection)
+
+    assert connection.execute("PRAGMA user_version").fetchone() == (0,)
+    assert "UsersEmail" not in indexes(connection)
+
+    connection.execute("DELETE FROM Users WHERE Userid = 2")
+    connection.commit()
+    create_tables.run_migrations(connection)
+
+    assert "UsersEmail" in indexes(connection)
@@ -0,0 +1,68 @@
+import pytest
+
+import chess_rules
+from database.position_index import INDEXED_PLIES, position_rows
+from database.snapshots import SNAPSHOT_INTERVAL, game_snapshots
+from tests.test_archive_game import archive
+
+# Mate on the last move needs the knight from d7c8, promoting to a queen there leaves g5g3 illegal
+UNDERPROMOTION = (
+    "f2f3 a7a5 g2g3 e7e5 h2h3 g7g6 d2d3 b7b6 c1g5 c7c6 c2c3 f7f5 a2a3 a8a6 b2b4 f8h6 b4b5 d8g5 b5c6 e5e4 c6d7 e8f8 "
+    "d7c8n g5g3"
+)
+
+
+def outcome(game) -> tuple:
+    return game.result, game.winner, game.move_list
+
+
+def test_promotion_letter_is_used():
+    assert outcome(chess_rules.validate_move_list(UNDERPROMOTION)) == ("Checkmate", chess_rules.BLACK, UNDERPROMOTION)
+
+
+def test_letterless_underpromotion_is_resolved():
+    letterless = UNDERPROMOTION.replace("d7c8n", "d7c8")
+
+    assert outcome(chess_rules.validate_move_list(letterless)) == ("Checkmate", chess_rules.BLACK, UNDERPROMOTION)
+
+
+@pytest.mark.parametrize("move_list", [UNDERPROMOTION, UNDERPROMOTION.replace("d7c8n", "d7c8"), "f2f3 e7e5 g2g4 d8h4"])
+def test_recorded_positions_match_a_separate_replay(move_list):
+    game = chess_rules.validate_move_list(move_list, hashed_plies=INDEXED_PLIES, snapshot_interval=SNAPSHOT_INTERVAL)
+
+    assert position_rows(game.move_list, game.winner, game.position_hashes) == position_rows(game.move_list, game.winner)
+    assert game.snapshots == game_snapshots(game.move_list)
+
+
+def test_nothing_is_recorded_by_default():
+    game = chess_rules.validate_move_list(UNDERPROMOTION)
+
+    assert (game.position_hashes, game.snapshots) == ([], [])
+
+
+def test_wrong_promotion_letter_is_illegal():
+    with pytest.raises(chess_rules.IllegalMoveError, match="Move 24"):
+        chess_rules.validate_move_list(UNDERPROMOTION.replace("d7c8n", "d7c8q"))
+
+
+def test_letterless_promotion_prefers_a_queen():
+    board = chess_rules.replay_move_list("h2h4 g7g5 h4g5 h7h6 g5h6 g8f6 h6h7 f6g8 h7g8")
+
+    assert board.fen().startswith("rnbqkbQr/")
+
+
+def test_unfinished_game_is_illegal():
+    with pytest.raises(chess_rules.IllegalMoveError, match="not finished"):
+        chess_rules.validate_move_list("e2e4 e7e5")
+
+
+def test_letterless_underpromotion_is_archived_with_its_letter(client, user):
+    user_id, headers = user
+    letterless = UNDERPROMOTION.replace("d7c8n", "d7c8")
+
+    response = archive(client, user, moveList=letterless)
+    assert response.status_code == 201
+
+    game_id = client.get(f"/api/users/{user_id}/games/all?limit=1", headers=headers).json["data"][0]["id"]
+    game = client.get(f"/api/users/{user_id}/games/{game_id}", headers=headers).json["data"]
+    assert game["move_list"] == UNDERPROMOTION
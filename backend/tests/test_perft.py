@@ -0,0 +1,23 @@
+import pytest
+
+import chess_rules
+
+# Known node counts (https://www.chessprogramming.org/Perft_Results), kept to depths that run in well under a second
+# The deeper counts and the other positions are in benchmarks.perft
+STARTING_POSITION = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+
+
+@pytest.mark.parametrize(
+    "fen, depth, nodes",
+    [
+        (STARTING_POSITION, 1, 20),
+        (STARTING_POSITION, 2, 400),
+        (STARTING_POSITION, 3, 8902),
+        (KIWIPETE, 1, 48),
+        (KIWIPETE, 2, 2039),
+        (KIWIPETE, 3, 97862),
+    ],
+)
+def test_perft(fen, depth, nodes):
+    assert chess_rules.perft(chess_rules.Board(fen), depth) == nodes
@@ -0,0 +1,87 @@
+import sqlite3
+import sys
+
+import pytest
+
+import chess_rules
+import database
+from database.encoding import encode_move_list, encode_settings
+
+FOOLS_MATE = "f2f3 e7e5 g2g4 d8h4"
+SCHOLARS_MATE = "e2e4 e7e5 f1c4 b8c6 d1h5 g8f6 h5f7"
+
+
+@pytest.fixture
+def path(tmp_path, monkeypatch):
+    # A database from before the opening explorer index with games already archived
+    path = str(tmp_path / "data.db")
+    create_tables = sys.modules["database.create_tables"]
+    version = next(number for number, migration in enumerate(create_tables.migrations) if "PositionMoves" in str(migration))
+    monkeypatch.setattr(create_tables, "migrations", create_tables.migrations[:version])
+
+    connection = sqlite3.connect(path)
+    create_tables.create_tables(connection)
+    connection.execute("INSERT INTO Users (Email, PasswordHash, AuthenticationLevel, Name) VALUES ('a@b.c', 'h', 2, 'A')")
+    connection.executemany(
+        """
+            INSERT INTO GameHistory (MoveList, GameResult, DatePlayed, CustomSettings, HumanPlaysAs, Winner, Userid)
+            VALUES (?, 'Checkmate', CURRENT_TIMESTAMP, ?, 16, ?, 1)
+        """,
+        [
+            (encode_move_list(move_list), encode_settings("{}"), winner)
+            for move_list, winner in [(FOOLS_MATE, 8), (SCHOLARS_MATE, 16), (FOOLS_MATE, 8)]
+        ],
+    )
+    connection.commit()
+    connection.close()
+
+    monkeypatch.undo()
+
+    return path
+
+
+def starting_moves(db) -> dict:
+    return {move.move: move for move in db.get_position_moves(chess_rules.zobrist_hash(chess_rules.Board()))}
+
+
+def test_backfill_indexes_games_archived_before_the_index(path):
+    db = database.Database(database.ConnectionPool(path, size=1))
+
+    assert db.backfill_position_index(batch_size=2) == 3
+    assert db.backfill_position_index(batch_size=2) == 0
+
+    moves = starting_moves(db)
+    assert (moves["f2f3"].black_wins, moves["e2e4"].white_wins) == (2, 1)
+
+    with db.pool.read() as connection:
+        assert connection.execute("SELECT LastGameid FROM PositionIndexProgress").fetchone() == (3,)
+
+
+def test_games_archived_after_the_backfill_are_indexed_straight_away(path):
+    db = database.Database(database.ConnectionPool(path, size=1))
+    db.backfill_position_index()
+
+    db.archive_game("1", move_list=FOOLS_MATE, game_result="Checkmate", human_plays_as=16, winner=8).result()
+
+    assert starting_moves(db)["f2f3"].black_wins == 3
+
+
+def test_games_archived_during_the_backfill_are_left_to_it(path):
+    db = database.Database(database.ConnectionPool(path, size=1))
+
+    db.archive_game("1", move_list=FOOLS_MATE, game_result="Checkmate", human_plays_as=16, winner=8).result()
+    assert starting_moves(db) == {}
+
+    assert db.backfill_position_index() == 4
+    assert starting_moves(db)["f2f3"].black_wins == 3
+
+
+def test_backfill_stops_at_illegal_moves(path):
+    db = database.Database(database.ConnectionPool(path, size=1))
+
+    with db.pool.write() as connection:
+        connection.execute("UPDATE GameHistory SET MoveList = 'e2e5' WHERE Gameid = 2")
+        connection.commit()
+
+    assert db.backfill_position_index() == 3
+    assert "e2e5" not in starting_moves(db)
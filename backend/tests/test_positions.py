@@ -0,0 +1,123 @@
+import pytest
+
+import chess_rules
+from database.snapshots import SNAPSHOT_INTERVAL
+from tests.test_archive_game import archive
+from tests.test_move_validation import UNDERPROMOTION
+
+
+def moves_by_uci(data: dict) -> dict:
+    return {move["move"]: move for move in data["moves"]}
+
+
+def test_starting_position_is_the_default(client):
+    data = client.get("/api/positions").json["data"]
+
+    assert data["fen"] == chess_rules.STARTING_FEN
+    assert data["hash"] == f"{chess_rules.zobrist_hash(chess_rules.Board()):016x}"
+
+
+def test_child_hashes_follow_the_game(client, user):
+    archive(client, user)
+
+    first = moves_by_uci(client.get("/api/positions").json["data"])["f2f3"]
+    by_hash = client.get(f"/api/positions/{first['child_hash']}").json["data"]
+    by_fen = client.get("/api/positions", query_string={"fen": first["fen"]}).json["data"]
+
+    assert by_hash["hash"] == by_fen["hash"] == first["child_hash"]
+    assert "e7e5" in moves_by_uci(by_hash)
+    assert moves_by_uci(by_fen)["e7e5"]["games"] == moves_by_uci(by_hash)["e7e5"]["games"]
+
+
+@pytest.mark.parametrize("fen", ["", "8/8/8 w", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq z9", "x/8/8/8/8/8/8/8 w"])
+def test_invalid_fen_is_400(client, fen):
+    response = client.get("/api/positions", query_string={"fen": fen})
+
+    assert response.status_code == 400
+    assert response.json["message"] == "Invalid FEN"
+
+
+def test_game_positions_start_from_the_starting_position(client, user):
+    user_id, headers = user
+    archive(client, user)
+    game_id = client.get(f"/api/users/{user_id}/games/all?limit=1", headers=headers).json["data"][0]["id"]
+
+    response = client.get(f"/api/users/{user_id}/games/{game_id}/positions?from=0&to=1", headers=headers)
+
+    assert response.status_code == 200
+    assert [position["fen"] for position in response.json["data"]][0] == chess_rules.STARTING_FEN
+    assert len(response.json["data"]) == 2
+
+
+@pytest.mark.parametrize("game_id", ["1.0", "abc", "-1", str(1 << 64)])
+def test_game_positions_of_a_malformed_game_id_is_404(client, user, game_id):
+    user_id, headers = user
+
+    response = client.get(f"/api/users/{user_id}/games/{game_id}/positions", headers=headers)
+
+    assert response.status_code == 404
+    assert response.json["message"] == "Game does not exist"
+
+
+def archived_game_id(client, user, **fields) -> str:
+    user_id, headers = user
+    archive(client, user, **fields)
+
+    return client.get(f"/api/users/{user_id}/games/all?limit=1", headers=headers).json["data"][0]["id"]
+
+
+@pytest.mark.parametrize("first_ply, last_ply", [(0, 30), (15, 17), (16, 16), (20, 24), (24, 40), (25, 30)])
+def test_game_positions_are_replayed_from_the_nearest_snapshot(client, user, first_ply, last_ply):
+    user_id, headers = user
+    game_id = archived_game_id(client, user, moveList=UNDERPROMOTION)
+
+    response = client.get(f"/api/users/{user_id}/games/{game_id}/positions?from={first_ply}&to={last_ply}", headers=headers)
+
+    board = chess_rules.Board()
+    expected = [(0, board.fen())]
+
+    for ply, text in enumerate(UNDERPROMOTION.split(" "), start=1):
+        board.play_moves([chess_rules.uci_to_move(text)])
+        expected.append((ply, board.fen()))
+
+    assert response.status_code == 200
+    assert [(position["ply"], position["fen"]) for position in response.json["data"]] == expected[first_ply : last_ply + 1]
+
+
+def test_only_every_few_plies_are_stored(client, user):
+    import app as app_module
+
+    game_id = archived_game_id(client, user, moveList=UNDERPROMOTION)
+
+    with app_module.db.pool.read() as connection:
+        plies = [ply for (ply,) in connection.execute("SELECT Ply FROM GamePositions WHERE Gameid = ?", (game_id,))]
+
+    assert plies == list(range(0, len(UNDERPROMOTION.split(" ")) + 1, SNAPSHOT_INTERVAL))
+
+
+def test_game_positions_of_another_users_game_is_404(client, user, other_user):
+    game_id = archived_game_id(client, user)
+    other_id, other_headers = other_user
+
+    response = client.get(f"/api/users/{other_id}/games/{game_id}/positions", headers=other_headers)
+
+    assert response.status_code == 404
+    assert response.json["message"] == "Game does not exist"
+
+
+def test_game_positions_of_a_game_without_snapshots_are_computed(client, user):
+    import app as app_module
+
+    user_id, headers = user
+    game_id = archived_game_id(client, user, moveList=UNDERPROMOTION)
+
+    with app_module.db.pool.write() as connection:
+        connection.execute("DELETE FROM GamePositions WHERE Gameid = ?", (game_id,))
+        connection.commit()
+
+    response = client.get(f"/api/users/{user_id}/games/{game_id}/positions?from=20", headers=headers)
+
+    assert [position["ply"] for position in response.json["data"]] == [20, 21, 22, 23, 24]
+
+    with app_module.db.pool.read() as connection:
+        assert connection.execute("SELECT COUNT(*) FROM GamePositions WHERE Gameid = ?", (game_id,)).fetchone() == (2,)
@@ -0,0 +1,95 @@
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db(tmp_path):
+    pool = database.ConnectionPool(str(tmp_path / "data.db"), size=1, pragmas=database.pragma_profiles["wal"])
+    db = database.Database(pool)
+
+    db.insert_user(email="player@example.com", password_hash="hash 1", name="Player", auth_level=2).result()
+    user_id = db.get_user(email="player@example.com")._id
+    game_id = db.archive_game(
+        user_id, move_list="f2f3 e7e5 g2g4 d8h4", game_result="Checkmate", human_plays_as=16, winner=8
+    ).result()
+    db.register_link(link_suffix="abc", game_id=game_id).result()
+
+    # Every statement run through a read-only connection, with its parameters filled in
+    db.statements = []
+
+    with pool.read() as connection:
+        connection.set_trace_callback(db.statements.append)
+
+    return db
+
+
+def query_plan(db, sql: str) -> list[str]:
+    with db.pool.read() as connection:
+        return [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def traced_plans(db, call) -> list[str]:
+    # The query plan of every statement call runs
+    db.statements.clear()
+    call()
+    statements = list(db.statements)
+
+    return [detail for statement in statements for detail in query_plan(db, statement)]
+
+
+def assert_uses_index(plan: list[str], table: str, index: str):
+    assert any(detail.startswith(f"SEARCH {table} USING") and index in detail for detail in plan), plan
+    assert not any(detail.startswith(f"SCAN {table}") for detail in plan), plan
+
+
+def test_archived_games_by_user_use_the_user_index(db):
+    user_id = db.get_user(email="player@example.com")._id
+
+    plan = traced_plans(db, lambda: list(db.get_archived_games(user_id=user_id)))
+
+    assert_uses_index(plan, "GameHistory", "GameHistoryUseridDatePlayedGameid")
+    # The index is already in DatePlayed order
+    assert not any("TEMP B-TREE" in detail for detail in plan), plan
+
+
+def test_all_archived_games_use_the_date_index(db):
+    # One game per batch, so the later batches carry on from the last game with the (DatePlayed, Gameid) range
+    db.FETCH_BATCH_SIZE = 1
+    user_id = db.get_user(email="player@example.com")._id
+    db.archive_game(user_id, move_list="e2e4", game_result="Resignation", human_plays_as=8, winner=16).result()
+
+    plan = traced_plans(db, lambda: list(db.get_archived_games()))
+
+    # The first batch reads the index from the start, each later one searches it from the last game
+    index = "GameHistoryDatePlayedGameid"
+    assert any(detail.startswith("SEARCH GameHistory USING") and index in detail for detail in plan), plan
+    assert all(index in detail for detail in plan if "GameHistory" in detail), plan
+    assert not any("TEMP B-TREE" in detail for detail in plan), plan
+
+
+def test_archived_game_summaries_use_the_user_index(db):
+    user_id = db.get_user(email="player@example.com")._id
+
+    plan = traced_plans(db, lambda: db.get_archived_game_summaries(user_id, 10, before=("2100-01-01 00:00:00", 1)))
+
+    assert_uses_index(plan, "GameHistory", "GameHistoryUseridDatePlayedGameid")
+    assert not any("TEMP B-TREE" in detail for detail in plan), plan
+
+
+def test_links_by_game_id_use_the_game_index(db):
+    # The lookup the ON DELETE CASCADE from GameHistory and the ON CONFLICT in register_link make
+    assert_uses_index(query_plan(db, "SELECT * FROM Links WHERE Gameid = 1"), "Links", "LinksUniqueGameid")
+
+
+def test_links_by_url_use_the_url_index(db):
+    plan = traced_plans(db, lambda: db.get_link("abc"))
+
+    assert_uses_index(plan, "Links", "LinksLinkURL")
+
+
+def test_user_by_email_uses_the_email_index(db):
+    plan = traced_plans(db, lambda: db.get_user(email="player@example.com"))
+
+    assert_uses_index(plan, "Users", "UsersEmail")
+    assert_uses_index(plan, "UserCampaign", "UserCampaignUserid")
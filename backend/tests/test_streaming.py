@@ -0,0 +1,46 @@
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db(tmp_path):
+    pool = database.ConnectionPool(str(tmp_path / "data.db"), size=1, timeout=0.1)
+    db = database.Database(pool)
+    db.FETCH_BATCH_SIZE = 2
+
+    for number in range(5):
+        db.insert_user(email=f"player{number}@example.com", password_hash="hash 1", name="Player", auth_level=2).result()
+
+    # All played in the same second, so the order within a second comes from Gameid
+    for _ in range(5):
+        db.archive_game(
+            "1", move_list="f2f3 e7e5 g2g4 d8h4", game_result="Checkmate", human_plays_as=16, winner=8
+        ).result()
+
+    return db
+
+
+def test_archived_games_release_the_connection_between_batches(db):
+    games = db.get_archived_games(user_id="1")
+    first = next(games)
+
+    # The only read connection is free while the generator is suspended
+    with db.pool.read() as connection:
+        connection.execute("SELECT 1")
+
+    assert [first._id] + [game._id for game in games] == ["5", "4", "3", "2", "1"]
+
+
+def test_all_games_are_listed_newest_first(db):
+    assert [game._id for game in db.get_archived_games()] == ["5", "4", "3", "2", "1"]
+
+
+def test_all_users_release_the_connection_between_batches(db):
+    users = db.get_all_users()
+    first = next(users)
+
+    with db.pool.read() as connection:
+        connection.execute("SELECT 1")
+
+    assert [first._id] + [user._id for user in users] == ["1", "2", "3", "4", "5"]
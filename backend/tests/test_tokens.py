@@ -0,0 +1,43 @@
+import base64
+import json
+
+import pytest
+
+import crypto_auth
+from tests.test_decorators import PUBLIC_KEY, token
+
+
+def json_token(claims) -> str:
+    return base64.b64encode(json.dumps(claims).encode()).decode()
+
+
+MALFORMED_TOKENS = [
+    "AAAA",
+    "!!!",
+    base64.urlsafe_b64encode(b"\xff{").decode(),
+    json_token([1]),
+    json_token({"authorisation_level": 2, "id": "7", "invalidAt": 4e9}),
+    json_token({"authorisation_level": 2, "id": "7", "invalidAt": 4e9, "signature": 5}),
+    json_token({"authorisation_level": 2, "id": "7", "invalidAt": "never", "signature": "AA=="}),
+    json_token({"authorisation_level": 2, "id": "7", "signature": "AA=="}),
+]
+
+
+@pytest.mark.parametrize("malformed_token", MALFORMED_TOKENS)
+def test_malformed_token_fails_verification(malformed_token):
+    assert crypto_auth.verify(malformed_token, PUBLIC_KEY) == {"failure": "Token malformed"}
+
+
+@pytest.mark.parametrize("malformed_token", MALFORMED_TOKENS)
+def test_malformed_token_decodes_to_none_or_claims(malformed_token):
+    assert crypto_auth.decode(malformed_token) is None or type(crypto_auth.decode(malformed_token)) == dict
+
+
+def test_malformed_token_does_not_abort_a_batch():
+    valid = token("7")
+
+    results = crypto_auth.verify_many(["", "AAAA", valid], PUBLIC_KEY)
+
+    assert results[0] == {"failure": "Token not provided"}
+    assert results[1] == {"failure": "Token malformed"}
+    assert results[2]["failure"] is False and results[2]["id"] == "7"
@@ -92,7 +92,7 @@ class Board {
         return this.sideToMoveIndex | (this.epFile << 1) | (this.castlingRights << 5) | (this.pieceCapturedPlyBefore << 9)
     }
 
-    playUCIMove(from: number, to: number) {
+    playUCIMove(from: number, to: number, promotion: number = 0b11) { // promotion is the low two flag bits, 0b11 is a queen
         let move: Move
 
         const movedPiece = this.square[from]
@@ -110,12 +110,9 @@ class Board {
 
         // Promotion
         else if (movedPiece.getType() == Pieces.pawn && Math.floor(to / 8) % 7 == 0) {
-            if (this.square[to].getType() === Pieces.empty) {
-                move = Move.fromCharacteristics(to, from, false, false, false, 0, 0b011) // ALways promote to a queen (for the user)
-            }
-            else {
-                move = Move.fromCharacteristics(to, from, true, false, false, 0, 0b011)
-            }
+            const captureBit = this.square[to].getType() === Pieces.empty ? 0 : 1
+
+            move = new Move((to << 10) | (from << 4) | 0b1000 | (captureBit << 2) | promotion) // The user always promotes to a queen
         }
 
         // Castling KS
@@ -127,25 +127,25 @@ class Engine {
         })
     }
 
-    playerUCIMove(from: number, to: number): Move {
-        const move = this.board.playUCIMove(from, to)
+    playerUCIMove(from: number, to: number, promotion?: number): Move {
+        const move = this.board.playUCIMove(from, to, promotion)
         this.moveHistory.push(move)
 
         return move
     }
 
     getMoveListString(): string {
-        return this.moveHistory.reduce((moveString, currMove) => {
-            return moveString += `${decToCoord(currMove.getSourceSquare())}${decToCoord(currMove.getDestinationSquare())} `
-        }, "").slice(0, -1) // Remove extra space at the end
+        // Promotions keep their letter, the engine underpromotes so the server can't assume a queen
+        return this.moveHistory.map(move => move.toLetterUCI()).join(" ")
     }
 
     static moveHistoryStringToUCI(string: string): number[][] {
         return string.split(" ").map(move => {
             const sourceSquare = move.slice(0, 2)
-            const destSquare = move.slice(-2)
+            const destSquare = move.slice(2, 4)
+            const promotion = move.length > 4 ? "nbrq".indexOf(move[4]) : 0b11
 
-            return [coordTodec(sourceSquare), coordTodec(destSquare)]
+            return [coordTodec(sourceSquare), coordTodec(destSquare), promotion]
         })
     }
 }
@@ -157,8 +157,4 @@ function coordTodec(coord: string): number {
     return rank * 8 + file
 }
 
-function decToCoord(square: number): string {
-    return `${String.fromCharCode(97 + (square % 8))}${Math.floor(square / 8) + 1}`
-}
-
 export default Engine
\ No newline at end of file
@@ -5,8 +5,17 @@ import "./index.css"
 const canvas_width = 500
 const canvas_height = 600
 
+type Results = { attempts: number, wins: number }
+
+// From /api/users/<user_id>/campaign-summary
+export interface CampaignSummary {
+    totals: Results & { draws: number, losses: number }
+    playstyles: { aggressive: Results, trade_heavy: Results, positionally_strong: Results, tactically_strong: Results }
+    completed_at: string | null
+}
+
 interface Props {
-    games: any
+    summary: CampaignSummary
 }
 interface State { }
 
@@ -34,30 +43,21 @@ class AdventureResults extends React.Component<Props, State> {
         context.fillText("Thochess Adventure Champion!", 35, 60)
         context.font = '18px "Varela Round"'
 
-        const games = this.props.games.map((game: any) => {
-            game.custom_settings = JSON.parse(game.custom_settings)
-            return game
-        })
-
-        const numberOfGames = games.length
-        const numberOfWins = games.filter((game: any) => game.winner === game.human_plays_as).length
-        const numberOfLosses = games.filter((game: any) => (game.winner !== game.human_plays_as) && game.winner !== 0).length
-        const numberOfDraws = games.filter((game: any) => game.winner === 0).length
-        const winRate = Math.round(100 * numberOfWins / numberOfGames)
-
-        const aggressiveGames = games.filter((game: any) => game.custom_settings.aggressiveness >= 75)
-        const aggressiveWinRate = Math.round(100 * (aggressiveGames.filter((game: any) => game.winner === game.human_plays_as).length / aggressiveGames.length))
-
-        const tradeHeavyGames = games.filter((game: any) => game.custom_settings.tradeHappy >= 75)
-        const tradeHeavyWinRate = Math.round(100 * (tradeHeavyGames.filter((game: any) => game.winner === game.human_plays_as).length / tradeHeavyGames.length))
+        const { totals, playstyles, completed_at } = this.props.summary
+        const winRateOf = (results: Results) => Math.round(100 * results.wins / results.attempts)
 
-        const positionallyStrongGames = games.filter((game: any) => game.custom_settings.positionalPlay >= 75)
-        const positionallyStrongWinRate = Math.round(100 * (positionallyStrongGames.filter((game: any) => game.winner === game.human_plays_as).length / positionallyStrongGames.length))
+        const numberOfGames = totals.attempts
+        const numberOfWins = totals.wins
+        const numberOfLosses = totals.losses
+        const numberOfDraws = totals.draws
+        const winRate = winRateOf(totals)
 
-        const tacticallyStrongGames = games.filter((game: any) => game.custom_settings.blindSpots <= 15)
-        const tacticallyStrongWinRate = Math.round(100 * (tacticallyStrongGames.filter((game: any) => game.winner === game.human_plays_as).length / tacticallyStrongGames.length))
+        const aggressiveWinRate = winRateOf(playstyles.aggressive)
+        const tradeHeavyWinRate = winRateOf(playstyles.trade_heavy)
+        const positionallyStrongWinRate = winRateOf(playstyles.positionally_strong)
+        const tacticallyStrongWinRate = winRateOf(playstyles.tactically_strong)
 
-        const adventureFinishedDate = games.filter((game: any) => game.level_id === "8")[0].date_played.slice(0, 10)
+        const adventureFinishedDate = completed_at?.slice(0, 10)
 
         context.fillText(`You have played ${numberOfGames} games...`, 30, 125)
         context.fillText(`You won ${numberOfWins}.`, 60, 160)
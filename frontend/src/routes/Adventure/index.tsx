@@ -6,7 +6,7 @@ import Engine, { Customisation } from "../../engine/Engine";
 import "./index.css"
 import { Pieces } from "../../engine/constants";
 import Move from "../../engine/Move";
-import AdventureResults from "./AdventureResults";
+import AdventureResults, { CampaignSummary } from "./AdventureResults";
 
 interface Props { }
 
@@ -18,7 +18,7 @@ interface State {
     name: string
     textIndex: number
     lastMove: Move | null
-    allGames: Array<any> | null
+    campaignSummary: CampaignSummary | null
     showFinalCard: boolean
 }
 
@@ -41,7 +41,7 @@ class Adventure extends React.Component<Props, State> {
             name: "",
             textIndex: 0,
             lastMove: null,
-            allGames: null,
+            campaignSummary: null,
             showFinalCard: false
         }
 
@@ -87,13 +87,13 @@ class Adventure extends React.Component<Props, State> {
             return
         }
 
-        if (this.context.levelid == LAST_LEVEL_ID && this.state.allGames == null) {
-            fetch(`/api/users/${this.context.id}/games/all`)
+        if (this.context.levelid == LAST_LEVEL_ID && this.state.campaignSummary == null) {
+            fetch(`/api/users/${this.context.id}/campaign-summary`)
                 .then(resp => resp.json())
                 .then(data => {
                     if (!data.error) {
                         this.setState({
-                            allGames: data.data
+                            campaignSummary: data.data
                         })
                     }
                 })
@@ -231,10 +231,10 @@ class Adventure extends React.Component<Props, State> {
     }
 
     render() {
-        if (this.state.allGames !== null && this.state.showFinalCard) {
+        if (this.state.campaignSummary !== null && this.state.showFinalCard) {
             return (
                 <div className="page-content">
-                    <AdventureResults games={this.state.allGames} />
+                    <AdventureResults summary={this.state.campaignSummary} />
                 </div>
             )
         }
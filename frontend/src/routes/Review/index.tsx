@@ -81,7 +81,7 @@ class Review extends React.Component<Props, State> {
             return
         }
 
-        const move = this.Engine.playerUCIMove(uciMove[0], uciMove[1])
+        const move = this.Engine.playerUCIMove(uciMove[0], uciMove[1], uciMove[2])
 
         this.setState({
             moveIndex: this.state.moveIndex + 1,